@@ -0,0 +1,331 @@
+"""Benchmark the editor's hot paths.
+
+Times, in seconds:
+
+    load/<size>MB           Loading a file into a Document until fully loaded
+    save/<size>MB           Saving a Document until the save completes
+    column_update/<n>       ColumnEditor.update() selecting a block n lines tall,
+                            and then widening it by one column
+    column_typing/<n>       Typing a character into a column n lines tall
+    scroll/<n>              Scrolling a page at a time through 100 pages of a
+                            file n lines long, redrawing line numbers and all
+    tabs_open/<n>           Opening n small files, each in its own tab
+    tabs_switch/<n>         Selecting each of n tabs in turn
+    tabs_close/<n>          Closing n tabs
+    theme_switch            Switching between the dark and light themes
+
+Each case is run several times, and the minimum, median and every run are
+written as JSON, with progress reported on stderr. Passing the JSON of an
+earlier run with --compare reports the change in each median, and exits with
+status 1 if any has slowed by more than --tolerance.
+
+The benchmarks need a display. If DISPLAY isn't set, a virtual X server is
+started with Xvfb. The settings and state used are those of a temporary home
+folder, so the user's own are never touched.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tkinter as tk
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# The display number used for Xvfb
+XVFB_DISPLAY = ':99'
+
+
+def start_xvfb() -> subprocess.Popen:
+    """Start a virtual X server and point DISPLAY at it."""
+    xvfb = shutil.which('Xvfb')
+    if xvfb is None:
+        sys.exit('No display available and Xvfb is not installed')
+
+    process = subprocess.Popen([xvfb, XVFB_DISPLAY, '-screen', '0', '1920x1080x24', '-nolisten', 'tcp'])
+    os.environ['DISPLAY'] = XVFB_DISPLAY
+    time.sleep(1)  # Give the server time to accept connections
+    return process
+
+
+def create_file(path: Path, size: int, width: int = 80):
+    """Write a file of roughly the given size in bytes, made of lines of the
+    given width."""
+    line = ('x' * (width - 1) + '\n').encode('ascii')
+    count = max(size // len(line), 1)
+
+    with open(path, 'wb') as f:
+        for _ in range(count // 1000):
+            f.write(line * 1000)
+        f.write(line * (count % 1000))
+
+
+class Benchmarks:
+
+    def __init__(self, root, editor, folder: Path, repeat: int):
+        self.root = root
+        self.editor = editor
+        self.folder = folder
+        self.repeat = repeat
+        self.results = {}
+
+    def run(self, name: str, case: callable, setup: callable = None, teardown: callable = None):
+        """Time a case, repeatedly.
+
+        Args:
+            name: The name of the case.
+            case: No-args callable to time.
+            setup: Optional no-args callable run, untimed, before each run.
+            teardown: Optional no-args callable run, untimed, after each run.
+        """
+        runs = []
+
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+            self.root.update()
+
+            start = time.perf_counter()
+            case()
+            runs.append(time.perf_counter() - start)
+
+            if teardown is not None:
+                teardown()
+
+        self.results[name] = {'min': min(runs), 'median': statistics.median(runs), 'runs': runs}
+        print(f'{name:<24} {statistics.median(runs):9.4f}s', file=sys.stderr, flush=True)
+
+    def wait(self, condition: callable):
+        """Process events until a condition is met."""
+        while not condition():
+            self.root.update()
+
+    def new_document(self):
+        self.editor.new()
+        return self.editor.current_document
+
+    def close_documents(self):
+        """Return the editor to a single empty document."""
+        self.editor.new()
+        for document in self.editor.documents[:-1]:
+            self.editor.remove(document)
+
+    def load_and_save(self, sizes: list):
+        for size in sizes:
+            path = self.folder / f'{size}MB.txt'
+            create_file(path, int(size * 1024 * 1024))
+            document = None
+
+            def load():
+                nonlocal document
+                document = self.new_document()
+                document.load(str(path), 'utf-8')
+                self.wait(lambda: not document.loading)
+
+            self.run(f'load/{size}MB', load, teardown=self.close_documents)
+
+            def save():
+                document.save(str(self.folder / 'saved.txt'))
+                self.wait(lambda: not document.saving)
+
+            load()
+            self.run(f'save/{size}MB', save)
+            self.close_documents()
+
+    def column_editing(self, heights: list):
+        for height in heights:
+            document = self.new_document()
+            document.text.insert('1.0', ('x' * 79 + '\n') * height)
+            document.mark_clean()
+            column_editor = document.column_editor
+
+            def start():
+                column_editor.deactivate(None)
+                column_editor.start_line, column_editor.start_char = 1, 10
+
+            def update():
+                column_editor.update(f'{height}.20')
+                column_editor.update(f'{height}.21')
+
+            self.run(f'column_update/{height}', update, setup=start)
+
+            def start_typing():
+                start()
+                column_editor.update(f'{height}.10')
+
+            def typing():
+                column_editor.edit('a')
+                self.root.update_idletasks()
+
+            self.run(f'column_typing/{height}', typing, setup=start_typing)
+            self.close_documents()
+
+    def scrolling(self, line_counts: list):
+        for lines in line_counts:
+            path = self.folder / f'{lines}lines.txt'
+            create_file(path, lines * 40, width=40)
+            document = self.new_document()
+            document.load(str(path), 'utf-8')
+            self.wait(lambda: not document.loading)
+
+            def start():
+                document.text.yview_moveto(0)
+
+            def scroll():
+                for _ in range(100):
+                    document.text.yview_scroll(1, tk.PAGES)
+                    self.root.update()
+
+            self.run(f'scroll/{lines}', scroll, setup=start)
+            self.close_documents()
+
+    def tabs(self, counts: list):
+        for count in counts:
+            paths = []
+            for i in range(count):
+                path = self.folder / f'tab{i}.py'
+                create_file(path, 16 * 1024)
+                paths.append(path)
+
+            def open_tabs():
+                for path in paths:
+                    self.editor.open(str(path), 'utf-8')
+                self.wait(lambda: not any(document.loading for document in self.editor.documents))
+
+            def switch():
+                for i in range(len(self.editor.tabs())):
+                    self.editor.select(i)
+                    self.root.update()
+
+            def close():
+                while len(self.editor.documents) > 1:
+                    self.editor.close_tab(self.editor.tabs()[-1])
+                self.root.update()
+
+            self.run(f'tabs_open/{count}', open_tabs, teardown=self.close_documents)
+            self.run(f'tabs_switch/{count}', switch, setup=open_tabs, teardown=self.close_documents)
+            self.run(f'tabs_close/{count}', close, setup=open_tabs, teardown=self.close_documents)
+
+    def theme_switch(self):
+        from pyrite import settings
+
+        if not hasattr(self.root, 'set_theme'):
+            print('theme_switch             skipped, as ttkthemes is not installed', file=sys.stderr)
+            return
+
+        def switch():
+            for name in ('light', 'dark'):
+                settings['theme'] = name
+                settings.save()
+                self.root.update()
+
+        self.run('theme_switch', switch)
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> bool:
+    """Print the change in each median from a baseline.
+
+    Returns: True if none has slowed by more than the tolerance.
+    """
+    passed = True
+
+    for name, result in results.items():
+        if name not in baseline['results']:
+            continue
+
+        ratio = result['median'] / baseline['results'][name]['median']
+        slower = ratio > 1 + tolerance
+        passed = passed and not slower
+        print(f'{name:<24} {ratio:6.2f}x  {"REGRESSION" if slower else "ok"}')
+
+    return passed
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=str(ROOT), stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, universal_newlines=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the editor's hot paths.")
+    parser.add_argument('--repeat', type=int, default=5, help='the number of times each case is run')
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 10, 50], help='file sizes (MB) to load and save')
+    parser.add_argument('--heights', type=int, nargs='+', default=[1000, 10000], help='column heights (lines)')
+    parser.add_argument('--scroll-lines', type=int, nargs='+', default=[100, 1000000],
+                        help='lengths (lines) of the files scrolled through')
+    parser.add_argument('--tabs', type=int, nargs='+', default=[20, 100], help='numbers of tabs')
+    parser.add_argument('--output', metavar='FILE', help='write the results as JSON to a file, rather than stdout')
+    parser.add_argument('--compare', metavar='FILE', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='the slow down allowed when comparing')
+    args = parser.parse_args()
+
+    xvfb = start_xvfb() if not os.environ.get('DISPLAY') else None
+
+    with tempfile.TemporaryDirectory() as home:
+        # Before importing pyrite, so that settings and state come from here
+        os.environ['HOME'] = home
+        sys.path.insert(0, str(ROOT))
+
+        from pyrite import editor, settings, state
+
+        settings.initialise()
+        # Background work that would otherwise compete with the benchmarks
+        settings['journal'] = False
+        settings['watch_files'] = False
+        settings['hibernate_after_minutes'] = 0
+        settings['hibernate_budget_mb'] = 0
+        state.initialise()
+
+        try:
+            from pyrite.app import MainWindow
+            root = MainWindow()
+            main_editor = root.editor
+        except ImportError:
+            root = tk.Tk()
+            root.geometry('1024x768')
+            main_editor = editor.create(master=root)
+
+        root.update()
+
+        benchmarks = Benchmarks(root, main_editor, Path(home), args.repeat)
+        try:
+            benchmarks.load_and_save(args.sizes)
+            benchmarks.column_editing(args.heights)
+            benchmarks.scrolling(args.scroll_lines)
+            benchmarks.tabs(args.tabs)
+            benchmarks.theme_switch()
+        finally:
+            root.destroy()
+            if xvfb is not None:
+                xvfb.terminate()
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': args.repeat,
+        'results': benchmarks.results,
+    }
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if not compare(benchmarks.results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
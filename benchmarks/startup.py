@@ -0,0 +1,128 @@
+"""Benchmark the startup time of pyrite.
+
+Each run starts pyrite in a fresh process and measures:
+
+    import       Importing the application's modules
+    first_paint  Loading settings and state and displaying the main window
+    first_file   Opening a file and loading it completely
+
+All times are in seconds from the start of the process's first import. Runs
+share a temporary home folder, so the first run creates the settings file and
+settings cache and later runs use them. That first run is treated as a warm
+up and excluded from the results.
+
+The median of each measurement is compared with the thresholds in
+startup_thresholds.json, and the script exits with status 1 if any is
+exceeded. A display is required; on a headless machine use:
+
+    xvfb-run python benchmarks/startup.py
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+THRESHOLDS = Path(__file__).resolve().parent / 'startup_thresholds.json'
+
+MEASUREMENTS = ('import', 'first_paint', 'first_file')
+
+
+def child(filename: str):
+    """Start pyrite and report timings as JSON on stdout."""
+    start = time.perf_counter()
+    timings = {}
+
+    from pyrite import app, settings, state
+    timings['import'] = time.perf_counter() - start
+
+    settings.initialise()
+    state.initialise()
+    window = app.MainWindow()
+    while not window.winfo_viewable():
+        window.update()
+    timings['first_paint'] = time.perf_counter() - start
+
+    window.editor.open(filename)
+    while window.editor.current_document.loading:
+        window.update()
+    timings['first_file'] = time.perf_counter() - start
+
+    window.destroy()
+    print(json.dumps(timings))
+
+
+def create_sample(path: Path, size: int):
+    """Write a reproducible sample file of roughly the given size in bytes."""
+    line = 'def function_{0}(value):  # A comment about function {0}\n    return value * {0}\n\n'
+    with open(path, 'wt', encoding='utf-8') as f:
+        i = 0
+        while f.tell() < size:
+            f.write(line.format(i))
+            i += 1
+
+
+def run(runs: int, size: int) -> dict:
+    """Run the benchmark, returning the timings of each run keyed by measurement."""
+    results = {m: [] for m in MEASUREMENTS}
+
+    with tempfile.TemporaryDirectory() as home:
+        sample = Path(home, 'sample.py')
+        create_sample(sample, size)
+
+        env = dict(os.environ, HOME=home, PYTHONPATH=str(ROOT))
+
+        for i in range(runs + 1):
+            output = subprocess.run(
+                [sys.executable, __file__, '--child', str(sample)],
+                env=env,
+                stdout=subprocess.PIPE,
+                check=True,
+                universal_newlines=True,
+            ).stdout
+            timings = json.loads(output.splitlines()[-1])
+
+            if i:  # The first run is a warm up
+                for m in MEASUREMENTS:
+                    results[m].append(timings[m])
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the startup time of pyrite.')
+    parser.add_argument('--runs', type=int, default=5, help='the number of measured runs')
+    parser.add_argument('--size-mb', type=float, default=5, help='the size of the file opened')
+    parser.add_argument('--json', metavar='FILE', help='also write the results to a JSON file')
+    parser.add_argument('--child', metavar='FILE', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    results = run(args.runs, int(args.size_mb * 1024 * 1024))
+    thresholds = json.loads(THRESHOLDS.read_text())
+    report = {}
+    failed = False
+
+    for m in MEASUREMENTS:
+        median = statistics.median(results[m])
+        passed = median <= thresholds[m]
+        failed = failed or not passed
+        report[m] = {'median': median, 'runs': results[m], 'threshold': thresholds[m], 'passed': passed}
+        print(f'{m:<12} {median:8.3f}s  (threshold {thresholds[m]:.3f}s)  {"ok" if passed else "REGRESSION"}')
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,28 @@
 """This module acts as the entry point for running the application."""
-from pyrite import app, settings, state
+import sys
+
+from pyrite import instance, settings, state
 
 
 def main():
+    files = instance.parse_args(sys.argv[1:])
     settings.initialise()
+
+    server = None
+    if settings.getboolean('single_instance'):
+        # Hand the files to an instance that's already running, if there is one
+        if instance.send(files):
+            return
+        server = instance.listen()
+        if server is None and instance.send(files):
+            # Another instance started in the meantime
+            return
+
     state.initialise()
-    app.run()
+
+    # Deferred until needed, so that handing files to a running instance is quick
+    from pyrite import app
+    app.run(files, server)
 
 
 if __name__ == '__main__':
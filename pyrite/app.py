@@ -1,20 +1,36 @@
 import logging
+import os
+import queue
 
 from ttkthemes import ThemedTk
 
-from pyrite import editor, menu, settings, state, theme
+from pyrite import editor, instance, instrument, menu, settings, state, theme
 
 log = logging.getLogger(__name__)
 
 DEFAULT_GEOMETRY = '1024x768+500+100'
 
+# How often (milliseconds) to check for files sent by later invocations
+SERVER_POLL_INTERVAL = 100
+
 
 class MainWindow(ThemedTk):
     """The outer window of the application that contains everything else."""
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, files: list = (), server: instance.Server = None, **kwargs):
+        """Create a new MainWindow instance.
+
+        Args:
+            files: Files to open, as (filename, line number or None) tuples.
+            server: Optional Server receiving files from later invocations.
+        """
         super().__init__(*args, **kwargs)
 
+        self.server = server
+
+        if settings.getboolean('instrument'):
+            instrument.install(self)
+
         self.geometry(state.get('geometry', DEFAULT_GEOMETRY))
         self.set_theme(theme.ttktheme)
 
@@ -22,20 +38,59 @@ class MainWindow(ThemedTk):
 
         self.protocol('WM_DELETE_WINDOW', self.on_close)
 
-        ed = editor.create(master=self)
-        menu.create(master=self, editor=ed)
+        self.editor = editor.create(master=self)
+        menu.create(master=self, editor=self.editor)
+
+        self.open_files(files)
+
+        if server is not None:
+            self.after(SERVER_POLL_INTERVAL, self.poll_server)
 
     def show(self):
         self.mainloop()
 
+    def open_files(self, files: list):
+        """Open files, as (filename, line number or None) tuples. Files that
+        are already open are selected, and those that don't exist skipped."""
+        for filename, line in files:
+            if self.editor.select_file(filename, line):
+                continue
+            if os.path.isfile(filename):
+                self.editor.open(filename, line=line)
+            else:
+                log.warning('No such file: %s', filename)
+
+    def poll_server(self):
+        try:
+            while True:
+                self.open_files(self.server.requests.get_nowait())
+
+                # Bring the window to the front
+                self.deiconify()
+                self.lift()
+                self.focus_force()
+        except queue.Empty:
+            pass
+
+        self.after(SERVER_POLL_INTERVAL, self.poll_server)
+
+    def destroy(self):
+        if self.server is not None:
+            self.server.close()
+        super().destroy()
+
     def on_close(self):
+        if instrument.monitor is not None:
+            log.info('Performance report:\n%s', instrument.monitor.report())
+
         # Record the current dimensions
         state['geometry'] = self.geometry()
         state.save()
 
-        self.destroy()
+        # Offers to save any modified documents before closing
+        self.editor.exit()
 
 
-def run():
-    main_window = MainWindow()
+def run(files: list = (), server: instance.Server = None):
+    main_window = MainWindow(files=files, server=server)
     main_window.show()
@@ -0,0 +1,498 @@
+"""A Python-side model of a document's content.
+
+The Tk text widget keeps its content in Tcl, so reading it means copying the
+whole document through Tcl into Python. To avoid that, each Document holds
+a Buffer which mirrors every change made to its text widget. The Buffer is
+the source of truth for operations that need the content, such as saving.
+
+The content of a Buffer is held in a Rope. Ropes are immutable, so a worker
+thread can safely be handed a snapshot of a document without touching Tk.
+"""
+import itertools
+import tkinter as tk
+from contextlib import contextmanager
+from typing import List, NamedTuple
+
+# The size of the leaves produced when a Rope is built from a string
+LEAF_SIZE = 1024
+
+# The maximum size of a leaf before it is split
+MAX_LEAF_SIZE = 2048
+
+# The maximum number of children of a branch before it is split
+MAX_CHILDREN = 16
+
+
+class _Leaf:
+    __slots__ = ('text', 'length', 'newlines')
+
+    def __init__(self, text: str):
+        self.text = text
+        self.length = len(text)
+        self.newlines = text.count('\n')
+
+
+class _Branch:
+    __slots__ = ('children', 'length', 'newlines')
+
+    def __init__(self, children: list):
+        self.children = children
+        self.length = sum(c.length for c in children)
+        self.newlines = sum(c.newlines for c in children)
+
+
+def _leaves(text: str) -> List[_Leaf]:
+    if len(text) <= MAX_LEAF_SIZE:
+        return [_Leaf(text)]
+
+    return [_Leaf(text[i:i + LEAF_SIZE]) for i in range(0, len(text), LEAF_SIZE)]
+
+
+def _branches(children: list) -> List[_Branch]:
+    """Group nodes under as few branches as possible."""
+    count = -(-len(children) // MAX_CHILDREN)
+    size = -(-len(children) // count)
+    return [_Branch(children[i:i + size]) for i in range(0, len(children), size)]
+
+
+def _balance(nodes: list):
+    while len(nodes) > 1:
+        nodes = _branches(nodes)
+
+    return nodes[0]
+
+
+def _insert(node, offset: int, text: str) -> list:
+    if isinstance(node, _Leaf):
+        return _leaves(node.text[:offset] + text + node.text[offset:])
+
+    children = node.children
+    last = len(children) - 1
+
+    for i, child in enumerate(children):
+        if offset <= child.length or i == last:
+            break
+        offset -= child.length
+
+    children = children[:i] + _insert(child, offset, text) + children[i + 1:]
+
+    if len(children) > MAX_CHILDREN:
+        return _branches(children)
+
+    return [_Branch(children)]
+
+
+def _delete(node, start: int, end: int):
+    if isinstance(node, _Leaf):
+        text = node.text[:start] + node.text[end:]
+        return _Leaf(text) if text else None
+
+    children = []
+    pos = 0
+
+    for child in node.children:
+        child_start, pos = pos, pos + child.length
+
+        if end <= child_start or start >= pos:
+            children.append(child)
+        elif start > child_start or end < pos:
+            child = _delete(child, max(start - child_start, 0), min(end - child_start, child.length))
+            if child is not None:
+                if children and isinstance(child, _Leaf) and isinstance(children[-1], _Leaf) \
+                        and children[-1].length + child.length <= LEAF_SIZE:
+                    # Merge small neighbouring leaves so that repeated deletions
+                    # don't fragment the rope
+                    child = _Leaf(children.pop().text + child.text)
+                children.append(child)
+
+    return _Branch(children) if children else None
+
+
+class Rope:
+    """An immutable string optimised for editing large documents.
+
+    A Rope is a balanced tree of short strings. Each node records the number of
+    characters and newlines beneath it, so offsets and line numbers can be
+    converted in logarithmic time. Edits return a new Rope which shares all
+    unchanged nodes with the old one.
+
+    Line numbers start from 1 and character offsets within a line start
+    from 0, matching the indexes used by the Tk text widget.
+    """
+
+    __slots__ = ('_root',)
+
+    def __init__(self, text: str = '', _root=None):
+        self._root = _root if _root is not None else _balance(_leaves(text))
+
+    def __len__(self) -> int:
+        return self._root.length
+
+    def __str__(self) -> str:
+        return ''.join(self.chunks())
+
+    @property
+    def lines(self) -> int:
+        """The number of lines, which is one more than the number of newlines."""
+        return self._root.newlines + 1
+
+    def insert(self, offset: int, text: str) -> 'Rope':
+        """Return a new Rope with text inserted at an offset."""
+        if not text:
+            return self
+
+        return Rope(_root=_balance(_insert(self._root, offset, text)))
+
+    def delete(self, start: int, end: int) -> 'Rope':
+        """Return a new Rope with the characters between two offsets removed."""
+        if end <= start:
+            return self
+
+        root = _delete(self._root, start, end) or _Leaf('')
+
+        while isinstance(root, _Branch) and len(root.children) == 1:
+            root = root.children[0]
+
+        return Rope(_root=root)
+
+    def chunks(self, start: int = 0, end: int = None):
+        """Iterate over the content between two offsets in pieces.
+
+        This avoids building a single string for the whole content, e.g.
+        when writing a document to a file.
+        """
+        end = len(self) if end is None else end
+        return _chunks(self._root, 0, start, end)
+
+    def slice(self, start: int, end: int) -> str:
+        """Get the content between two offsets."""
+        return ''.join(self.chunks(start, end))
+
+    def line_start(self, line: int) -> int:
+        """Get the offset of the start of a line.
+
+        Lines beyond the last line are treated as starting at the end of the
+        content.
+        """
+        remaining = line - 1
+
+        if remaining <= 0:
+            return 0
+
+        if remaining > self._root.newlines:
+            return len(self)
+
+        node = self._root
+        pos = 0
+
+        while isinstance(node, _Branch):
+            for child in node.children:
+                if remaining <= child.newlines:
+                    node = child
+                    break
+                remaining -= child.newlines
+                pos += child.length
+
+        found = -1
+        for _ in range(remaining):
+            found = node.text.find('\n', found + 1)
+
+        return pos + found + 1
+
+    def offset(self, line: int, char: int) -> int:
+        """Convert a line and character position to an offset."""
+        return self.line_start(line) + char
+
+    def position(self, offset: int) -> (int, int):
+        """Convert an offset to a line and character position."""
+        node = self._root
+        pos = 0
+        newlines = 0
+
+        while isinstance(node, _Branch):
+            last = len(node.children) - 1
+            for i, child in enumerate(node.children):
+                if offset < pos + child.length or i == last:
+                    node = child
+                    break
+                pos += child.length
+                newlines += child.newlines
+
+        line = newlines + node.text.count('\n', 0, offset - pos) + 1
+
+        return line, offset - self.line_start(line)
+
+    def line_length(self, line: int) -> int:
+        """Get the number of characters in a line, excluding its trailing newline."""
+        end = self.line_start(line + 1)
+        if line < self.lines:
+            end -= 1
+        return end - self.line_start(line)
+
+    def line(self, line: int) -> str:
+        """Get the content of a line, without its trailing newline."""
+        start = self.line_start(line)
+
+        if line >= self.lines:
+            return self.slice(start, len(self))
+
+        return self.slice(start, self.line_start(line + 1) - 1)
+
+
+def _chunks(node, pos: int, start: int, end: int):
+    if isinstance(node, _Leaf):
+        yield node.text[max(start - pos, 0):end - pos]
+        return
+
+    for child in node.children:
+        if pos >= end:
+            return
+        if pos + child.length > start:
+            yield from _chunks(child, pos, start, end)
+        pos += child.length
+
+
+class Edit(NamedTuple):
+    """A change made to a Buffer."""
+    offset: int
+    removed: str
+    inserted: str
+    before: Rope
+    after: Rope
+
+
+class Buffer:
+    """Holds the content of a document as a Rope.
+
+    Clients can register listeners to be told of each Edit made.
+    """
+
+    def __init__(self, text: str = ''):
+        self.rope = Rope(text)
+
+        # Edit listeners
+        self.listeners: list = []
+
+        # Identifies the edits made within the current `grouped()` block, or
+        # None outside of one
+        self.group = None
+        self._groups = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self.rope)
+
+    @property
+    def lines(self) -> int:
+        return self.rope.lines
+
+    def on_edit(self, listener: callable):
+        """Add a listener to be invoked after each edit.
+
+        Args:
+            listener: A callable that will be passed the Edit.
+        """
+        self.listeners.append(listener)
+
+    @contextmanager
+    def grouped(self):
+        """Group the edits made within, so that listeners can treat them as
+        one - e.g. to undo them in a single step. Nested blocks join the
+        outermost group."""
+        if self.group is not None:
+            yield
+            return
+
+        self.group = next(self._groups)
+        try:
+            yield
+        finally:
+            self.group = None
+
+    def snapshot(self) -> Rope:
+        """Get the current content. This is a constant time operation, and
+        the result can be shared with other threads."""
+        return self.rope
+
+    def insert(self, offset: int, text: str):
+        """Insert text at an offset."""
+        if text:
+            self._apply(offset, '', text)
+
+    def delete(self, start: int, end: int):
+        """Delete the characters between two offsets."""
+        if end > start:
+            self._apply(start, self.rope.slice(start, end), '')
+
+    def replace(self, start: int, end: int, text: str):
+        """Replace the characters between two offsets with text."""
+        if end > start or text:
+            self._apply(start, self.rope.slice(start, end), text)
+
+    def _apply(self, offset: int, removed: str, inserted: str):
+        before = self.rope
+        self.rope = before.delete(offset, offset + len(removed)).insert(offset, inserted)
+
+        edit = Edit(offset, removed, inserted, before, self.rope)
+
+        for listener in self.listeners:
+            listener(edit)
+
+
+# Replaces a text widget's command so that edits are reported to Python.
+# Edits are only reported once Tk has accepted them, with their indexes
+# normalised the same way Tk normalises them.
+_PROXY = '''
+rename {%(widget)s} {%(orig)s}
+proc {%(widget)s} args {
+    set op [lindex $args 0]
+    if {$op ni {insert delete replace} || [{%(orig)s} cget -state] eq "disabled"} {
+        return [{%(orig)s} {*}$args]
+    }
+    set last [{%(orig)s} index end-1c]
+    if {$op eq "insert"} {
+        set index [{%(orig)s} index [lindex $args 1]]
+        if {[{%(orig)s} compare $index > $last]} {set index $last}
+        set result [{%(orig)s} {*}$args]
+        %(callback)s insert $index {*}[lrange $args 2 end]
+        return $result
+    }
+    set ranges {}
+    set indexes [lrange $args 1 [expr {$op eq "replace" ? 2 : "end"}]]
+    foreach {index1 index2} $indexes {
+        set start [{%(orig)s} index $index1]
+        if {$index2 eq ""} {
+            set end [{%(orig)s} index "$start +1c"]
+        } else {
+            set end [{%(orig)s} index $index2]
+        }
+        if {[{%(orig)s} compare $end > $last]} {set end $last}
+        if {[{%(orig)s} compare $start > $last]} {set start $last}
+        lappend ranges $start $end
+    }
+    set result [{%(orig)s} {*}$args]
+    if {$op eq "delete"} {
+        %(callback)s delete {*}$ranges
+    } else {
+        %(callback)s replace {*}$ranges {*}[lrange $args 3 end]
+    }
+    return $result
+}
+proc {%(widget)s_batch} ops {
+    if {[{%(orig)s} cget -state] eq "disabled"} return
+    foreach {start end chars} $ops {
+        {%(orig)s} replace $start $end $chars
+    }
+}
+'''
+
+
+class TextMirror:
+    """Keeps a Buffer in step with the content of a Tk text widget.
+
+    The widget's Tcl command is replaced with a proxy which reports each
+    insert, delete and replace to the Buffer. This catches every change to
+    the content, whether it comes from Python, from Tk's class bindings or
+    from Tk's own undo mechanism.
+    """
+
+    def __init__(self, text: tk.Text, buffer: Buffer):
+        """Create a new TextMirror instance.
+
+        Args:
+            text: The text widget to mirror.
+            buffer: The Buffer to apply the text widget's changes to.
+        """
+        self.text = text
+        self.buffer = buffer
+
+        # The name of the widget's original Tcl command. Calling this directly
+        # bypasses the mirror.
+        self.orig = f'{text}_orig'
+
+        callback = text.register(self._on_edit)
+        text.tk.eval(_PROXY % {'widget': text, 'orig': self.orig, 'callback': callback})
+        text.bind('<Destroy>', lambda e: self._uninstall(), add=True)
+
+    def _uninstall(self):
+        for command in (str(self.text), f'{self.text}_batch'):
+            self.text.tk.call('rename', command, '')
+
+    def batch(self, edits: list):
+        """Apply several edits with a single Tcl call, grouped in the Buffer
+        so that they can be undone as a single action.
+
+        The Buffer is updated directly rather than through the proxy, so the
+        cost of an edit at many positions is close to that of an edit at one.
+
+        Args:
+            edits: A list of (start, end, text) tuples, where start and end are
+                normalised 'line.char' indexes of the range to replace with text.
+                Ranges must not overlap. As edits are applied from the end
+                backwards, text may span several lines.
+        """
+        if not edits or self.text.cget('state') == tk.DISABLED:
+            return
+
+        # Apply from the end backwards, so that earlier offsets remain valid
+        resolved = sorted(((self._offset(start), self._offset(end), start, end, text)
+                           for start, end, text in edits), reverse=True)
+
+        with self.buffer.grouped():
+            for start, end, _, _, text in resolved:
+                self.buffer.replace(start, end, text)
+
+        self.text.tk.call(f'{self.text}_batch', tuple(arg for *_, start, end, text in resolved
+                                                      for arg in (start, end, text)))
+
+    def replay(self, edits: list):
+        """Apply edits one after another with a single Tcl call, grouped in
+        the Buffer.
+
+        Args:
+            edits: A list of (start, end, text) tuples, where start and end are
+                offsets of the range to replace with text, in the content as
+                it is once the edits before have been applied.
+        """
+        if not edits or self.text.cget('state') == tk.DISABLED:
+            return
+
+        args = []
+
+        with self.buffer.grouped():
+            for start, end, text in edits:
+                rope = self.buffer.rope
+                args.extend(('{}.{}'.format(*rope.position(start)), '{}.{}'.format(*rope.position(end)), text))
+                self.buffer.replace(start, end, text)
+
+        self.text.tk.call(f'{self.text}_batch', tuple(args))
+
+    def _offset(self, index: str) -> int:
+        line, char = map(int, index.split('.'))
+        return self.buffer.rope.offset(line, char)
+
+    def _on_edit(self, op: str, *args):
+        if op == 'insert':
+            self.buffer.insert(self._offset(args[0]), ''.join(args[1::2]))
+        elif op == 'delete':
+            ranges = [(self._offset(args[i]), self._offset(args[i + 1])) for i in range(0, len(args), 2)]
+            for start, end in reversed(_merge(ranges)):
+                self.buffer.delete(start, end)
+        elif op == 'replace':
+            start, end = self._offset(args[0]), self._offset(args[1])
+            self.buffer.replace(start, max(start, end), ''.join(args[2::2]))
+
+
+def _merge(ranges: list) -> list:
+    """Sort ranges and merge those that overlap, in the way that Tk does for
+    deletions of multiple ranges."""
+    merged = []
+
+    for start, end in sorted(ranges):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+
+    return merged
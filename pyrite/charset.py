@@ -0,0 +1,101 @@
+"""Functionality for detecting the character encoding of a file.
+
+Detection only ever looks at a bounded prefix of the file, so its cost does
+not depend on the size of the file. A byte order mark settles the encoding
+outright. Otherwise the distribution of NUL bytes identifies UTF-16 without
+a byte order mark, valid UTF-8 is taken to be UTF-8, and anything else falls
+back to a single byte encoding.
+"""
+import codecs
+from typing import Optional
+
+# The number of bytes examined when detecting an encoding
+SAMPLE_SIZE = 64 * 1024
+
+# Longest first, so that a UTF-32 BOM isn't mistaken for a UTF-16 one
+BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# Bytes that are unassigned in cp1252
+CP1252_UNDEFINED = frozenset(b'\x81\x8d\x8f\x90\x9d')
+
+# The fraction of bytes at odd or even positions that must be NUL for a
+# sample to be treated as UTF-16
+UTF16_NUL_RATIO = 0.3
+
+
+def sniff(filename: str) -> str:
+    """Detect the encoding of a file from its first few kilobytes.
+
+    Args:
+        filename: The name of the file.
+    Returns: The name of the encoding.
+    """
+    with open(filename, 'rb') as f:
+        sample = f.read(SAMPLE_SIZE)
+
+    return detect(sample, complete=len(sample) < SAMPLE_SIZE)
+
+
+def detect(sample: bytes, complete: bool = False) -> str:
+    """Detect the encoding of some bytes.
+
+    Args:
+        sample: The bytes, normally the start of a file.
+        complete: Whether the sample is the whole file. When False, a multibyte
+            sequence cut off at the end of the sample is not treated as invalid.
+    Returns: The name of the encoding.
+    """
+    encoding = _bom(sample)
+
+    if encoding is None:
+        # Checked before UTF-8, which the NULs of UTF-16 text are valid in
+        encoding = _utf16(sample)
+
+    if encoding is None and _valid_utf8(sample, complete):
+        encoding = 'utf-8'
+
+    if encoding is None:
+        encoding = 'latin-1' if CP1252_UNDEFINED.intersection(sample) else 'cp1252'
+
+    return encoding
+
+
+def _bom(sample: bytes) -> Optional[str]:
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    return None
+
+
+def _valid_utf8(sample: bytes, complete: bool) -> bool:
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=complete)
+    except UnicodeDecodeError:
+        return False
+
+    return True
+
+
+def _utf16(sample: bytes) -> Optional[str]:
+    """Recognise UTF-16 text without a BOM by its NUL bytes, which for mostly
+    ASCII text fall on every other byte."""
+    if len(sample) < 2:
+        return None
+
+    pairs = len(sample) // 2
+    even = sample[0:pairs * 2:2].count(0) / pairs
+    odd = sample[1:pairs * 2:2].count(0) / pairs
+
+    if odd >= UTF16_NUL_RATIO and even < UTF16_NUL_RATIO / 10:
+        return 'utf-16-le'
+    elif even >= UTF16_NUL_RATIO and odd < UTF16_NUL_RATIO / 10:
+        return 'utf-16-be'
+
+    return None
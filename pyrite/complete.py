@@ -0,0 +1,431 @@
+"""Functionality for completing words from those in the open documents.
+
+Words are counted across every open document in a single WordIndex, held as
+a prefix trie with the number of occurrences of each word. The words of a
+document are counted on a background thread once it has loaded. After that,
+each edit recounts only the lines it touched, and the difference is applied
+to the trie. A document's words are dropped when it is closed.
+
+The counts are taken into the trie on the UI thread, a slice at a time, so
+the trie itself never needs locking.
+
+Each node of the trie caches its most frequent words, so looking up
+completions costs the length of the prefix plus a few cached lists, however
+many words are indexed. Edits only invalidate the caches along the path of
+each word changed. Nodes hold their words in a small bucket until it fills,
+and only then split into children keyed by the next character, which keeps
+the trie compact.
+"""
+import heapq
+import logging
+import re
+import threading
+import tkinter as tk
+from collections import Counter
+from itertools import islice
+from time import monotonic
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from pyrite.buffer import Edit, Rope
+
+log = logging.getLogger(__name__)
+
+# Words are identifiers at least this long
+MIN_WORD_LENGTH = 3
+
+WORD = re.compile(r'\b[^\W\d]\w{%d,}' % (MIN_WORD_LENGTH - 1))
+
+# The number of words a trie node holds before splitting into children
+BUCKET_SIZE = 32
+
+# The number of most frequent words cached by each trie node, and so the most
+# completions that can be looked up at once
+TOP_WORDS = 16
+
+# The number of completions shown
+COMPLETIONS = 10
+
+# How long (seconds) a poll may spend taking counted words into the trie, so
+# that indexing a large document never stalls the UI
+POLL_TIME_SLICE = 0.02
+
+# The number of words taken into the trie between checks of the time
+APPLY_BATCH_SIZE = 500
+
+
+def count_words(text: str) -> Counter:
+    """Count the words in some text."""
+    return Counter(WORD.findall(text))
+
+
+def changed_words(edit: Edit) -> Counter:
+    """Get the change an edit made to the number of each word.
+
+    Only the lines the edit touched are counted, before and after it.
+
+    Returns: The difference in the count of each word that changed, which is
+        negative for words removed.
+    """
+    before, after = edit.before, edit.after
+    first, _ = before.position(edit.offset)
+    start = before.line_start(first)
+
+    old_last, _ = before.position(edit.offset + len(edit.removed))
+    new_last, _ = after.position(edit.offset + len(edit.inserted))
+
+    changes = count_words(after.slice(start, after.line_start(new_last + 1)))
+    changes.subtract(count_words(before.slice(start, before.line_start(old_last + 1))))
+    return Counter({word: count for word, count in changes.items() if count})
+
+
+class _Node:
+
+    __slots__ = ('words', 'children', 'top')
+
+    def __init__(self):
+        # Word counts. Before the node splits, these are all the words below
+        # it. After, only the word that ends at the node, if any.
+        self.words: Dict[str, int] = {}
+        self.children: Optional[Dict[str, '_Node']] = None
+        # The most frequent words below the node, best first, or None when
+        # they need working out again
+        self.top: Optional[List[Tuple[str, int]]] = None
+
+
+def _best(items) -> List[Tuple[str, int]]:
+    """The most frequent of some (word, count) items, ties broken
+    alphabetically."""
+    return heapq.nsmallest(TOP_WORDS, items, key=lambda item: (-item[1], item[0]))
+
+
+class Trie:
+    """A prefix trie of words and the number of occurrences of each."""
+
+    def __init__(self):
+        self.root = _Node()
+
+    def _path(self, word: str) -> List[_Node]:
+        """The nodes from the root to the one that holds a word, creating
+        them as needed."""
+        node = self.root
+        path = [node]
+
+        while node.children is not None and len(path) <= len(word):
+            node = node.children.setdefault(word[len(path) - 1], _Node())
+            path.append(node)
+
+        return path
+
+    def add(self, word: str, count: int = 1):
+        """Add occurrences of a word."""
+        path = self._path(word)
+
+        for node in path:
+            node.top = None
+
+        node = path[-1]
+        node.words[word] = node.words.get(word, 0) + count
+
+        if node.children is None and len(node.words) > BUCKET_SIZE:
+            self._split(node, len(path) - 1)
+
+    def _split(self, node: _Node, depth: int):
+        words, node.words, node.children = node.words, {}, {}
+
+        for word, count in words.items():
+            if len(word) == depth:
+                node.words[word] = count
+            else:
+                node.children.setdefault(word[depth], _Node()).words[word] = count
+
+        for child in node.children.values():
+            if len(child.words) > BUCKET_SIZE:
+                self._split(child, depth + 1)
+
+    def remove(self, word: str, count: int = 1):
+        """Remove occurrences of a word. Words whose count drops to zero are
+        removed entirely."""
+        path = self._path(word)
+
+        for node in path:
+            node.top = None
+
+        node = path[-1]
+        remaining = node.words.get(word, 0) - count
+        if remaining > 0:
+            node.words[word] = remaining
+            return
+
+        node.words.pop(word, None)
+
+        # Remove nodes left empty
+        for depth in range(len(path) - 1, 0, -1):
+            node = path[depth]
+            if node.words or node.children:
+                break
+            del path[depth - 1].children[word[depth - 1]]
+
+    def count(self, word: str) -> int:
+        """The number of occurrences of a word."""
+        node = self.root
+        depth = 0
+
+        while node.children is not None and depth < len(word):
+            node = node.children.get(word[depth])
+            if node is None:
+                return 0
+            depth += 1
+
+        return node.words.get(word, 0)
+
+    def complete(self, prefix: str, limit: int = COMPLETIONS) -> List[str]:
+        """Get the most frequent words that start with a prefix, best first.
+
+        Args:
+            prefix: The start of the words.
+            limit: The maximum number of words, which can be no more than
+                TOP_WORDS.
+        Returns: The words, not including the prefix itself.
+        """
+        node = self.root
+        depth = 0
+
+        while node.children is not None and depth < len(prefix):
+            node = node.children.get(prefix[depth])
+            if node is None:
+                return []
+            depth += 1
+
+        if depth < len(prefix):
+            # The node's bucket holds words with other prefixes too
+            candidates = _best(item for item in node.words.items() if item[0].startswith(prefix))
+        else:
+            candidates = self._top(node)
+
+        return [word for word, _ in candidates if word != prefix][:limit]
+
+    def _top(self, node: _Node) -> List[Tuple[str, int]]:
+        if node.top is None:
+            items = list(node.words.items())
+            for child in (node.children or {}).values():
+                items.extend(self._top(child))
+            node.top = _best(items)
+
+        return node.top
+
+
+class Scanner(threading.Thread):
+    """Counts the words in a snapshot of a document on a background thread.
+
+    Once `done` is set, `words` holds the count of each word.
+    """
+
+    def __init__(self, rope: Rope):
+        """Create a new Scanner instance.
+
+        Args:
+            rope: The content to count the words in.
+        """
+        super().__init__(daemon=True)
+        self.rope = rope
+        self.words = Counter()
+        self.done = threading.Event()
+        self._cancelled = False
+
+    def run(self):
+        try:
+            carried = ''
+
+            for chunk in self.rope.chunks():
+                if self._cancelled:
+                    return
+
+                # A word may continue into the next chunk
+                text = carried + chunk
+                end = len(text)
+                while end > 0 and (text[end - 1].isalnum() or text[end - 1] == '_'):
+                    end -= 1
+
+                self.words.update(WORD.findall(text, 0, end))
+                carried = text[end:]
+
+            self.words.update(WORD.findall(carried))
+        except Exception as e:
+            log.error(f'Unable to index words: {e}')
+        finally:
+            self.done.set()
+
+    def cancel(self):
+        self._cancelled = True
+
+
+class _Pending:
+    """A document whose words are being counted, or taken into the trie."""
+
+    __slots__ = ('scanner', 'changes', 'words')
+
+    def __init__(self, scanner: Scanner):
+        self.scanner = scanner
+        # The changes made to the document since the snapshot being counted
+        self.changes = Counter()
+        # The counted words not yet taken into the trie, once counted
+        self.words = None
+
+
+class WordIndex:
+    """The words of a set of documents, for completion.
+
+    Documents are identified by any hashable key. Their content is added
+    with `add()`, which counts the words on a background thread, and edits
+    are passed to `edit()`. Call `poll()` regularly to take in the results
+    of the background counts, a slice at a time.
+    """
+
+    def __init__(self):
+        self.trie = Trie()
+
+        # The count of each word taken into the trie from each document
+        self._counts: Dict[Hashable, Counter] = {}
+
+        # Documents whose words are still to be taken into the trie
+        self._pending: Dict[Hashable, _Pending] = {}
+
+    def add(self, key: Hashable, content: Rope):
+        """Index the words in a document, replacing any indexed already.
+
+        Args:
+            key: Identifies the document.
+            content: The document's content.
+        """
+        self.remove(key)
+
+        scanner = Scanner(content)
+        scanner.start()
+        self._pending[key] = _Pending(scanner)
+        self._counts[key] = Counter()
+
+    def edit(self, key: Hashable, edit: Edit):
+        """Update the index with an edit made to a document. Edits to
+        documents that aren't indexed are ignored."""
+        if key in self._pending:
+            # Applied once the rest of the document's words have been
+            self._pending[key].changes.update(changed_words(edit))
+        elif key in self._counts:
+            self._apply(key, changed_words(edit).items())
+
+    def _apply(self, key: Hashable, changes):
+        counts = self._counts[key]
+
+        for word, change in changes:
+            current = counts[word]
+            updated = max(current + change, 0)
+
+            if updated > current:
+                self.trie.add(word, updated - current)
+            elif updated < current:
+                self.trie.remove(word, current - updated)
+
+            if updated:
+                counts[word] = updated
+            else:
+                del counts[word]
+
+    def remove(self, key: Hashable):
+        """Drop a document's words from the index."""
+        pending = self._pending.pop(key, None)
+        if pending is not None:
+            pending.scanner.cancel()
+
+        for word, count in self._counts.pop(key, {}).items():
+            self.trie.remove(word, count)
+
+    def poll(self, time_limit: float = POLL_TIME_SLICE):
+        """Take in the words of documents that have finished being counted.
+
+        Args:
+            time_limit: Roughly how long (seconds) to spend, after which the
+                remaining words are left for the next poll.
+        """
+        deadline = monotonic() + time_limit
+
+        for key, pending in list(self._pending.items()):
+            if not pending.scanner.done.is_set():
+                continue
+
+            if pending.words is None:
+                pending.words = iter(pending.scanner.words.items())
+
+            while True:
+                batch = list(islice(pending.words, APPLY_BATCH_SIZE))
+                self._apply(key, batch)
+
+                if len(batch) < APPLY_BATCH_SIZE:
+                    del self._pending[key]
+                    self._apply(key, pending.changes.items())
+                    break
+
+                if monotonic() >= deadline:
+                    return
+
+    @property
+    def scanning(self) -> bool:
+        """Whether any documents' words are still being indexed."""
+        return bool(self._pending)
+
+    def complete(self, prefix: str, limit: int = COMPLETIONS) -> List[str]:
+        """Get the most frequent words that start with a prefix, best first,
+        not including the prefix itself."""
+        return self.trie.complete(prefix, limit)
+
+
+class Popup(tk.Toplevel):
+    """Lists completions below the cursor of a text widget, for the user to
+    choose from with the keyboard or mouse."""
+
+    def __init__(self, text: tk.Text, words: List[str], on_choose: callable):
+        """Create a new Popup instance.
+
+        Args:
+            text: The text widget.
+            words: The completions to list.
+            on_choose: Callable that gets invoked with the word chosen.
+        """
+        super().__init__(master=text)
+        self.text = text
+        self.on_choose = on_choose
+        self._closed = False
+
+        self.overrideredirect(True)
+        self.listbox = tk.Listbox(
+            master=self, height=len(words), width=max(map(len, words)) + 1, font=text['font'], activestyle=tk.NONE,
+            exportselection=False
+        )
+        self.listbox.pack(expand=True, fill=tk.BOTH)
+        self.listbox.insert(tk.END, *words)
+        self.listbox.selection_set(0)
+
+        # The cursor has no bounding box when it is out of view
+        text.see(tk.INSERT)
+        text.update_idletasks()
+        x, y, _, height = text.bbox(tk.INSERT) or (0, 0, 0, 0)
+        self.geometry(f'+{text.winfo_rootx() + x}+{text.winfo_rooty() + y + height}')
+
+        for sequence in ('<Return>', '<Tab>', '<Double-Button-1>'):
+            self.listbox.bind(sequence, self.choose)
+        self.listbox.bind('<Escape>', lambda e: self.close())
+        self.listbox.bind('<FocusOut>', lambda e: self.close())
+        self.listbox.focus_set()
+
+    def choose(self, event=None):
+        selection = self.listbox.curselection()
+        word = self.listbox.get(selection[0]) if selection else None
+        self.close()
+        if word is not None:
+            self.on_choose(word)
+        return 'break'
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.text.focus_set()
+            self.destroy()
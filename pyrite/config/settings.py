@@ -1,17 +1,78 @@
-"""Functionality for manipulating application settings."""
+"""Functionality for manipulating application settings.
+
+Parsing YAML is comparatively slow, so the parsed settings are cached in the
+application's data folder. The cache is used for as long as neither the
+default settings nor the user's settings file change.
+"""
 import logging
+import os
+import pickle
 from collections import UserDict
 from io import BytesIO
 from pathlib import Path
-from pkgutil import get_data
+from typing import Optional
 
-import yaml
+from pyrite.config.state import STATE_DIRECTORY
 
 SETTINGS_FILENAME = '.pyrite.settings'
+CACHE_FILENAME = 'settings.cache'
+
+DEFAULTS_PATH = os.path.join(os.path.dirname(__file__), '.pyrite.defaults')
+
+# PyYAML is imported on first use by _yaml(), as it's only needed when the
+# settings cache is out of date or the settings are saved
+yaml = None
 
 log = logging.getLogger(__name__)
 
 
+def _yaml():
+    global yaml
+    if yaml is None:
+        import yaml
+    return yaml
+
+
+def _file_key(path: Path) -> Optional[tuple]:
+    """Get a key that changes whenever a file is modified, or None if the
+    file doesn't exist."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size
+
+
+def read_cache() -> Optional[tuple]:
+    """Read the cached settings.
+
+    Returns: A tuple of the default settings file content, the key of the
+        user settings file, the default settings and the combined settings.
+        None if there's no usable cache.
+    """
+    try:
+        with open(Path('~', STATE_DIRECTORY, CACHE_FILENAME).expanduser(), 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log.warning(f'Unable to read settings cache: {e}')
+        return None
+
+
+def write_cache(cache: tuple):
+    """Write the cached settings, in the form returned by `read_cache()`."""
+    path = Path('~', STATE_DIRECTORY, CACHE_FILENAME).expanduser()
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError as e:
+        log.warning(f'Unable to write settings cache: {e}')
+
+
 class Settings(UserDict):
     """Holds the application wide settings.
 
@@ -32,15 +93,26 @@ class Settings(UserDict):
         self.listeners: list = []
 
     def initialise(self):
-        """Load the settings applying any user overrides."""
-        self.default_settings.update(yaml.load(
-            BytesIO(get_data(__package__, '.pyrite.defaults')), Loader=yaml.SafeLoader
-        ))
+        """Load the settings applying any user overrides.
+
+        The settings are loaded from the cache when it is up to date.
+        """
+        with open(DEFAULTS_PATH, 'rb') as f:
+            defaults = f.read()
+
+        user_path = Path('~', SETTINGS_FILENAME).expanduser()
+        key = _file_key(user_path)
+        cache = read_cache()
+
+        if key is not None and cache is not None and cache[:2] == (defaults, key):
+            self.default_settings.update(cache[2])
+            self.data.update(cache[3])
+            return
+
+        self.default_settings.update(_yaml().load(BytesIO(defaults), Loader=_yaml().SafeLoader))
 
         try:
-            user_settings = yaml.load(
-                Path('~', SETTINGS_FILENAME).expanduser().read_bytes(), Loader=yaml.SafeLoader
-            ) or {}
+            user_settings = _yaml().load(user_path.read_bytes(), Loader=_yaml().SafeLoader) or {}
         except FileNotFoundError:
             user_settings = {}
 
@@ -51,6 +123,8 @@ class Settings(UserDict):
             # Write out the user settings file on first load
             self.save()
 
+        write_cache((defaults, _file_key(user_path), dict(self.default_settings), dict(self.data)))
+
     def getboolean(self, name: str) -> bool:
         """Convenience method for retrieving a boolean value.
 
@@ -122,7 +196,7 @@ class Settings(UserDict):
         Any registered listeners are invoked after the save has completed.
         """
         with open(Path('~', SETTINGS_FILENAME).expanduser(), 'wt') as out:
-            yaml.dump(self.data, out)
+            _yaml().dump(self.data, out)
 
         for listener in self.listeners:
             listener()
@@ -1,9 +1,62 @@
+import logging
+import os
+import queue
+import re
+import threading
 import tkinter as tk
+from itertools import chain
 from pathlib import Path
-from tkinter import ttk
-from typing import NamedTuple
+from time import monotonic
+from tkinter import filedialog, font, messagebox, simpledialog, ttk
+from typing import NamedTuple, Optional
 
-from pyrite import keybindings, settings, theme
+from pyrite import (
+    charset, complete, fileio, find, follow, gutter, hibernate, highlight, instrument, journal, keybindings, largefile,
+    settings, state, theme, undo, watch
+)
+from pyrite.buffer import Buffer, TextMirror
+
+log = logging.getLogger(__name__)
+
+# How often (milliseconds) to check for newly loaded content
+LOAD_POLL_INTERVAL = 10
+
+# The maximum time (seconds) to spend inserting loaded content per poll, so that
+# the UI remains responsive while a large file loads
+LOAD_TIME_SLICE = 0.02
+
+# The number of lines either side of the visible region that a LargeDocument
+# keeps in its text widget
+LARGE_FILE_MARGIN = 200
+
+# How often (milliseconds) to check whether a save has completed
+SAVE_POLL_INTERVAL = 50
+
+# How often (milliseconds) to check the progress of a LargeDocument's line index
+INDEX_POLL_INTERVAL = 200
+
+# How often (milliseconds) to check whether a search of a LargeDocument has
+# found a match
+SEARCH_POLL_INTERVAL = 50
+
+# How often (milliseconds) to check for more Find in Files results
+RESULTS_POLL_INTERVAL = 100
+
+# How often (milliseconds) to check for documents to hibernate
+HIBERNATE_INTERVAL = 60 * 1000
+
+# How often (milliseconds) to check for files changed by other programs
+WATCH_POLL_INTERVAL = 500
+
+# How often (milliseconds) to check whether a reload has completed
+RELOAD_POLL_INTERVAL = 50
+
+# How often (milliseconds) to append text added to a followed file - about
+# once per frame at 30 frames per second
+FOLLOW_POLL_INTERVAL = 33
+
+# How often (milliseconds) to check for documents whose words have been indexed
+COMPLETION_POLL_INTERVAL = 100
 
 
 class Editor(ttk.Notebook):
@@ -22,38 +75,361 @@ class Editor(ttk.Notebook):
 
         self.documents = []
 
-        # Always start with one empty tab
-        self.new()
+        # When each document was last the current document, from monotonic()
+        self.last_active = {}
+
+        # Writes the journals of unsaved edits in the background
+        self.journal_writer = None
+        if settings.getboolean('journal'):
+            self.journal_writer = journal.JournalWriter(interval=settings.getfloat('journal_interval'))
+            self.journal_writer.start()
+
+        self.on_tab_change = on_tab_change
 
-        self.bind('<<NotebookTabChanged>>', lambda e: on_tab_change(self.current_document))
+        # The words in the open documents, for completion
+        self.word_index = complete.WordIndex() if settings.getboolean('word_completion') else None
+
+        # Notices when open files are changed by other programs
+        self.watcher = None
+        if settings.getboolean('watch_files'):
+            self.watcher = watch.Watcher(interval=settings.getfloat('watch_interval'))
+            self.watcher.start()
+
+        # Reopen the documents from the previous session, or start with one
+        # empty tab
+        if not self.restore_session():
+            self.new()
+
+        if self.journal_writer is not None:
+            self.recover()
+
+        self.bind('<<NotebookTabChanged>>', self.tab_changed)
+        self.after(HIBERNATE_INTERVAL, self.check_hibernation)
+        if self.watcher is not None:
+            self.after(WATCH_POLL_INTERVAL, self.check_files)
+        if self.word_index is not None:
+            self.after(COMPLETION_POLL_INTERVAL, self.check_words)
         self.bind(keybindings.CLOSE_TAB_MOUSE, lambda e: self.close_tab(f'@{e.x},{e.y}'))
 
-    def new(self):
-        """Create a new document in the editor."""
-        doc = Document(master=self, on_cursor=lambda: None, on_change=lambda: None)
-        doc.pack(expand=True, fill=tk.BOTH)
+    def new(self, document_class: type = None):
+        """Create a new document in the editor.
+
+        Args:
+            document_class: The type of document to create. Defaults to Document.
+        """
+        doc = self.create_document(document_class)
         self.add(doc, text=doc.name)
         self.documents.append(doc)
         # Display the new document (make the tab active by selecting it)
         self.select(self.tabs()[-1])
 
-    def open(self, filename: str, encoding: str = 'utf-8'):
+    def create_document(self, document_class: type = None):
+        """Create a document without adding it to a tab.
+
+        Args:
+            document_class: The type of document to create. Defaults to Document.
+        Returns: The document.
+        """
+        document_class = document_class or Document
+        doc = document_class(master=self, on_cursor=lambda: None, on_change=lambda: None, on_status=self.update_tab)
+        doc.pack(expand=True, fill=tk.BOTH)
+        if doc.journal is not None:
+            self.journal_writer.add(doc.journal)
+        if doc.mirrored and self.word_index is not None:
+            doc.index_words(self.word_index)
+        return doc
+
+    @staticmethod
+    def document_class(filename: str) -> type:
+        """Get the type of document used to open a file.
+
+        Files larger than the 'large_file_threshold_mb' setting are opened
+        in a read-only LargeDocument, unless compressed, as a LargeDocument
+        maps the file's bytes directly.
+        """
+        if os.path.getsize(filename) >= settings.getint('large_file_threshold_mb') * 1024 * 1024 and \
+                fileio.sniff_compression(filename) is None:
+            return LargeDocument
+
+        return Document
+
+    def open(self, filename: str, encoding: str = None, line: int = None):
         """Open a document into the editor from a file.
 
+        Files larger than the 'large_file_threshold_mb' setting are opened
+        in a read-only LargeDocument.
+
         Args:
             filename: The filename of the document to open.
-            encoding: The character encoding of the document.
+            encoding: The character encoding of the document. Detected from
+                the start of the file when omitted.
+            line: Optional line number to move the cursor to.
         """
-        if not self.current_document.empty:
+        if self.document_class(filename) is LargeDocument:
+            empty = self.current_document if self.current_document.empty else None
+            self.new(LargeDocument)
+            if empty is not None:
+                self.close_tab(str(empty))
+        elif not self.current_document.empty:
             # Empty tabs can be reused, but otherwise a new tab is created for the new document
             self.new()
         self.current_document.load(filename, encoding)
-        self.tab('current', text=self.current_document.name)
 
-    def save(self, filename: str = None, encoding: str = 'utf-8'):
+        if line is not None:
+            self.current_document.goto(line)
+
+    def select_file(self, filename: str, line: int = None) -> bool:
+        """Select the tab of a file, if it's already open.
+
+        Args:
+            filename: The filename of the document to select.
+            line: Optional line number to move the cursor to.
+        Returns: True if the file was open, False otherwise.
+        """
+        for document in self.documents:
+            try:
+                if document.filename and os.path.samefile(document.filename, filename):
+                    break
+            except OSError:
+                pass
+        else:
+            return False
+
+        self.select(document)
+        if isinstance(document, Placeholder):
+            document = self.materialise(document)
+
+        if line is not None:
+            document.goto(line)
+
+        return True
+
+    def toggle_follow(self):
+        """Start or stop following the current document's file as it grows."""
+        self.current_document.toggle_follow()
+
+    def save(self, filename: str = None, encoding: str = None):
         """Save the current document."""
         self.current_document.save(filename, encoding)
-        self.tab('current', text=self.current_document.name)
+        self.update_tab(self.current_document)
+
+    def find(self):
+        """Show the find bar of the current document, or prompt for a
+        pattern to find in a large document."""
+        if self.current_document.find_bar is not None:
+            self.current_document.find_bar.show()
+        elif isinstance(self.current_document, LargeDocument):
+            self.current_document.ask_find()
+
+    def find_in_files(self, folder: str, pattern: str, regex: bool = False, match_case: bool = False):
+        """Search the files within a folder, showing the results in a new tab.
+
+        Args:
+            folder: The folder to search.
+            pattern: The text to search for.
+            regex: Whether the text is a regular expression rather than a literal.
+            match_case: Whether the search is case sensitive.
+        """
+        from pyrite import findinfiles  # Deferred, as it pulls in multiprocessing
+
+        self.new(FindResults)
+        self.current_document.start(
+            folder,
+            findinfiles.compile_pattern(pattern, regex, match_case),
+            on_open=lambda filename, line: self.open(filename, line=line),
+        )
+
+    def show_performance(self):
+        """Show what the instrumentation has recorded in a new tab."""
+        self.new(PerformanceReport)
+        self.current_document.refresh()
+
+    def save_session(self):
+        """Remember the open files, and the cursor and scroll position within
+        each, so that they can be reopened by `restore_session()`."""
+        documents = [document for document in self.documents if document.filename is not None]
+        current = self.current_document
+
+        state['session'] = {
+            'documents': [document.session() for document in documents],
+            'current': documents.index(current) if current in documents else 0,
+        }
+        state.save()
+
+    def restore_session(self) -> bool:
+        """Reopen the files that were open when the application last exited.
+
+        Only the current tab's document is loaded straight away. The others
+        are represented by placeholders, which are replaced with documents
+        when their tabs are first selected.
+
+        Returns: True if any files were reopened, False otherwise.
+        """
+        session = state.get('session') or {}
+        current = None
+
+        for i, document in enumerate(session.get('documents', [])):
+            if os.path.isfile(document['filename']):
+                placeholder = Placeholder(master=self, **document)
+                self.add(placeholder, text=placeholder.title)
+                self.documents.append(placeholder)
+                if current is None or i == session.get('current'):
+                    current = placeholder
+
+        if current is not None:
+            self.select(current)
+            self.materialise(current)
+
+        return current is not None
+
+    def materialise(self, placeholder: 'Placeholder'):
+        """Replace a placeholder with a document, loaded from its file or from
+        the content held by the placeholder.
+
+        Returns: The document.
+        """
+        index = self.documents.index(placeholder)
+        selected = self.select() == str(placeholder)
+
+        try:
+            document_class = Document if placeholder.content is not None else self.document_class(placeholder.filename)
+        except OSError:
+            # Let the document report the file as missing when it loads
+            document_class = Document
+
+        document = self.create_document(document_class)
+        self.documents[index] = document
+        self.insert(index, document, text=document.name)
+
+        if selected:
+            # Selected before the placeholder is removed, so that the notebook
+            # doesn't select, and so materialise, a neighbouring tab
+            self.select(document)
+
+        self.forget(placeholder)
+
+        if placeholder.content is not None:
+            document.restore(
+                placeholder.filename, placeholder.encoding, placeholder.content.text(), history=placeholder.history
+            )
+        else:
+            document.load(placeholder.filename, placeholder.encoding)
+            if placeholder.history is not None:
+                document.adopt_history(placeholder.history, placeholder.disk_state)
+        document.restore_position(placeholder.cursor, placeholder.top)
+
+        # The document has taken over journaling any unsaved changes
+        if placeholder.journal is not None:
+            self.journal_writer.remove(placeholder.journal)
+        placeholder.destroy()
+
+        return document
+
+    def hibernate(self, document: 'Document'):
+        """Replace a document with a placeholder, releasing its text widget.
+
+        The document is reloaded from its file when its tab is next selected.
+        If it has unsaved changes, its content is compressed and held by the
+        placeholder instead, and its journal kept going. Its undo history is
+        held either way, and taken over again if the file is unchanged.
+        """
+        index = self.documents.index(document)
+        content = None
+        journal_ = None
+
+        if document.modified:
+            content = hibernate.CompressedText(document.buffer.snapshot())
+            # Keep the unsaved changes recoverable while hibernated
+            journal_, document.journal = document.journal, None
+
+        placeholder = Placeholder(
+            master=self, **document.session(), content=content, modified=document.modified, journal=journal_,
+            history=document.export_history(), disk_state=document.disk_state
+        )
+        self.documents[index] = placeholder
+        # Otherwise the document, and all it holds, would be kept alive
+        self.last_active.pop(document, None)
+        self.insert(index, placeholder, text=placeholder.title)
+        self.forget(document)
+        if document.journal is not None:
+            self.journal_writer.remove(document.journal)
+        document.destroy()
+
+        log.debug(f'Hibernated {placeholder.name}')
+
+    def check_hibernation(self):
+        """Hibernate documents that have been inactive for too long, or that
+        take the inactive documents over the memory budget."""
+        current = self.current_document
+        candidates = [
+            hibernate.Candidate(
+                document, self.last_active.get(document, 0), len(document.buffer) * hibernate.BYTES_PER_CHAR
+            )
+            for document in self.documents
+            if type(document) is Document and document is not current and not document.empty
+            and not document.loading and not document.saving and not document.partial and not document.replaced
+            and not document.following
+        ]
+
+        for document in hibernate.select(
+            candidates,
+            now=monotonic(),
+            idle_limit=settings.getfloat('hibernate_after_minutes') * 60,
+            budget=settings.getint('hibernate_budget_mb') * 1024 * 1024,
+        ):
+            self.hibernate(document)
+
+        self.after(HIBERNATE_INTERVAL, self.check_hibernation)
+
+    def check_files(self):
+        """Reload documents whose files have been changed by other programs,
+        and keep the watcher up to date with the files that are open."""
+        while True:
+            try:
+                filename, _ = self.watcher.changes.get_nowait()
+            except queue.Empty:
+                break
+
+            for document in self.documents:
+                if isinstance(document, Document) and document.filename == filename:
+                    document.file_changed()
+
+        self.watcher.watch({
+            document.filename: document.disk_state
+            for document in self.documents
+            if isinstance(document, Document) and document.watching and not document.following
+        })
+        self.after(WATCH_POLL_INTERVAL, self.check_files)
+
+    def check_words(self):
+        """Take in the words of documents that have been indexed."""
+        self.word_index.poll()
+        # Sooner while there are words left to take in
+        self.after(LOAD_POLL_INTERVAL if self.word_index.scanning else COMPLETION_POLL_INTERVAL, self.check_words)
+
+    def tab_changed(self, event=None):
+        if isinstance(self.current_document, Placeholder):
+            self.materialise(self.current_document)
+
+        self.last_active[self.current_document] = monotonic()
+        self.on_tab_change(self.current_document)
+
+    def recover(self):
+        """Restore any documents that had unsaved changes when the application
+        last exited abnormally."""
+        for recovered in journal.recover():
+            if not self.current_document.empty:
+                self.new()
+            self.current_document.restore(recovered.filename, recovered.encoding, recovered.content)
+            self.current_document.set_status('recovered')
+            recovered.path.unlink()
+
+    def update_tab(self, document):
+        """Refresh the tab title of the specified document."""
+        try:
+            self.tab(document, text=document.title)
+        except tk.TclError:
+            pass  # Not yet added to the notebook
 
     @property
     def current_document(self):
@@ -62,21 +438,93 @@ class Editor(ttk.Notebook):
 
     def close_tab(self, tab_id):
         if tab_id:
-            # TODO perform save checks
             if len(self.tabs()) > 1:
                 try:
                     index = self.index(tab_id)
                 except tk.TclError:
                     return
                 else:
-                    self.documents.pop(index)
-                    self.forget(tab_id)
+                    document = self.documents[index]
+                    self.confirm_close([document], lambda closed: self.remove(closed[0]))
             else:
                 self.exit()
 
+    def remove(self, document):
+        """Remove a document from the editor without checking for unsaved changes."""
+        self.documents.remove(document)
+        self.last_active.pop(document, None)
+        self.forget(document)
+        if document.journal is not None:
+            self.journal_writer.remove(document.journal)
+        document.destroy()
+
+    def destroy(self):
+        if self.watcher is not None:
+            self.watcher.close()
+        super().destroy()
+
     def exit(self):
-        # TODO perform save checks
-        self.master.destroy()
+        """Close the application, offering to save any modified documents first."""
+        def close(closed):
+            self.save_session()
+            self.master.destroy()
+
+        self.confirm_close(self.documents, close)
+
+    def confirm_close(self, documents: list, close: callable):
+        """Offer to save any modified documents before they are closed.
+
+        Args:
+            documents: The documents about to be closed.
+            close: Callable that gets invoked with the documents when they can
+                be closed - because none were modified, the user chose not to
+                save them or they were all saved successfully. Hibernated
+                documents that were woken to be saved are passed in place of
+                their placeholders. It is not invoked if the user cancels or a
+                save fails.
+        """
+        modified = [document for document in documents if document.modified]
+
+        if not modified:
+            close(documents)
+            return
+
+        names = ', '.join(document.name for document in modified)
+        answer = messagebox.askyesnocancel('Save Changes', f'Save changes to {names}?', parent=self)
+
+        if answer is None:
+            return
+        elif not answer:
+            close(documents)
+            return
+
+        # Hibernated documents are woken so that they can be saved
+        woken = {d: self.materialise(d) for d in modified if isinstance(d, Placeholder)}
+        modified = [woken.get(d, d) for d in modified]
+        documents = [woken.get(d, d) for d in documents]
+
+        filenames = {}
+        for document in modified:
+            if document.filename is None or document.partial or document.replaced:
+                filename = filedialog.asksaveasfilename(
+                    initialfile=document.name,
+                    title=f'Save {document.name} As',
+                    parent=self,
+                )
+                if not filename:
+                    return
+                filenames[document] = filename
+
+        remaining = len(modified)
+
+        def saved():
+            nonlocal remaining
+            remaining -= 1
+            if not remaining:
+                close(documents)
+
+        for document in modified:
+            document.save(filenames.get(document), document.encoding, on_saved=saved)
 
 
 class Document(tk.Frame):
@@ -87,21 +535,146 @@ class Document(tk.Frame):
 
     encoding: str = 'UTF-8'
 
-    def __init__(self, master: tk.Widget, on_cursor: callable, on_change: callable):
+    # The compression format of the file, or None if it isn't compressed
+    compression: str = None
+
+    # Short description of any background activity, shown on the tab
+    status: str = None
+
+    # Whether changes to the text widget are mirrored into the document's buffer
+    mirrored: bool = True
+
+    # Whether line numbers can be shown alongside the text
+    numbered: bool = True
+
+    def __init__(self, master: tk.Widget, on_cursor: callable, on_change: callable, on_status: callable):
+        """Create a new Document instance.
+
+        Args:
+            master: The parent widget.
+            on_cursor: Callable that gets invoked when the cursor moves.
+            on_change: Callable that gets invoked when the content changes.
+            on_status: Callable that gets invoked when the status of the document
+                changes, e.g. during loading, or when it becomes modified or
+                unmodified. The callable will be passed this Document instance.
+        """
         super().__init__(master=master)
 
+        self.on_status = on_status
+
+        # The Loader responsible for streaming in content, when loading
+        self._loader = None
+        self._load_job = None
+
+        # Whether a load was cancelled before all content was read
+        self.partial = False
+        # Whether invalid characters in the file were replaced when loading,
+        # so that saving over it would lose the original bytes
+        self.replaced = False
+
+        # The Saver writing the document to disk, and the content it is
+        # writing, when saving
+        self._saver = None
+        self._saved = None
+        self._save_job = None
+        # Whether another save was requested while saving
+        self._save_again = False
+        # Callables to invoke once the document has been saved
+        self._on_saved = []
+        # Callables to invoke once loading completes
+        self._on_loaded = []
+
+        # Whether the file is watched for changes made by other programs, and
+        # its state when last read or written
+        self.watching = False
+        self.disk_state = None
+        # The Reloader diffing the file against the content, when reloading
+        self._reloader = None
+        self._reload_job = None
+
+        # The size (bytes) of the file when last loaded or saved
+        self.file_size = None
+
+        # Whether the content has lines too long for Tk to lay out quickly,
+        # so that the document is in a protective mode
+        self.protected = False
+
+        # The shared index of words the document contributes to, if any
+        self.word_index = None
+        # The Follower reading text appended to the file, when following
+        self._follower = None
+        self._follow_job = None
+
         self.text = tk.Text(
             master=self,
             wrap=tk.WORD if settings.getboolean('word_wrap') else tk.NONE,
-            undo=True,
+            # Undo is handled by the document's UndoHistory
+            undo=False,
         )
         self.text.config(**theme.textconfig)
         self.text.pack(expand=True, fill=tk.BOTH)
 
+        # Shows the numbers of the visible lines
+        self.gutter = None
+        if self.numbered and settings.getboolean('line_numbers'):
+            self.gutter = gutter.Gutter(master=self, text=self.text)
+            self.gutter.pack(side=tk.LEFT, fill=tk.Y, before=self.text)
+
         self.text.focus()
 
+        # The document's content, kept in step with the text widget
+        self.buffer = Buffer()
+        self.mirror = TextMirror(self.text, self.buffer) if self.mirrored else None
+
+        # Undoes and redoes edits, within a memory budget
+        self.history = None
+        if self.mirrored:
+            self.history = undo.UndoHistory(
+                self.buffer, self.mirror.replay, budget=settings.getint('undo_budget_mb') * 1024 * 1024
+            )
+            self.buffer.on_edit(self.history.record)
+            self.text.bind('<<Undo>>', self.undo)
+            self.text.bind('<<Redo>>', self.redo)
+
+        # The number of edits made to the document
+        self.modifications = 0
+        # The content when the document was last loaded or saved, and the
+        # state of the undo history then
+        self._clean = self.buffer.snapshot()
+        self._clean_step = self.history.top if self.history is not None else None
+        self._modified = False
+        self.buffer.on_edit(self._on_edit)
+        if self.gutter is not None:
+            # An edit can change the numbers shown without scrolling the view
+            self.buffer.on_edit(lambda edit: self.gutter.schedule())
+
+        # Records unsaved edits so that they can be recovered after a crash
+        self.journal = None
+        if self.mirrored and settings.getboolean('journal'):
+            self.journal = journal.Journal(compact_size=settings.getint('journal_compact_size_mb') * 1024 * 1024)
+            self.buffer.on_edit(self.journal.record)
+            self.journal.start()
+
+        # Highlights the syntax of the visible region
+        self.highlighter = None
+        if self.mirrored and settings.getboolean('syntax_highlighting'):
+            self.highlighter = highlight.Highlighter(self.text, self.buffer)
+
+        # Finds and replaces text, shown on demand
+        self.find_bar = None
+        if self.mirrored:
+            self.find_bar = find.FindBar(self, self.text, self.buffer, self.mirror)
+            self.text.bind(keybindings.FIND, self.find_bar.show)
+            self.text.bind(keybindings.FIND_NEXT, lambda e: self.find_bar.next())
+            self.text.bind(keybindings.FIND_PREVIOUS, lambda e: self.find_bar.previous())
+            self.text.config(yscrollcommand=self.on_scroll)
+
         # Enable column editing
-        ColumnEditor(self.text)
+        self.column_editor = ColumnEditor(self.text, self.mirror)
+
+        self.text.bind(keybindings.CANCEL, self.cancel_load, add=True)
+        self.text.bind(keybindings.GOTO_LINE, self.ask_goto)
+        self.text.bind(keybindings.FOLLOW, self.toggle_follow)
 
     @property
     def name(self) -> str:
@@ -110,37 +683,753 @@ class Document(tk.Frame):
 
         return self.defaultname
 
-    def load(self, filename: str = None, encoding: str = 'UTF-8'):
-        """Load this document's content disk.
+    @property
+    def title(self) -> str:
+        """The text to display on this document's tab."""
+        title = f'*{self.name}' if self.modified else self.name
+
+        if self.status:
+            return f'{title} ({self.status})'
+
+        return title
+
+    @property
+    def modified(self) -> bool:
+        """Whether the content has changed since the document was last loaded
+        or saved. This is a constant time check."""
+        return self._modified
+
+    def _on_edit(self, edit):
+        self.modifications += 1
+        self._update_modified()
+
+    def _update_modified(self):
+        if self._loader is not None:
+            # Content being loaded doesn't count as a modification
+            return
+
+        modified = self.buffer.snapshot() is not self._clean
+
+        if modified != self._modified:
+            self._modified = modified
+            self.on_status(self)
+
+    def mark_clean(self, content=None):
+        """Record the content the document is to be compared against when
+        checking whether it has been modified.
+
+        Args:
+            content: The content, as a Rope. Defaults to the current content.
+        """
+        self._clean = self.buffer.snapshot() if content is None else content
+
+        if self.history is not None:
+            # Undoing or redoing back to this point makes the document clean
+            # again, provided the content marked is the current content
+            current = content is None or content is self.buffer.snapshot()
+            self._clean_step = self.history.checkpoint() if current else None
+
+        self._update_modified()
+
+    def undo(self, event=None):
+        """Undo the latest edit."""
+        if self.history is not None and self.text.cget('state') != tk.DISABLED:
+            self._moved_through_history(self.history.undo())
+        return 'break'
+
+    def redo(self, event=None):
+        """Redo the latest edit undone."""
+        if self.history is not None and self.text.cget('state') != tk.DISABLED:
+            self._moved_through_history(self.history.redo())
+        return 'break'
+
+    def _moved_through_history(self, offset: int = None):
+        if offset is None:
+            return
+
+        self.text.mark_set(tk.INSERT, '{}.{}'.format(*self.buffer.rope.position(offset)))
+        self.text.see(tk.INSERT)
+
+        if self.history.top is self._clean_step:
+            self._clean = self.buffer.snapshot()
+            self._update_modified()
+
+    def on_scroll(self, first: str, last: str):
+        """Invoked by the text widget when its view changes."""
+        if self.gutter is not None:
+            self.gutter.schedule()
+
+        if self.highlighter is not None:
+            self.highlighter.show()
+
+        if self.find_bar is not None and self.find_bar.visible:
+            self.find_bar.show_matches()
+
+    def index_words(self, index: complete.WordIndex):
+        """Contribute the document's words to a shared index, keeping them up
+        to date as the document changes, and complete words from the index.
+
+        Args:
+            index: The index.
+        """
+        self.word_index = index
+        self.buffer.on_edit(self._index_edit)
+        self.text.bind(keybindings.COMPLETE, self.complete)
+
+        if not self.loading:
+            index.add(self, self.buffer.snapshot())
+
+    def _index_edit(self, edit):
+        # Content being loaded is indexed in one go once loaded
+        if self._loader is None:
+            self.word_index.edit(self, edit)
+
+    def complete(self, event=None):
+        """Complete the word before the cursor from the words in the index.
+        A single completion is inserted straight away, otherwise they are
+        listed for the user to choose from."""
+        if self.word_index is None or self.text.cget('state') == tk.DISABLED:
+            return 'break'
+
+        line, char = map(int, self.text.index(tk.INSERT).split('.'))
+        match = re.search(r'\w+$', self.buffer.rope.line(line)[:char])
+        if match is None:
+            return 'break'
+
+        prefix = match.group()
+        words = self.word_index.complete(prefix)
+
+        def insert(word):
+            self.text.insert(tk.INSERT, word[len(prefix):])
+            self.text.see(tk.INSERT)
+
+        if len(words) == 1:
+            insert(words[0])
+        elif words:
+            complete.Popup(self.text, words, on_choose=insert)
+
+        return 'break'
+
+    def update_language(self):
+        """Highlight the syntax of the language the filename suggests."""
+        if self.highlighter is not None:
+            self.highlighter.language = None if self.protected else highlight.language_for(self.filename)
+
+    def protect(self, protected: bool = True):
+        """Switch the protective mode for content with very long lines on or
+        off.
+
+        Tk lays out a line in full whenever any of it is displayed, and slows
+        to a crawl on lines hundreds of kilobytes long, particularly when
+        wrapping at word boundaries. The protective mode wraps such lines at
+        any character, or not at all, and turns off syntax highlighting.
+        """
+        if protected and not self.protected:
+            log.info(f'Long lines in {self.name}, turning off word wrap and syntax highlighting')
+
+        self.protected = protected
+
+        if protected:
+            wrap = tk.CHAR if settings.getboolean('long_line_wrap') else tk.NONE
+        else:
+            wrap = tk.WORD if settings.getboolean('word_wrap') else tk.NONE
+
+        self.text.config(wrap=wrap)
+        self.update_language()
+
+    @staticmethod
+    def too_long(longest: int) -> bool:
+        """Whether content whose longest line is of the given length needs
+        the protective mode."""
+        threshold = settings.getint('long_line_threshold')
+        return 0 < threshold <= longest
+
+    def set_status(self, status: str = None):
+        """Set the status of this document, or clear it when status is None."""
+        self.status = status
+        self.on_status(self)
+
+    def load(self, filename: str = None, encoding: str = None):
+        """Load this document's content from disk.
+
+        The file is read and decoded on a background thread and its content
+        fed into the text widget in chunks, so that the UI remains responsive
+        while large files load. Progress is reported through the document's
+        status. Loading can be cancelled with `cancel_load()`.
+
+        Files compressed with gzip, bzip2 or xz are decompressed as they are
+        read, without expanding them on disk.
 
         Args:
             filename: The name of the file.
+            encoding: The file encoding, or None to detect it from the start
+                of the file.
+        """
+        self.cancel_load()
+        self.cancel_reload()
+        self.stop_following()
+
+        self.filename = filename
+        self.encoding = encoding
+        self.partial = False
+        self.replaced = False
+        self.watching = False
+        self._on_loaded = []
+
+        if self.journal is not None:
+            self.journal.stop()
+
+        # The new content is indexed once loaded
+        if self.word_index is not None:
+            self.word_index.remove(self)
+
+        # Loading is not an undoable action
+        if self.history is not None:
+            self.history.reset(enabled=False)
+        self.text.delete('1.0', tk.END)
+        # The document is read-only until loading completes
+        self.text.config(state=tk.DISABLED)
+        # Until the new content is found to have long lines
+        self.protect(False)
+
+        self._loader = fileio.Loader(filename, encoding, chunk_size=settings.getint('load_chunk_size'))
+        self._loader.start()
+        self.set_status('0%')
+        self._poll_load()
+
+    @property
+    def loading(self) -> bool:
+        """Whether content is currently being loaded into this document."""
+        return self._loader is not None
+
+    def _poll_load(self):
+        """Insert any content read by the loader so far."""
+        deadline = monotonic() + LOAD_TIME_SLICE
+        progress = None
+
+        while monotonic() < deadline:
+            try:
+                chunk = self._loader.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if isinstance(chunk, Exception):
+                # The loader has already logged the error
+                self._finish_load()
+                self.partial = True
+                self.set_status('error')
+                return
+
+            # Before the text is displayed, as the loader measures it before
+            # handing it over
+            if not self.protected and self.too_long(self._loader.longest_line):
+                self.protect()
+
+            self.text.config(state=tk.NORMAL)
+            self.text.insert(tk.END, chunk.text)
+            self.text.config(state=tk.DISABLED)
+            progress = chunk.progress
+
+            if chunk.last:
+                # The loader may have detected the encoding
+                self.encoding = self._loader.encoding
+                self.compression = self._loader.compression
+                self.file_size = self._loader.offset
+                self.replaced = self._loader.replaced
+                self._finish_load()
+                if self.replaced:
+                    log.warning(f'Invalid {self.encoding} characters replaced in {self.filename}')
+                    self.set_status('invalid characters replaced')
+                if self.journal is not None:
+                    self.journal.start(self.filename, self.encoding)
+                self.watch_file()
+                on_loaded, self._on_loaded = self._on_loaded, []
+                for callback in on_loaded:
+                    callback()
+                return
+
+        if progress is not None:
+            self.set_status(f'{int(progress * 100)}%')
+
+        self._load_job = self.after(LOAD_POLL_INTERVAL, self._poll_load)
+
+    def _finish_load(self):
+        self._loader = None
+        self._load_job = None
+        self.text.config(state=tk.NORMAL)
+        if self.history is not None:
+            self.history.reset()
+        if self.word_index is not None:
+            self.word_index.add(self, self.buffer.snapshot())
+        self.mark_clean()
+        self.set_status(None)
+
+    def cancel_load(self, event=None):
+        """Stop loading content into this document.
+
+        Content already loaded is kept, but the document is marked as partial
+        so that it can't be saved over the original file.
+        """
+        if self._loader is not None:
+            self._loader.cancel()
+            self.after_cancel(self._load_job)
+            self._finish_load()
+            self.partial = True
+            self.set_status('partial')
+
+    def destroy(self):
+        if self._loader is not None:
+            self._loader.cancel()
+
+        if self._follower is not None:
+            self._follower.cancel()
+
+        # Any save in progress is left to complete in the background
+        for job in (self._load_job, self._save_job, self._reload_job, self._follow_job):
+            if job is not None:
+                self.after_cancel(job)
+
+        if self.journal is not None:
+            self.journal.close()
+
+        if self.highlighter is not None:
+            self.highlighter.close()
+
+        if self.word_index is not None:
+            self.word_index.remove(self)
+
+        super().destroy()
+
+    def restore(self, filename: str, encoding: str, content, history: tuple = None):
+        """Restore unsaved content, recovered from a journal or held while
+        the document was hibernated, into this document.
+
+        Args:
+            filename: The filename the content belongs to, or None if it
+                has never been saved.
             encoding: The file encoding.
+            content: The unsaved content.
+            history: The undo history of the content, as returned by
+                `export_history()`, if it was kept.
+        """
+        self.filename = filename
+        self.encoding = encoding
+        self.compression = fileio.sniff_compression(filename) if filename is not None else None
+        content = str(content)
+        self.protect(self.too_long(fileio.line_lengths(content)[0]))
+
+        if self.history is not None:
+            self.history.reset(enabled=False)
+        if self.word_index is not None:
+            # Indexed in the background rather than as an edit
+            self.word_index.remove(self)
+        self.text.delete('1.0', tk.END)
+        self.text.insert('1.0', content)
+        if self.history is not None:
+            self.history.reset()
+        if history is not None:
+            self.adopt_history(history)
+        if self.word_index is not None:
+            self.word_index.add(self, self.buffer.snapshot())
+
+        # The content has never been saved
+        self._clean = None
+        self._update_modified()
+
+        if self.journal is not None:
+            self.journal.start(filename, encoding, content=self.buffer.snapshot())
+            self.journal.flush()
+
+        if filename is not None:
+            self.watch_file()
+
+    def export_history(self) -> Optional[tuple]:
+        """Get the undo history, for `restore()` or `adopt_history()` to take
+        over, or None if the document has none."""
+        if self.history is None:
+            return None
+
+        return self.history.export(), self._clean_step
+
+    def adopt_history(self, history: tuple, disk_state: watch.FileState = None):
+        """Take over an undo history returned by `export_history()`, which was
+        recorded against the current content.
+
+        Args:
+            history: The undo history.
+            disk_state: The state of the file the history was recorded
+                against. A document that is still loading takes over the
+                history once loaded, and only if its file is in this state.
+        """
+        if self.loading:
+            self._on_loaded.append(lambda: self.adopt_history(history, disk_state))
+            return
+
+        if self.history is None or (disk_state is not None and disk_state != self.disk_state):
+            return
+
+        steps, self._clean_step = history
+        self.history.adopt(steps)
+
+    def watch_file(self):
+        """Start watching the file for changes made by other programs, from
+        its current state."""
+        self.disk_state = watch.stat(self.filename)
+        self.watching = True
+
+    def file_changed(self):
+        """Invoked when the file may have been changed by another program."""
+        if not self.watching or self.loading or self.saving or self.partial or self.following or \
+                self._reloader is not None:
+            return
+
+        state = watch.stat(self.filename)
+        if state == self.disk_state:
+            return
+
+        self.disk_state = state
+
+        if state is None:
+            self.set_status('deleted')
+        else:
+            self.reload()
+
+    def reload(self):
+        """Bring the content up to date with the file, after it has been
+        changed by another program.
+
+        The file is diffed against the content on a background thread, and
+        only the lines that differ are replaced, as a single undoable action.
+        The user is asked first if there are unsaved changes.
         """
-        with open(filename, 'rt', encoding=encoding) as f:
-            content = f.read()
+        if self.modified and not messagebox.askyesno(
+                'File Changed', f'{self.name} has been changed by another program. Reload it and lose your changes?',
+                parent=self):
+            return
+
+        self._reloader = watch.Reloader(self.filename, self.encoding, self.buffer.snapshot())
+        self._reloader.start()
+        self.set_status('reloading')
+        self._poll_reload()
+
+    def _poll_reload(self):
+        """Check whether the reload is ready to apply."""
+        if not self._reloader.done.is_set():
+            self._reload_job = self.after(RELOAD_POLL_INTERVAL, self._poll_reload)
+            return
+
+        reloader, self._reloader = self._reloader, None
+        self._reload_job = None
+
+        if reloader.error is not None:
+            self.set_status('reload failed')
+            return
+
+        if self.buffer.snapshot() is not reloader.content:
+            # Edited while the file was being diffed
+            self.set_status(None)
+            self.reload()
+            return
+
+        rope = reloader.content
+        self.mirror.batch([
+            ('{}.{}'.format(*rope.position(start)), '{}.{}'.format(*rope.position(end)), text)
+            for start, end, text in reloader.hunks
+        ])
+        self.mark_clean()
+        if self.journal is not None:
+            self.journal.start(self.filename, self.encoding)
+        self.set_status(None)
+
+        # Changed again while reloading
+        self.file_changed()
+
+    def cancel_reload(self):
+        if self._reloader is not None:
+            self.after_cancel(self._reload_job)
+            self._reloader = None
+            self._reload_job = None
+
+    def follow(self):
+        """Follow the file as it grows, appending text as it's added, in the
+        manner of `tail -f`.
+
+        Only the bytes appended since the file was loaded or saved are read.
+        The document is read-only while following. Appended text is inserted
+        at most once per frame, and the view scrolls to show it if it was at
+        the end already. Only the last 'follow_max_lines' lines are kept, so
+        memory use is bounded however long the document follows the file.
+        Compressed files can't be followed.
+        """
+        if self.loading:
+            self._on_loaded.append(self.follow)
+            return
+
+        if self.following or self.filename is None or self.partial or self.compression is not None:
+            return
+
+        if self.modified or self.file_size is None:
+            if not messagebox.askyesno(
+                    'Follow', f'Discard your changes to {self.name} and follow it?', parent=self):
+                return
+            self.load(self.filename, self.encoding)
+            self._on_loaded.append(self.follow)
+            return
+
+        self.cancel_reload()
+
+        if self.journal is not None:
+            self.journal.stop()
+
+        # Appended text is not an undoable action
+        if self.history is not None:
+            self.history.reset(enabled=False)
+        self.text.config(state=tk.DISABLED)
+
+        self._follower = follow.Follower(self.filename, self.encoding, self.file_size)
+        self._follower.start()
+        self.set_status('following')
+        self._poll_follow()
+
+    @property
+    def following(self) -> bool:
+        """Whether this document is following its file as it grows."""
+        return self._follower is not None
+
+    def _poll_follow(self):
+        """Append any text read by the follower since the last frame."""
+        deadline = monotonic() + LOAD_TIME_SLICE
+        reset = False
+        parts = []
+
+        while monotonic() < deadline:
+            try:
+                item = self._follower.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if isinstance(item, Exception):
+                # The follower has already logged the error
+                self.stop_following()
+                self.set_status('error')
+                return
+
+            if item is follow.RESET:
+                reset, parts = True, []
+            else:
+                parts.append(item.text)
+                self.file_size = item.offset
+
+        if reset or parts:
+            self._append(''.join(parts), reset)
+
+        self._follow_job = self.after(FOLLOW_POLL_INTERVAL, self._poll_follow)
+
+    def _append(self, text: str, reset: bool):
+        max_lines = settings.getint('follow_max_lines')
+        if max_lines:
+            text = follow.tail(text, max_lines)
+
+        at_end = self.text.yview()[1] >= 1.0
 
+        self.text.config(state=tk.NORMAL)
+        if reset:
             self.text.delete('1.0', tk.END)
-            self.text.insert(tk.END, content)
+        self.text.insert(tk.END, text)
+        # Keep max_lines complete lines, plus any incomplete last line
+        excess = self.buffer.lines - max_lines - 1
+        if max_lines and excess > 0:
+            self.text.delete('1.0', f'{excess + 1}.0')
+        self.text.config(state=tk.DISABLED)
+
+        # The content follows the file, so isn't a modification
+        self.mark_clean()
+
+        if at_end:
+            self.text.see(tk.END)
+
+    def stop_following(self):
+        """Stop following the file, making the document editable again."""
+        if self._follower is None:
+            return
+
+        self._follower.cancel()
+        self.after_cancel(self._follow_job)
+        self._follower = None
+        self._follow_job = None
+
+        self.text.config(state=tk.NORMAL)
+        if self.history is not None:
+            self.history.reset()
+        self.mark_clean()
+
+        if self.journal is not None:
+            # Earlier lines may have been dropped, so the file isn't a valid base
+            self.journal.start(self.filename, self.encoding, content=self.buffer.snapshot())
+
+        self.watch_file()
+        self.set_status(None)
+
+    def toggle_follow(self, event=None):
+        """Start or stop following the file as it grows."""
+        if self.following:
+            self.stop_following()
+        else:
+            self.follow()
+        return 'break'
 
-            self.filename = filename
+    def goto(self, line: int):
+        """Move the cursor to the start of a line and scroll it into view.
+
+        Args:
+            line: The line number, starting from 1.
+        """
+        if self.loading:
+            # Go to the line once it has been loaded
+            self._on_loaded.append(lambda: self.goto(line))
+            return
 
-    def save(self, filename: str = None, encoding: str = 'UTF-8'):
+        self.text.mark_set(tk.INSERT, f'{line}.0')
+        self.text.see(tk.INSERT)
+
+    def session(self) -> dict:
+        """Get what's needed to reopen this document in a later session."""
+        line, char = map(int, self.text.index(tk.INSERT).split('.'))
+        top = int(self.text.index('@0,0').split('.')[0])
+
+        return {'filename': self.filename, 'encoding': self.encoding, 'cursor': (line, char), 'top': top}
+
+    def restore_position(self, cursor: tuple, top: int):
+        """Restore the cursor and scroll position, once loading completes.
+
+        Args:
+            cursor: The line and character position of the cursor.
+            top: The line at the top of the view.
+        """
+        if self.loading:
+            self._on_loaded.append(lambda: self.restore_position(cursor, top))
+            return
+
+        self.text.mark_set(tk.INSERT, '{}.{}'.format(*cursor))
+        self.text.yview(f'{top}.0')
+
+    def ask_goto(self, event=None):
+        """Prompt for a line number and move the cursor to it."""
+        line = simpledialog.askinteger('Go to Line', 'Line:', parent=self, minvalue=1)
+        if line is not None:
+            self.goto(line)
+        return 'break'
+
+    def save(self, filename: str = None, encoding: str = None, on_saved: callable = None):
         """Save this document to a file.
 
+        A snapshot of the content is written on a background thread, so that
+        the UI remains responsive when saving large files. The file is replaced
+        atomically, so a failure part way through never leaves a truncated
+        file behind. The document's status shows that it is saving until the
+        save completes.
+
+        A file that was compressed is compressed again in the same format.
+        Saving to a new filename compresses according to its extension.
+
+        A document that is still loading is saved once loading completes, so
+        that the whole content is written. The save is dropped if loading is
+        cancelled.
+
+        A document that was only partly loaded, or whose invalid characters
+        were replaced when loading, can only be saved to a new file.
+
         Args:
             filename: The filename to save the document to. This can be omitted
                 if the document already has a filename associated with it.
-            encoding: The file encoding to use.
+            encoding: The file encoding to use. Defaults to the encoding the
+                document was loaded with.
+            on_saved: Optional no-args callable that gets invoked once the
+                save has completed successfully.
         """
         if filename is None and self.filename is None:
             raise RuntimeError('No filename set')
 
+        if self.loading:
+            self._on_loaded.append(lambda: self.save(filename, encoding, on_saved))
+            return
+
+        if self.partial and filename in (None, self.filename):
+            raise RuntimeError('Cannot save a partially loaded document over its original file')
+
+        if self.replaced and filename in (None, self.filename):
+            raise RuntimeError('Cannot save a document with replaced characters over its original file')
+
         if filename is not None:
+            if filename != self.filename:
+                self.compression = fileio.compression_for(filename)
             self.filename = filename
+            self.partial = False
+            self.replaced = False
+            self.update_language()
+
+        if encoding is not None:
+            self.encoding = encoding
+
+        if on_saved is not None:
+            self._on_saved.append(on_saved)
+
+        if self._saver is not None:
+            # Save the latest content once the current save completes
+            self._save_again = True
+            return
 
-        with open(self.filename, 'wt', encoding=encoding) as f:
-            f.write(self.text.get('1.0', tk.END + '-1c'))
+        self._saved = self.buffer.snapshot()
+        self._saver = fileio.Saver(self.filename, self.encoding, self._saved.chunks(), self.compression)
+        self._saver.start()
+        self.set_status('saving')
+        self._poll_save()
+
+    @property
+    def saving(self) -> bool:
+        """Whether this document is currently being saved."""
+        return self._saver is not None
+
+    def _poll_save(self):
+        """Check whether the save has completed."""
+        if not self._saver.done.is_set():
+            self._save_job = self.after(SAVE_POLL_INTERVAL, self._poll_save)
+            return
+
+        error = self._saver.error
+        self._saver = None
+        self._save_job = None
+
+        if error is None and self.journal is not None:
+            if self.buffer.snapshot() is self._saved:
+                self.journal.start(self.filename, self.encoding)
+            else:
+                # Edits were made during the save, so the file isn't a valid base
+                self.journal.start(self.filename, self.encoding, content=self.buffer.snapshot())
+
+        if error is None:
+            self.mark_clean(self._saved)
+            self.watch_file()
+            self.file_size = self.disk_state.size if self.disk_state is not None else None
+
+        if error is not None:
+            self._save_again = False
+            self._on_saved = []
+            self.set_status('save failed')
+            messagebox.showerror('Save Failed', f'Unable to save {self.filename}: {error}', parent=self)
+        elif self._save_again:
+            self._save_again = False
+            self.save(encoding=self.encoding)
+        else:
+            self.set_status(None)
+            on_saved, self._on_saved = self._on_saved, []
+            for callback in on_saved:
+                callback()
+
+    @property
+    def lines(self) -> int:
+        """The number of lines in this document."""
+        return self.buffer.lines
 
     @property
     def empty(self):
@@ -149,7 +1438,521 @@ class Document(tk.Frame):
 
         Returns: True if empty, False otherwise.
         """
-        return not len(self.text.get('1.0', 'end-1c')) and self.filename is None
+        return not len(self.buffer) and self.filename is None
+
+
+class LargeDocument(Document):
+    """A read-only Document for viewing files that are too large to load
+    into memory.
+
+    The file is memory mapped and a LineIndex built over it on a background
+    thread. Only the lines around the visible region are held in the text
+    widget, and these are swapped for others as the user scrolls. The cost
+    of scrolling, goto-line and displaying search results therefore depends
+    on the size of the window rather than the size of the file. Searches run
+    over the memory map on a background thread.
+
+    Lines are always displayed unwrapped, so that each line in the file
+    occupies exactly one display line.
+    """
+
+    # The text widget only ever holds a window onto the file
+    mirrored = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.index = None
+
+        # The line number (from zero) of the first line in the text widget
+        self.first = 0
+        # The number of lines in the text widget
+        self.window = 0
+
+        self._render_job = None
+        self._index_job = None
+
+        # The compiled pattern last searched for, and the search in progress
+        self.pattern = None
+        self._search = None
+        self._search_job = None
+
+        self.linespace = font.Font(font=self.text['font']).metrics('linespace')
+
+        self.scrollbar = ttk.Scrollbar(master=self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y, before=self.text)
+
+        self.text.config(wrap=tk.NONE, state=tk.DISABLED, yscrollcommand=self.on_text_scroll)
+
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.text.bind(sequence, self.on_mouse_wheel)
+        self.text.bind('<Prior>', lambda e: self.yview(tk.SCROLL, -1, tk.PAGES))
+        self.text.bind('<Next>', lambda e: self.yview(tk.SCROLL, 1, tk.PAGES))
+        self.text.bind('<Configure>', lambda e: self.render(self.top))
+        self.text.bind(keybindings.FIND, self.ask_find)
+        self.text.bind(keybindings.FIND_NEXT, self.find_next)
+
+    def load(self, filename: str = None, encoding: str = None):
+        """Map a file into this document.
+
+        Args:
+            filename: The name of the file.
+            encoding: The file encoding, which must be ASCII compatible, or
+                None to detect it from the start of the file.
+        """
+        self.close_index()
+
+        self.filename = filename
+        self.encoding = encoding or charset.sniff(filename)
+        self.index = largefile.LineIndex(filename)
+        self.watch_file()
+
+        threading.Thread(target=self.index.build, daemon=True).start()
+
+        self.render(0)
+        self._poll_index()
+
+    def _poll_index(self):
+        """Report the progress of the line index until it is complete."""
+        self.update_scrollbar()
+
+        if self.index.complete:
+            self._index_job = None
+            self.set_status(None)
+        else:
+            self.set_status(f'indexing {int(self.index.progress * 100)}%')
+            self._index_job = self.after(INDEX_POLL_INTERVAL, self._poll_index)
+
+    @property
+    def lines(self) -> int:
+        """The number of lines that can currently be navigated to."""
+        return max(self.index.available, 1) if self.index else 1
+
+    @property
+    def visible(self) -> int:
+        """The number of lines that fit in the text widget."""
+        return max(self.text.winfo_height() // self.linespace, 1)
+
+    @property
+    def top(self) -> int:
+        """The line number (from zero) of the first visible line."""
+        return self.first + int(self.text.index('@0,0').split('.')[0]) - 1
+
+    def render(self, top: int):
+        """Fill the text widget with the lines around a line.
+
+        Args:
+            top: The line number (from zero) to display at the top of the view.
+        """
+        if self.index is None:
+            return
+
+        self._render_job = None
+
+        visible = self.visible
+        top = max(min(top, self.lines - visible), 0)
+        first = max(top - LARGE_FILE_MARGIN, 0)
+        count = min(visible + LARGE_FILE_MARGIN * 2, self.lines - first)
+
+        cursor = self.first + int(self.text.index(tk.INSERT).split('.')[0]) - 1
+
+        content = self.index.read(first, count).decode(self.encoding, errors='replace')
+        if content.endswith('\n') and first + count < self.lines:
+            content = content[:-1]
+
+        self.text.config(state=tk.NORMAL)
+        self.text.delete('1.0', tk.END)
+        self.text.insert('1.0', content)
+        self.text.config(state=tk.DISABLED)
+
+        self.first = first
+        self.window = count
+
+        if self.gutter is not None:
+            self.gutter.first = first + 1
+            self.gutter.lines = self.lines
+            self.gutter.schedule()
+
+        if first <= cursor < first + count:
+            self.text.mark_set(tk.INSERT, f'{cursor - first + 1}.0')
+        self.text.yview(f'{top - first + 1}.0')
+
+    def on_text_scroll(self, first: str, last: str):
+        """Called when the view of the text widget changes. Swaps in new lines
+        when the view gets close to the edge of those currently loaded."""
+        self.update_scrollbar()
+
+        if self.gutter is not None:
+            self.gutter.schedule()
+
+        if self._render_job is not None or self.index is None:
+            return
+
+        top = self.top - self.first
+        bottom = top + self.visible
+        threshold = LARGE_FILE_MARGIN // 2
+
+        if (top < threshold and self.first > 0) or \
+                (bottom > self.window - threshold and self.first + self.window < self.lines):
+            self._render_job = self.after_idle(lambda: self.render(self.top))
+
+    def update_scrollbar(self):
+        if self.index is not None:
+            top = self.top
+            self.scrollbar.set(top / self.lines, min((top + self.visible) / self.lines, 1.0))
+
+    def yview(self, *args):
+        """Scroll the document in response to the scrollbar or keyboard.
+
+        Args take the same form as those passed by a scrollbar to its command.
+        """
+        if args[0] == tk.MOVETO:
+            self.render(int(float(args[1]) * self.lines))
+        elif args[0] == tk.SCROLL:
+            amount = int(args[1])
+            if args[2] == tk.PAGES:
+                amount *= self.visible
+            self.render(self.top + amount)
+
+        return 'break'
+
+    def on_mouse_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            return self.yview(tk.SCROLL, -3, tk.UNITS)
+        return self.yview(tk.SCROLL, 3, tk.UNITS)
+
+    def goto(self, line: int):
+        line = min(max(line, 1), self.lines) - 1
+        self.render(line - self.visible // 2)
+        self.text.mark_set(tk.INSERT, f'{line - self.first + 1}.0')
+
+    def ask_find(self, event=None):
+        """Prompt for a regular expression and find its next match after the
+        cursor."""
+        pattern = simpledialog.askstring('Find', 'Regular expression:', parent=self)
+
+        if pattern:
+            try:
+                self.pattern = re.compile(pattern.encode(self.encoding))
+            except (re.error, UnicodeEncodeError) as e:
+                messagebox.showerror('Find', f'Invalid pattern: {e}', parent=self)
+            else:
+                self.find_next()
+
+        return 'break'
+
+    def find_next(self, event=None):
+        """Find the next match of the last pattern after the cursor, on a
+        background thread."""
+        if self.pattern is None or self.index is None:
+            return 'break'
+
+        self.cancel_search()
+
+        line, char = map(int, self.text.index(tk.INSERT).split('.'))
+        prefix = self.text.get(f'{line}.0', f'{line}.{char}')
+        start = self.index.offset(self.first + line - 1) + len(prefix.encode(self.encoding))
+
+        self._search = largefile.Search(self.index, self.pattern, start)
+        self._search.start()
+        self.set_status('searching')
+        self._poll_search()
+        return 'break'
+
+    def _poll_search(self):
+        """Select the match once the search has finished."""
+        if not self._search.done.is_set():
+            self._search_job = self.after(SEARCH_POLL_INTERVAL, self._poll_search)
+            return
+
+        match, self._search, self._search_job = self._search.match, None, None
+
+        if match is None:
+            self.set_status('not found')
+        else:
+            self.set_status(None)
+            self.select(*match)
+
+    def select(self, start: int, end: int):
+        """Select a range of bytes within a line, scrolling it into view."""
+        line = self.index.line_at(start)
+        self.goto(line + 1)
+
+        row = line - self.first + 1
+        line_start = self.index.offset(line)
+        start, end = (
+            len(self.index.mm[line_start:offset].decode(self.encoding, errors='replace')) for offset in (start, end)
+        )
+
+        self.text.tag_remove(tk.SEL, '1.0', tk.END)
+        self.text.tag_add(tk.SEL, f'{row}.{start}', f'{row}.{end}')
+        self.text.mark_set(tk.INSERT, f'{row}.{end}')
+        self.text.see(tk.INSERT)
+
+    def cancel_search(self):
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+            self._search_job = None
+
+        if self._search is not None:
+            self._search.cancel()
+            self._search = None
+
+    def session(self) -> dict:
+        line, char = map(int, self.text.index(tk.INSERT).split('.'))
+
+        return {
+            'filename': self.filename,
+            'encoding': self.encoding,
+            'cursor': (self.first + line, char),
+            'top': self.first + 1,
+        }
+
+    def restore_position(self, cursor: tuple, top: int):
+        self.render(top - 1)
+        self.text.mark_set(tk.INSERT, f'{cursor[0] - self.first}.{cursor[1]}')
+
+    def save(self, filename: str = None, encoding: str = None):
+        raise RuntimeError('Large files are opened read-only')
+
+    def reload(self):
+        """Index the lines appended to the file, or if it was otherwise
+        changed, map it afresh. The view is kept where it was."""
+        if self.index is not None and self.index.complete and self.index.grow():
+            threading.Thread(target=self.index.build, daemon=True).start()
+            self._poll_index()
+            return
+
+        session = self.session()
+        self.load(self.filename, self.encoding)
+        self.restore_position(session['cursor'], session['top'])
+
+    @property
+    def empty(self):
+        return self.index is None
+
+    def close_index(self):
+        self.cancel_search()
+
+        if self._index_job is not None:
+            self.after_cancel(self._index_job)
+            self._index_job = None
+
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+    def destroy(self):
+        self.close_index()
+        super().destroy()
+
+
+class Placeholder(ttk.Frame):
+    """Stands in for a document until its tab is selected, either because it
+    was reopened from a previous session or because it has been hibernated.
+    This avoids holding a text widget and content for every tab."""
+
+    empty = False
+
+    partial = False
+
+    find_bar = None
+
+    def __init__(self, master: tk.Widget, filename: str = None, encoding: str = None, cursor: tuple = (1, 0),
+                 top: int = 1, content: hibernate.CompressedText = None, modified: bool = False,
+                 journal: journal.Journal = None, history: tuple = None, disk_state: watch.FileState = None):
+        """Create a new Placeholder instance.
+
+        Args:
+            master: The parent widget.
+            filename: The name of the file.
+            encoding: The file encoding, or None to detect it.
+            cursor: The line and character position of the cursor.
+            top: The line at the top of the view.
+            content: The document's content, when it differs from the file.
+            modified: Whether the document has unsaved changes.
+            journal: The journal of the document's unsaved changes.
+            history: The document's undo history.
+            disk_state: The state of the document's file when its undo
+                history was taken.
+        """
+        super().__init__(master=master)
+        self.filename = filename
+        self.encoding = encoding
+        self.cursor = cursor
+        self.top = top
+        self.content = content
+        self.modified = modified
+        self.journal = journal
+        self.history = history
+        self.disk_state = disk_state
+
+    @property
+    def name(self) -> str:
+        if self.filename:
+            return Path(self.filename).name
+
+        return Document.defaultname
+
+    @property
+    def title(self) -> str:
+        return f'*{self.name}' if self.modified else self.name
+
+    def session(self) -> dict:
+        return {'filename': self.filename, 'encoding': self.encoding, 'cursor': self.cursor, 'top': self.top}
+
+    def destroy(self):
+        if self.journal is not None:
+            self.journal.close()
+        super().destroy()
+
+
+class FindResults(Document):
+    """A read-only document listing the results of a search across files.
+
+    Results are appended as they stream in. Double clicking a result, or
+    pressing Return on it, opens the file at the matching line.
+    """
+
+    defaultname = 'Find Results'
+
+    mirrored = False
+
+    numbered = False
+
+    def __init__(self, master: tk.Widget, on_cursor: callable, on_change: callable, on_status: callable):
+        super().__init__(master, on_cursor, on_change, on_status)
+        self.text.config(state=tk.DISABLED)
+
+        self.search = None
+        self.on_open = None
+        self.matches = 0
+        self._poll_job = None
+        # The filename and line number of each line of results, or None for
+        # lines that are not results
+        self.locations = [None]
+
+        self.text.bind('<Double-Button-1>', lambda e: self.open(f'@{e.x},{e.y}'))
+        self.text.bind('<Return>', lambda e: self.open(tk.INSERT))
+        self.text.bind(keybindings.CANCEL, lambda e: self.cancel(), add=True)
+
+    def start(self, folder: str, pattern, on_open: callable):
+        """Start searching.
+
+        Args:
+            folder: The folder to search.
+            pattern: The compiled bytes pattern to search for.
+            on_open: Callable that gets invoked with the filename and line
+                number of a result to open it.
+        """
+        self.on_open = on_open
+        self.defaultname = f'Find: {pattern.pattern.decode("utf-8", errors="replace")}'
+        self.append(f'Searching {folder}\n\n', [None, None])
+
+        from pyrite import findinfiles
+
+        self.search = findinfiles.FileSearch(folder, pattern, settings.getint('find_in_files_workers'))
+        self.search.start()
+        self._poll()
+
+    def _poll(self):
+        deadline = monotonic() + LOAD_TIME_SLICE
+        lines = []
+        locations = []
+        finished = False
+
+        while monotonic() < deadline:
+            try:
+                result = self.search.results.get_nowait()
+            except queue.Empty:
+                break
+
+            if result is None:
+                finished = True
+                break
+
+            filename, matches = result
+            self.matches += len(matches)
+            lines.append(filename)
+            locations.append(None)
+            for match in matches:
+                lines.append(f'{match.line:>6}: {match.text}')
+                locations.append((filename, match.line))
+            lines.append('')
+            locations.append(None)
+
+        if lines:
+            self.append('\n'.join(lines) + '\n', locations)
+
+        if finished:
+            # After the last results, so that the summary comes at the end
+            self._finish()
+        else:
+            self.set_status(f'{self.search.searched} files')
+            self._poll_job = self.after(RESULTS_POLL_INTERVAL, self._poll)
+
+    def _finish(self):
+        cancelled = self.search.cancelled
+        self.append(f'{self.matches} matches in {self.search.searched} files{" (cancelled)" if cancelled else ""}\n',
+                    [None])
+        self.search = None
+        self._poll_job = None
+        self.set_status('cancelled' if cancelled else None)
+
+    def append(self, text: str, locations: list):
+        self.text.config(state=tk.NORMAL)
+        self.text.insert(tk.END, text)
+        self.text.config(state=tk.DISABLED)
+        self.locations[-1:-1] = locations
+
+    def open(self, index: str):
+        line = int(self.text.index(index).split('.')[0])
+
+        if line <= len(self.locations) and self.locations[line - 1] is not None:
+            self.on_open(*self.locations[line - 1])
+
+        return 'break'
+
+    def cancel(self):
+        """Stop searching. Results found so far are kept."""
+        if self.search is not None:
+            self.search.cancel()
+
+    def save(self, filename: str = None, encoding: str = None, on_saved: callable = None):
+        raise RuntimeError('Find results cannot be saved')
+
+    @property
+    def empty(self):
+        return False
+
+    def destroy(self):
+        self.cancel()
+        if self._poll_job is not None:
+            self.after_cancel(self._poll_job)
+        super().destroy()
+
+
+class PerformanceReport(Document):
+    """A read-only document showing what the instrumentation has recorded
+    about the responsiveness of the UI."""
+
+    defaultname = 'Performance'
+
+    mirrored = False
+
+    numbered = False
+
+    def __init__(self, master: tk.Widget, on_cursor: callable, on_change: callable, on_status: callable):
+        super().__init__(master, on_cursor, on_change, on_status)
+        self.text.config(state=tk.DISABLED)
+        self.text.bind(keybindings.REFRESH, lambda e: self.refresh())
+
+    def refresh(self):
+        """Show the latest report."""
+        self.text.config(state=tk.NORMAL)
+        self.text.delete('1.0', tk.END)
+        self.text.insert('1.0', instrument.monitor.report() if instrument.monitor else 'Instrumentation is off\n')
+        self.text.config(state=tk.DISABLED)
 
 
 class Index(NamedTuple):
@@ -160,15 +1963,30 @@ class Index(NamedTuple):
 class ColumnEditor:
     """Use to handle column editing within a text widget."""
 
-    INSERTION_MARK_PREFIX = 'markinsert'
+    CURSOR_TAG = 'columncursor'
+
+    def __init__(self, text: tk.Text, mirror: TextMirror = None):
+        """Create a new ColumnEditor instance.
 
-    def __init__(self, text: tk.Text):
+        Args:
+            text: The text widget to enable column editing on.
+            mirror: The TextMirror of the text widget, used to edit all lines
+                of a column at once. Column editing is read-only without one.
+        """
         # The text widget we're acting on
         self.text = text
+        self.mirror = mirror
 
         # Whether column editing is active
         self.active = False
 
+        # The column cursors, as a mapping of line number to character position
+        self.cursors = {}
+
+        # The block selection, as a mapping of line number to the start and end
+        # character positions selected on that line
+        self.selection = {}
+
         # The starting line and column when column editing begins
         self.start_line = None
         self.start_char = None
@@ -238,83 +2056,77 @@ class ColumnEditor:
         """Update the text widget to display the column highlight and
         block selection.
 
+        Only the lines whose highlight or selection differ from the previous
+        update are touched, and the tags for all of them are changed with a
+        constant number of Tcl calls. The cost of dragging out a tall block
+        therefore depends on how much of it changes, not on its height.
+
         Args:
             index: An index in the format 'line.char'
         """
         if not self.active:
             self.active = True
-
-        # Clear any existing highlight and selection
-        self.remove_highlight()
-        self.text.tag_remove(tk.SEL, '0.0', tk.END)
+            self.text.tag_config(self.CURSOR_TAG, background=theme.textconfig['insertbackground'])
+            self.text.tag_raise(self.CURSOR_TAG)
+            self.text.tag_remove(tk.SEL, '1.0', tk.END)
 
         # Ensure the cursor is moved to the current index
         self.text.mark_set(tk.INSERT, index)
 
         current_index = self.index_as_tuple(index)
-        lines_moved = current_index.line - self.start_line
-        chars_moved = current_index.char - self.start_char
 
-        # Add selection for the current row
-        args = f'{current_index.line}.{self.start_char}', tk.INSERT
-        if chars_moved < 0:
-            args = reversed(args)
+        # There's a column cursor on each line from the starting line up to,
+        # but not including, the line holding the insertion cursor
+        if current_index.line >= self.start_line:
+            lines = range(self.start_line, current_index.line)
+        else:
+            lines = range(current_index.line + 1, self.start_line + 1)
 
-        self.text.tag_add(tk.SEL, *args)
+        cursors = dict.fromkeys(lines, current_index.char)
 
-        for i in range(abs(lines_moved)):
-            if lines_moved < 0:
-                i = i * -1  # Moving up the page
+        # Block selection is implemented by layering multiple single line selections
+        columns = tuple(sorted((self.start_char, current_index.char)))
+        first_line, last_line = sorted((self.start_line, current_index.line))
+        selection = dict.fromkeys(range(first_line, last_line + 1), columns)
 
-            index = f'{self.start_line + i}.{current_index.char}'
+        self.retag(self.CURSOR_TAG, self.cursors, cursors, lambda line, char: (f'{line}.{char}', f'{line}.{char}+1c'))
+        self.retag(tk.SEL, self.selection, selection, lambda line, cols: (f'{line}.{cols[0]}', f'{line}.{cols[1]}'))
 
-            # Add the column highlight
-            self.highlight_index(index)
+        self.cursors = cursors
+        self.selection = selection
 
-            # Block selection is implemented by layering multiple single line selections
-            args = f'{self.start_line + i}.{self.start_char}', index
-            if chars_moved < 0:
-                args = reversed(args)
+    def retag(self, tag: str, old: dict, new: dict, ranges: callable):
+        """Apply the difference between two sets of per-line tag ranges.
 
-            self.text.tag_add(tk.SEL, *args)
+        Args:
+            tag: The name of the tag.
+            old: Mapping of line number to the position of the tag currently on
+                that line.
+            new: Mapping of line number to the position of the tag to be on
+                that line.
+            ranges: Callable that takes a line number and a position, and
+                returns the start and end indexes of the tag on that line.
+        """
+        removed = [line for line, pos in old.items() if new.get(line) != pos]
+        added = [line for line, pos in new.items() if old.get(line) != pos]
 
-    def highlight_index(self, index: str):
-        """Highlight the specified index."""
-        name = f'{self.INSERTION_MARK_PREFIX}_{index}'
-        self.text.tag_add(name, index)
-        self.text.mark_set(name, index)
-        self.text.tag_config(
-            name,
-            background=theme.textconfig['insertbackground'],
-        )
+        if removed:
+            self.text.tk.call(self.text, 'tag', 'remove', tag, *line_spans(removed))
 
-    def remove_highlight(self):
-        """Remove the column highlight."""
-        for name in self.text.mark_names():
-            if name.startswith(self.INSERTION_MARK_PREFIX):
-                self.text.tag_remove(name, '0.0', tk.END)
-                self.text.mark_unset(name)
+        if added:
+            indexes = chain.from_iterable(ranges(line, new[line]) for line in added)
+            self.text.tk.call(self.text, 'tag', 'add', tag, *indexes)
 
-    def highlight_names(self):
-        """Return an iterator of current highlight names."""
-        for name in self.text.mark_names():
-            if name.startswith(self.INSERTION_MARK_PREFIX):
-                yield name
+    def cursor_indices(self):
+        """Return an iterator of the indexes of the column cursors."""
+        for line, char in self.cursors.items():
+            yield f'{line}.{char}'
 
     def insert(self, event):
         """Insert the character represented by the event into a
         highlighted column."""
         if self.active and event.char:
-            self.delete_selected_chars()
-
-            for name in self.highlight_names():
-                self.text.insert(name, event.char)
-
-            self.text.insert(tk.INSERT, event.char)
-            # Reset the starting position
-            self.start_char = self.index_as_tuple(tk.INSERT).char
-            self.update(self.text.index(f'{tk.INSERT}'))
-
+            self.edit(event.char)
             return 'break'
 
     def backspace(self, event):
@@ -322,17 +2134,7 @@ class ColumnEditor:
         from a highlighted column.
         """
         if self.active:
-            if not self.delete_selected_chars():
-                for name in self.highlight_names():
-                    index = self.text.index(name)
-                    self.text.delete(f'{index}-1c', index)
-
-                self.text.delete(f'{tk.INSERT}-1c', tk.INSERT)
-
-            # Reset the starting position
-            self.start_char = self.index_as_tuple(tk.INSERT).char
-            self.update(self.text.index(f'{tk.INSERT}'))
-
+            self.edit(before=1)
             return 'break'
 
     def delete(self, event):
@@ -340,35 +2142,50 @@ class ColumnEditor:
         from a highlighted column.
         """
         if self.active:
-            if not self.delete_selected_chars():
-                for name in self.highlight_names():
-                    index = self.text.index(name)
-                    self.text.delete(index, f'{index}+1c')
-
-                self.text.delete(tk.INSERT, f'{tk.INSERT}+1c')
+            self.edit(after=1)
+            return 'break'
 
-            # Reset the starting position
-            self.start_char = self.index_as_tuple(tk.INSERT).char
-            self.update(self.text.index(f'{tk.INSERT}'))
+    def edit(self, text: str = '', before: int = 0, after: int = 0):
+        """Make the same edit on every line of the highlighted column.
 
-            return 'break'
+        The edits for all lines are worked out in Python from the document's
+        buffer and applied to the text widget with a single Tcl call, as a
+        single undoable action.
 
-    def delete_selected_chars(self) -> bool:
-        """Delete characters that are currently selected from a
-        highighted column.
+        If there is a block selection, the selected characters on each line
+        are replaced with text. Otherwise text is inserted at each column
+        cursor after deleting the specified number of characters either side
+        of it. Deletions never extend beyond the start or end of a line.
 
-        Returns: True if selected characters were deleted, False otherwise.
+        Args:
+            text: The text to insert.
+            before: The number of characters to delete before each cursor.
+            after: The number of characters to delete after each cursor.
         """
-        if self.text.tag_ranges(tk.SEL):
-            start_sel = self.index_as_tuple(tk.SEL_FIRST)
-            end_sel = self.index_as_tuple(tk.SEL_LAST)
+        if self.mirror is None:
+            return
 
-            for line in range(start_sel.line, end_sel.line + 1):
-                self.text.delete(f'{line}.{start_sel.char}', f'{line}.{end_sel.char}')
+        rope = self.mirror.buffer.snapshot()
+        first_char, last_char = next(iter(self.selection.values()))
+        edits = []
 
-            return True
+        for line in self.selection:
+            length = rope.line_length(line)
 
-        return False
+            if first_char < last_char:
+                start, end = min(first_char, length), min(last_char, length)
+            else:
+                char = min(first_char, length)
+                start, end = max(char - before, 0), min(char + after, length)
+
+            if start < end or text:
+                edits.append((f'{line}.{start}', f'{line}.{end}', text))
+
+        self.mirror.batch(edits)
+
+        # Reset the starting position
+        self.start_char = self.index_as_tuple(tk.INSERT).char
+        self.update(self.text.index(tk.INSERT))
 
     def deactivate(self, event):
         """Deactivate column editing."""
@@ -376,8 +2193,10 @@ class ColumnEditor:
             self.active = False
             self.start_line = None
             self.start_char = None
-            self.remove_highlight()
-            self.text.tag_remove(tk.SEL, '0.0', tk.END)
+            self.text.tag_remove(self.CURSOR_TAG, '1.0', tk.END)
+            self.text.tag_remove(tk.SEL, '1.0', tk.END)
+            self.cursors = {}
+            self.selection = {}
             return 'break'
 
     def index_as_tuple(self, index: str) -> Index:
@@ -385,6 +2204,20 @@ class ColumnEditor:
         return Index(*map(int, self.text.index(index).split('.')))
 
 
+def line_spans(lines: list) -> list:
+    """Convert a list of line numbers into a flat list of start and end
+    indexes covering those lines, with consecutive lines combined."""
+    spans = []
+
+    for line in sorted(lines):
+        if spans and spans[-1][1] == line:
+            spans[-1][1] = line + 1
+        else:
+            spans.append([line, line + 1])
+
+    return [f'{line}.0' for span in spans for line in span]
+
+
 def create(master: tk.Tk) -> Editor:
     """Convenience function for creating an Editor instance.
 
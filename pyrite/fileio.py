@@ -0,0 +1,381 @@
+"""Functionality for reading and writing documents off the UI thread.
+
+Tk widgets must only ever be touched from the thread running the mainloop,
+so the classes in this module never see a widget. They do their I/O on a
+worker thread and hand results back through queues and events which the
+UI polls using `after()`.
+
+Files compressed with gzip, bzip2 or xz are recognised by their magic bytes
+and decompressed as they are read, so a compressed file is never expanded
+on disk. They are saved compressed with the same format.
+"""
+import codecs
+import io
+import logging
+import os
+import queue
+import stat
+import threading
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+from pyrite import charset
+
+log = logging.getLogger(__name__)
+
+# The first chunk is kept small so that the first screenful of a document
+# can be displayed almost immediately.
+FIRST_CHUNK_SIZE = 16 * 1024
+
+# How long the worker waits on a full queue before checking for cancellation.
+PUT_TIMEOUT = 0.1
+
+# The size of the buffer used when writing a file
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Compression formats keyed by the magic bytes that files in them start with
+MAGIC = {
+    b'\x1f\x8b': 'gzip',
+    b'BZh': 'bz2',
+    b'\xfd7zXZ\x00': 'xz',
+}
+
+# The number of bytes needed to recognise a compression format
+MAGIC_SIZE = max(map(len, MAGIC))
+
+# Compression formats keyed by file extension, for new files
+EXTENSIONS = {
+    '.gz': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'xz',
+}
+
+
+# Whether the decoding on each thread has replaced an invalid character, as
+# the text may contain genuine replacement characters too
+_decoding = threading.local()
+
+
+def _replace_errors(error: UnicodeError):
+    """Replace invalid characters, as the 'replace' error handler does, and
+    note that one was found."""
+    _decoding.replaced = True
+    return codecs.replace_errors(error)
+
+
+codecs.register_error('pyrite.replace', _replace_errors)
+
+
+def put(q: queue.Queue, item, cancelled: threading.Event):
+    """Place an item on a bounded queue from a worker thread, waiting for
+    room until the worker is cancelled, in which case the item is dropped."""
+    while not cancelled.is_set():
+        try:
+            q.put(item, timeout=PUT_TIMEOUT)
+            return
+        except queue.Full:
+            pass
+
+
+class Chunk(NamedTuple):
+    """A piece of decoded text read by a Loader."""
+    text: str
+    progress: float  # Fraction of the file read so far, between 0 and 1
+    last: bool
+
+
+def compression_of(header: bytes) -> Optional[str]:
+    """Get the compression format of a file from its first few bytes, or None
+    if it isn't compressed."""
+    for magic, compression in MAGIC.items():
+        if header.startswith(magic):
+            return compression
+
+    return None
+
+
+def sniff_compression(filename: str) -> Optional[str]:
+    """Get the compression format of a file, or None if it isn't compressed
+    or can't be read."""
+    try:
+        with open(filename, 'rb') as f:
+            return compression_of(f.read(MAGIC_SIZE))
+    except OSError:
+        return None
+
+
+def compression_for(filename: str) -> Optional[str]:
+    """Get the compression format a filename's extension suggests, or None."""
+    return EXTENSIONS.get(os.path.splitext(filename)[1].lower())
+
+
+def decompressed(raw, compression: Optional[str]):
+    """Wrap a binary file so that reading it decompresses its content.
+
+    Args:
+        raw: The binary file, opened for reading.
+        compression: The compression format, or None to read the file as is.
+    Returns: A binary file object. Closing it leaves the raw file open.
+    """
+    if compression == 'gzip':
+        import gzip  # Deferred, as compressed files are rare
+        return gzip.GzipFile(fileobj=raw, mode='rb')
+    if compression == 'bz2':
+        import bz2
+        return bz2.BZ2File(raw, 'rb')
+    if compression == 'xz':
+        import lzma
+        return lzma.LZMAFile(raw, 'rb')
+
+    return raw
+
+
+def compressed(raw, compression: Optional[str]):
+    """Wrap a binary file so that writing to it compresses the content.
+
+    Args:
+        raw: The binary file, opened for writing.
+        compression: The compression format, or None to write the file as is.
+    Returns: A binary file object, which must be closed to complete the
+        compressed data. Closing it leaves the raw file open.
+    """
+    if compression == 'gzip':
+        import gzip
+        # The level the gzip command uses, which is much faster than the maximum
+        return gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6)
+    if compression == 'bz2':
+        import bz2
+        return bz2.BZ2File(raw, 'wb')
+    if compression == 'xz':
+        import lzma
+        return lzma.LZMAFile(raw, 'wb')
+
+    return raw
+
+
+def open_text(raw, encoding: str) -> io.TextIOWrapper:
+    """Open a binary file for reading as text, decompressing it if it is
+    compressed. Invalid characters are replaced.
+
+    Args:
+        raw: The binary file, opened for reading at its start.
+        encoding: The character encoding of the file.
+    """
+    compression = compression_of(raw.read(MAGIC_SIZE))
+    raw.seek(0)
+    return io.TextIOWrapper(decompressed(raw, compression), encoding=encoding, errors='replace')
+
+
+def line_lengths(text: str, carried: int = 0) -> Tuple[int, int]:
+    """Measure the lines in a chunk of text.
+
+    Args:
+        text: The text.
+        carried: The length of the incomplete line that the text before the
+            chunk ended with, which the chunk continues.
+    Returns: The length of the longest line in the chunk, including the line
+        carried, and the length of the incomplete line the chunk ends with.
+    """
+    lines = text.split('\n')
+    longest = max(carried + len(lines[0]), max(map(len, lines), default=0))
+    tail = len(lines[-1]) if len(lines) > 1 else carried + len(lines[0])
+    return longest, tail
+
+
+class Loader(threading.Thread):
+    """Reads and decodes a file on a background thread.
+
+    Decoded text is placed on `queue` as a sequence of `Chunk` instances, the
+    last of which has `last` set. By then, `offset` holds the number of bytes
+    read and `compression` the compression format detected, if any. If an
+    error occurs, the exception instance is placed on the queue instead and
+    the Loader stops.
+
+    Before each chunk is placed on the queue, `longest_line` is updated with
+    the length of the longest line read so far, which a consumer can check to
+    protect itself from lines too long to display efficiently.
+
+    The queue is bounded so that the Loader never gets too far ahead of the
+    consumer, which keeps memory use flat when loading very large files.
+    """
+
+    def __init__(self, filename: str, encoding: Optional[str], chunk_size: int, max_chunks: int = 8):
+        """Create a new Loader instance.
+
+        Args:
+            filename: The name of the file to read.
+            encoding: The character encoding of the file, or None to detect it.
+            chunk_size: The approximate number of characters per chunk.
+            max_chunks: The maximum number of chunks to hold in the queue.
+        """
+        super().__init__(daemon=True)
+        self.filename = filename
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.queue = queue.Queue(maxsize=max_chunks)
+        self.replaced = False
+        self.offset = 0
+        self.longest_line = 0
+        self.compression = None
+        self._cancelled = threading.Event()
+
+    def run(self):
+        try:
+            size = os.path.getsize(self.filename) or 1
+
+            with open(self.filename, 'rb') as raw:
+                self.compression = compression_of(raw.read(MAGIC_SIZE))
+                raw.seek(0)
+                binary = decompressed(raw, self.compression)
+
+                if self.encoding is None:
+                    sample = binary.read(charset.SAMPLE_SIZE)
+                    self.encoding = charset.detect(sample, complete=len(sample) < charset.SAMPLE_SIZE)
+                    # Rewinding a compressed file decompresses the sample again,
+                    # which is cheap
+                    binary.seek(0)
+
+                _decoding.replaced = False
+                f = io.TextIOWrapper(binary, encoding=self.encoding, errors='pyrite.replace')
+                text = f.read(FIRST_CHUNK_SIZE)
+                carried = 0
+
+                while not self._cancelled.is_set():
+                    following = f.read(self.chunk_size)
+                    last = not following
+                    if last:
+                        self.offset = raw.tell()
+                    self.replaced = _decoding.replaced
+                    longest, carried = line_lengths(text, carried)
+                    self.longest_line = max(self.longest_line, longest)
+                    self._put(Chunk(text, min(raw.tell() / size, 1.0), last))
+
+                    if last:
+                        break
+
+                    text = following
+        except Exception as e:
+            log.error(f'Unable to load {self.filename}: {e}')
+            self._put(e)
+
+    def _put(self, item):
+        put(self.queue, item, self._cancelled)
+
+    def cancel(self):
+        """Stop the Loader. Any chunks not yet consumed are discarded."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+
+class Saver(threading.Thread):
+    """Writes content to a file on a background thread, using `write_atomic()`.
+
+    Once the Saver has finished, `done` is set. If the save failed, `error`
+    holds the exception.
+
+    Savers are not daemon threads, so an in-progress save is allowed to
+    complete when the application exits.
+    """
+
+    def __init__(self, filename: str, encoding: str, chunks: Iterable[str], compression: str = None):
+        """Create a new Saver instance.
+
+        Args:
+            filename: The name of the file to write.
+            encoding: The character encoding to use.
+            chunks: The content to write. This is consumed on the background
+                thread, so must not depend on Tk.
+            compression: The compression format to write, or None to write
+                plain text.
+        """
+        super().__init__()
+        self.filename = filename
+        self.encoding = encoding
+        self.chunks = chunks
+        self.compression = compression
+        self.done = threading.Event()
+        self.error = None
+
+    def run(self):
+        try:
+            write_atomic(self.filename, self.encoding, self.chunks, self.compression)
+        except Exception as e:
+            log.error(f'Unable to save {self.filename}: {e}')
+            self.error = e
+        finally:
+            self.done.set()
+
+
+def _create_temp(folder: str, name: str) -> Tuple[int, str]:
+    """Create a temporary file alongside another, with the permissions that
+    the umask gives new files.
+
+    Returns: The open file descriptor and the name of the temporary file.
+    """
+    while True:
+        temp = os.path.join(folder, f'.{name}.{os.urandom(4).hex()}.tmp')
+        try:
+            return os.open(temp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), temp
+        except FileExistsError:
+            pass
+
+
+def write_atomic(filename: str, encoding: str, chunks: Iterable[str], compression: str = None):
+    """Write content to a file so that the file is either completely
+    written or left untouched.
+
+    The content is written to a temporary file in the same folder, which is
+    flushed to disk and then renamed over the original. The original file's
+    permissions are preserved. If the filename is a symbolic link, the file
+    it points to is replaced.
+
+    Args:
+        filename: The name of the file to write.
+        encoding: The character encoding to use.
+        chunks: The content to write.
+        compression: The compression format to write, or None to write plain
+            text.
+    """
+    path = os.path.realpath(filename)
+    folder, name = os.path.split(path)
+
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        # A new file keeps the permissions it was created with
+        mode = None
+
+    fd, temp = _create_temp(folder, name)
+
+    try:
+        with open(fd, 'wb', buffering=WRITE_BUFFER_SIZE) as raw:
+            binary = compressed(raw, compression)
+            f = io.TextIOWrapper(binary, encoding=encoding)
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            f.detach()
+            if binary is not raw:
+                # Completes the compressed data
+                binary.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+
+        if mode is not None:
+            os.chmod(temp, mode)
+        os.replace(temp, path)
+    except BaseException:
+        try:
+            os.unlink(temp)
+        except FileNotFoundError:
+            pass
+        raise
+
+    # Make sure the rename itself is durable
+    fd = os.open(folder, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,476 @@
+"""Functionality for finding and replacing text in a document.
+
+Searches run on a background thread over a snapshot of the document's buffer,
+building a sorted index of match offsets which the UI polls for progress.
+Only the matches within the visible region are tagged in the text widget.
+"""
+import logging
+import re
+import threading
+import tkinter as tk
+from array import array
+from bisect import bisect_left, bisect_right
+from tkinter import ttk
+from typing import Optional, Pattern, Tuple
+
+from pyrite import keybindings, theme
+from pyrite.buffer import Buffer, Rope, TextMirror
+
+log = logging.getLogger(__name__)
+
+# The approximate number of characters searched at a time. Matches can't span
+# windows, but windows always end on a line boundary.
+WINDOW_SIZE = 1024 * 1024
+
+# The interval in ms between checks on a search in progress
+POLL_INTERVAL = 50
+
+# The delay in ms between the pattern or document changing and searching again
+SEARCH_DELAY = 250
+
+MATCH_TAG = 'findmatch'
+
+
+def compile_pattern(pattern: str, regex: bool = False, match_case: bool = False) -> Pattern:
+    """Compile a search pattern.
+
+    Args:
+        pattern: The text to search for.
+        regex: Whether the text is a regular expression rather than a literal.
+        match_case: Whether the search is case sensitive.
+    Returns: The compiled pattern.
+    Raises:
+        re.error: If the regular expression is invalid.
+    """
+    flags = re.MULTILINE
+
+    if not match_case:
+        flags |= re.IGNORECASE
+
+    return re.compile(pattern if regex else re.escape(pattern), flags)
+
+
+class Search(threading.Thread):
+    """Finds all matches of a pattern in a snapshot of a document on a
+    background thread.
+
+    The start and end offsets of the matches are appended to `starts` and
+    `ends` as they are found, so both are always sorted and can be read while
+    the search is in progress. `done` is set once the search has finished.
+    Empty matches are ignored.
+    """
+
+    def __init__(self, rope: Rope, pattern: Pattern):
+        """Create a new Search instance.
+
+        Args:
+            rope: The content to search.
+            pattern: The compiled pattern to search for.
+        """
+        super().__init__(daemon=True)
+        self.rope = rope
+        self.pattern = pattern
+        self.starts = array('q')
+        self.ends = array('q')
+        self.done = threading.Event()
+        self._cancelled = False
+
+    @property
+    def count(self) -> int:
+        """The number of matches found so far."""
+        # Ends are appended after starts, so every counted match is complete
+        return len(self.ends)
+
+    def run(self):
+        try:
+            text = str(self.rope)
+            pos = 0
+
+            while pos < len(text) and not self._cancelled:
+                end = text.find('\n', pos + WINDOW_SIZE) + 1 or len(text)
+
+                for match in self.pattern.finditer(text, pos, end):
+                    if match.end() > match.start():
+                        self.starts.append(match.start())
+                        self.ends.append(match.end())
+
+                pos = end
+        finally:
+            self.done.set()
+
+    def cancel(self):
+        self._cancelled = True
+
+    def between(self, start: int, end: int) -> range:
+        """Get the indices of the matches that overlap a range of offsets."""
+        count = self.count
+        return range(bisect_right(self.ends, start, 0, count), bisect_left(self.starts, end, 0, count))
+
+
+def substitute(rope: Rope, pattern: Pattern, replacement: str,
+               regex: bool = False) -> Optional[Tuple[int, int, str, int]]:
+    """Replace every match of a pattern.
+
+    Rather than a replacement per match, the result is a single replacement of
+    the span running from the start of the first match to the end of the last.
+
+    Args:
+        rope: The content to search.
+        pattern: The compiled pattern to search for.
+        replacement: The replacement text.
+        regex: Whether the replacement is a template that can refer to groups
+            within the pattern.
+    Returns: A tuple of the start and end offsets of the span, the text to
+        replace it with, and the number of matches replaced. None if there
+        were no matches.
+    """
+    text = str(rope)
+    pieces = []
+    first = last = None
+    count = 0
+
+    for match in pattern.finditer(text):
+        if match.end() == match.start():
+            continue
+
+        if first is None:
+            first = match.start()
+        else:
+            pieces.append(text[last:match.start()])
+
+        pieces.append(match.expand(replacement) if regex else replacement)
+        last = match.end()
+        count += 1
+
+    if not count:
+        return None
+
+    return first, last, ''.join(pieces), count
+
+
+class Replacer(threading.Thread):
+    """Runs `substitute()` on a background thread.
+
+    Once the Replacer has finished, `done` is set and `result` holds the value
+    returned by `substitute()`. If it failed, `error` holds the exception.
+    """
+
+    def __init__(self, rope: Rope, pattern: Pattern, replacement: str, regex: bool = False):
+        super().__init__(daemon=True)
+        self.rope = rope
+        self.args = (rope, pattern, replacement, regex)
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.result = substitute(*self.args)
+        except Exception as e:
+            log.error(f'Unable to replace: {e}')
+            self.error = e
+        finally:
+            self.done.set()
+
+
+class FindBar(ttk.Frame):
+    """A bar for finding and replacing text in a document's text widget."""
+
+    def __init__(self, master: tk.Widget, text: tk.Text, buffer: Buffer, mirror: TextMirror):
+        """Create a new FindBar instance.
+
+        Args:
+            master: The parent widget.
+            text: The text widget to search.
+            buffer: The buffer that mirrors the text widget.
+            mirror: The TextMirror of the text widget, used to make replacements.
+        """
+        super().__init__(master=master)
+        self.text = text
+        self.buffer = buffer
+        self.mirror = mirror
+
+        self.search = None
+        self.pattern = None
+        self._replacer = None
+        self._search_job = None
+        self._poll_job = None
+        self._shown = False
+        # The index of the most recently selected match
+        self.current = None
+        # Callable to invoke once the current search completes
+        self._on_searched = None
+
+        self.find_text = tk.StringVar(master=self)
+        self.replace_text = tk.StringVar(master=self)
+        self.regex = tk.BooleanVar(master=self, value=False)
+        self.match_case = tk.BooleanVar(master=self, value=False)
+
+        self.find_entry = ttk.Entry(master=self, textvariable=self.find_text)
+        self.replace_entry = ttk.Entry(master=self, textvariable=self.replace_text)
+        self.status = ttk.Label(master=self, width=20)
+
+        self.find_entry.grid(row=0, column=0, sticky=tk.EW)
+        ttk.Button(master=self, text='Previous', command=self.previous).grid(row=0, column=1)
+        ttk.Button(master=self, text='Next', command=self.next).grid(row=0, column=2)
+        ttk.Checkbutton(master=self, text='Regex', variable=self.regex).grid(row=0, column=3)
+        ttk.Checkbutton(master=self, text='Match Case', variable=self.match_case).grid(row=0, column=4)
+        self.status.grid(row=0, column=5)
+        self.replace_entry.grid(row=1, column=0, sticky=tk.EW)
+        ttk.Button(master=self, text='Replace', command=self.replace).grid(row=1, column=1)
+        ttk.Button(master=self, text='Replace All', command=self.replace_all).grid(row=1, column=2)
+        self.columnconfigure(0, weight=1)
+
+        self.text.tag_configure(MATCH_TAG, **theme.findconfig)
+
+        for variable in (self.find_text, self.regex, self.match_case):
+            variable.trace_add('write', lambda *args: self.schedule_search())
+
+        for entry in (self.find_entry, self.replace_entry):
+            entry.bind(keybindings.CANCEL, lambda e: self.hide())
+            entry.bind('<Return>', lambda e: self.next())
+            entry.bind('<Shift-Return>', lambda e: self.previous())
+
+        self.buffer.on_edit(lambda edit: self.schedule_search())
+
+    @property
+    def visible(self) -> bool:
+        return self._shown
+
+    def show(self, event=None):
+        """Show the bar and search for the selected text, if any."""
+        if not self._shown:
+            self._shown = True
+            self.pack(side=tk.BOTTOM, fill=tk.X, before=self.text)
+            self.schedule_search()
+
+        if self.text.tag_ranges(tk.SEL):
+            selected = self.text.get(tk.SEL_FIRST, tk.SEL_LAST)
+            if '\n' not in selected:
+                self.find_text.set(selected)
+
+        self.find_entry.focus()
+        self.find_entry.select_range(0, tk.END)
+        return 'break'
+
+    def hide(self):
+        """Hide the bar and stop searching."""
+        self._shown = False
+        self._cancel()
+        self.text.tag_remove(MATCH_TAG, '1.0', tk.END)
+        self.pack_forget()
+        self.text.focus()
+
+    def schedule_search(self):
+        """Search again shortly, so that a burst of changes causes one search."""
+        if not self.visible:
+            return
+
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+
+        self._search_job = self.after(SEARCH_DELAY, self.start_search)
+
+    def start_search(self):
+        """Search the current content of the document on a background thread."""
+        self._cancel()
+        self.current = None
+        on_searched, self._on_searched = self._on_searched, None
+
+        if not self.find_text.get():
+            self.pattern = None
+            self.status.config(text='')
+            self.text.tag_remove(MATCH_TAG, '1.0', tk.END)
+            return
+
+        try:
+            self.pattern = compile_pattern(self.find_text.get(), self.regex.get(), self.match_case.get())
+        except re.error as e:
+            self.pattern = None
+            self.status.config(text='Invalid pattern')
+            log.debug(f'Invalid pattern: {e}')
+            return
+
+        self.search = Search(self.buffer.snapshot(), self.pattern)
+        self.search.start()
+        self._on_searched = on_searched
+        self._poll()
+
+    def destroy(self):
+        self._cancel()
+        super().destroy()
+
+    def _cancel(self):
+        for job in (self._search_job, self._poll_job):
+            if job is not None:
+                self.after_cancel(job)
+
+        self._search_job = self._poll_job = None
+
+        if self.search is not None:
+            self.search.cancel()
+            self.search = None
+
+    @property
+    def current_search(self) -> Optional[Search]:
+        """The search, as long as the document hasn't changed since it started."""
+        if self.search is not None and self.search.rope is self.buffer.snapshot():
+            return self.search
+
+        return None
+
+    def _poll(self):
+        done = self.search.done.is_set()
+        self.update_status()
+        self.show_matches()
+
+        if not done:
+            self._poll_job = self.after(POLL_INTERVAL, self._poll)
+            return
+
+        self._poll_job = None
+        if self._on_searched is not None:
+            on_searched, self._on_searched = self._on_searched, None
+            on_searched()
+
+    def update_status(self):
+        search = self.search
+        count = search.count
+
+        if not search.done.is_set():
+            text = f'{count} matches...'
+        elif self.current is not None and self.current < count:
+            text = f'{self.current + 1} of {count}'
+        else:
+            text = f'{count} matches' if count != 1 else '1 match'
+
+        self.status.config(text=text)
+
+    def show_matches(self):
+        """Tag the matches within the visible region."""
+        search = self.current_search
+        if search is None:
+            return
+
+        first = int(self.text.index('@0,0').split('.')[0])
+        last = int(self.text.index(f'@0,{self.text.winfo_height()}').split('.')[0])
+        rope = search.rope
+
+        indices = []
+        for i in search.between(rope.line_start(first), rope.line_start(last + 1)):
+            indices.extend((self.index(search.starts[i]), self.index(search.ends[i])))
+
+        self.text.tag_remove(MATCH_TAG, f'{first}.0', f'{last + 1}.0')
+        if indices:
+            self.text.tag_add(MATCH_TAG, *indices)
+
+    def index(self, offset: int, rope: Rope = None) -> str:
+        """Convert an offset to a text widget index.
+
+        Args:
+            offset: The offset.
+            rope: The content the offset refers to. Defaults to the content
+                that was searched.
+        Returns: The index.
+        """
+        rope = self.search.rope if rope is None else rope
+        return '{}.{}'.format(*rope.position(offset))
+
+    def offset(self, index: str) -> int:
+        """Convert a text widget index to an offset into the document."""
+        line, char = map(int, self.text.index(index).split('.'))
+        return self.buffer.snapshot().offset(line, char)
+
+    def next(self):
+        """Select the first match after the cursor, wrapping around."""
+        search = self.current_search
+        if search is None or not search.count:
+            return 'break'
+
+        i = bisect_left(search.starts, self.offset(tk.INSERT), 0, search.count)
+        self.select(i if i < search.count else 0)
+        return 'break'
+
+    def previous(self):
+        """Select the last match before the cursor or selection, wrapping around."""
+        search = self.current_search
+        if search is None or not search.count:
+            return 'break'
+
+        index = tk.SEL_FIRST if self.text.tag_ranges(tk.SEL) else tk.INSERT
+        i = bisect_left(search.starts, self.offset(index), 0, search.count) - 1
+        self.select(i if i >= 0 else search.count - 1)
+        return 'break'
+
+    def select(self, i: int):
+        """Select a match and scroll it into view."""
+        self.current = i
+        start, end = self.index(self.search.starts[i]), self.index(self.search.ends[i])
+
+        self.text.tag_remove(tk.SEL, '1.0', tk.END)
+        self.text.tag_add(tk.SEL, start, end)
+        self.text.mark_set(tk.INSERT, end)
+        self.text.see(start)
+        self.update_status()
+        self.show_matches()
+
+    def replace(self):
+        """Replace the selected match and select the next one."""
+        search = self.current_search
+        if search is None or self.current is None:
+            return
+
+        start, end = search.starts[self.current], search.ends[self.current]
+        if not self.text.tag_ranges(tk.SEL) or (self.offset(tk.SEL_FIRST), self.offset(tk.SEL_LAST)) != (start, end):
+            self.next()
+            return
+
+        replacement = self.replace_text.get()
+
+        if self.regex.get():
+            # Match within the surrounding lines, so that anchors behave as
+            # they did during the search
+            rope = search.rope
+            line_start = rope.line_start(rope.position(start)[0])
+            line_end = rope.line_start(rope.position(end)[0] + 1)
+            match = self.pattern.match(rope.slice(line_start, line_end), start - line_start)
+            replacement = match.expand(replacement)
+
+        self.mirror.batch([(self.index(start), self.index(end), replacement)])
+        self.text.mark_set(tk.INSERT, f'{self.index(start)} + {len(replacement)} chars')
+
+        # Select the following match once the new content has been searched
+        self._on_searched = self.next
+        self.start_search()
+
+    def replace_all(self):
+        """Replace every match as a single edit, which can be undone in one step."""
+        if self.pattern is None or self._replacer is not None:
+            return
+
+        self._replacer = Replacer(self.buffer.snapshot(), self.pattern, self.replace_text.get(), self.regex.get())
+        self._replacer.start()
+        self.status.config(text='Replacing...')
+        self._poll_replace()
+
+    def _poll_replace(self):
+        replacer = self._replacer
+
+        if not replacer.done.is_set():
+            self.after(POLL_INTERVAL, self._poll_replace)
+            return
+
+        self._replacer = None
+
+        if replacer.error is not None:
+            self.status.config(text='Replace failed')
+        elif replacer.rope is not self.buffer.snapshot():
+            # The document changed while the replacements were being made
+            self.replace_all()
+        elif replacer.result is None:
+            self.status.config(text='0 matches')
+        else:
+            start, end, replacement, count = replacer.result
+            self.mirror.batch([(self.index(start, replacer.rope), self.index(end, replacer.rope), replacement)])
+            self._on_searched = lambda: self.status.config(text=f'Replaced {count}')
+            self.start_search()
@@ -0,0 +1,242 @@
+"""Functionality for finding text in all the files within a folder.
+
+The folder is walked on a background thread, which hands batches of files to
+a pool of worker processes. Each worker memory maps the files it is given and
+searches them as bytes, so no file is ever decoded as a whole. Results are
+streamed back through a queue as each batch completes.
+"""
+import mmap
+import multiprocessing
+import os
+import queue
+import re
+import threading
+import tkinter as tk
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from tkinter import filedialog, simpledialog, ttk
+from typing import Iterator, List, NamedTuple, Pattern, Tuple
+
+from pyrite import find
+
+# Folders that are never searched
+SKIP_DIRECTORIES = frozenset(('.git', '.hg', '.svn', '.tox', '.venv', '__pycache__', 'node_modules'))
+
+# Files with a NUL byte within this many bytes of the start are treated as binary
+BINARY_SAMPLE_SIZE = 8192
+
+# The number of files searched by each task handed to a worker process
+FILES_PER_TASK = 32
+
+# The maximum number of matching lines reported per file
+MAX_MATCHES_PER_FILE = 1000
+
+# Matching lines longer than this are truncated
+MAX_LINE_LENGTH = 500
+
+
+class Match(NamedTuple):
+    """A line containing a match."""
+    line: int  # Starting from 1
+    text: str
+
+
+def compile_pattern(pattern: str, regex: bool = False, match_case: bool = False) -> Pattern:
+    """Compile a search pattern for searching files, which are searched as
+    UTF-8 bytes.
+
+    Args:
+        pattern: The text to search for.
+        regex: Whether the text is a regular expression rather than a literal.
+        match_case: Whether the search is case sensitive.
+    Returns: The compiled bytes pattern.
+    Raises:
+        re.error: If the regular expression is invalid.
+    """
+    compiled = find.compile_pattern(pattern, regex, match_case)
+    # Bytes patterns don't take the UNICODE flag that str patterns have
+    return re.compile(compiled.pattern.encode('utf-8'), compiled.flags & ~re.UNICODE)
+
+
+def search_file(filename: str, pattern: Pattern) -> List[Match]:
+    """Find the lines of a file that match a pattern.
+
+    Binary files, and files that can't be read, have no matches.
+
+    Args:
+        filename: The name of the file.
+        pattern: The compiled bytes pattern.
+    Returns: The matching lines, at most one per line.
+    """
+    matches = []
+
+    try:
+        with open(filename, 'rb') as f:
+            if b'\0' in f.read(BINARY_SAMPLE_SIZE) or not os.fstat(f.fileno()).st_size:
+                return matches
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                line, pos, end = 1, 0, -1
+
+                for match in pattern.finditer(mm):
+                    if match.start() < end:
+                        # Already reported this line
+                        continue
+
+                    line += mm[pos:match.start()].count(b'\n')
+                    start = mm.rfind(b'\n', 0, match.start()) + 1
+                    end = mm.find(b'\n', match.end())
+                    end = len(mm) if end < 0 else end
+                    pos = start
+
+                    text = mm[start:min(end, start + MAX_LINE_LENGTH)].decode('utf-8', errors='replace')
+                    matches.append(Match(line, text.rstrip('\r')))
+
+                    if len(matches) >= MAX_MATCHES_PER_FILE:
+                        break
+    except (OSError, ValueError):
+        pass
+
+    return matches
+
+
+def search_files(filenames: List[str], pattern: Pattern) -> List[Tuple[str, List[Match]]]:
+    """Search a batch of files, returning the name and matches of those files
+    with matches. This is run in the worker processes."""
+    results = []
+
+    for filename in filenames:
+        matches = search_file(filename, pattern)
+        if matches:
+            results.append((filename, matches))
+
+    return results
+
+
+def walk(folder: str) -> Iterator[str]:
+    """Generate the names of the files within a folder and its subfolders,
+    skipping SKIP_DIRECTORIES and symbolic links."""
+    for dirpath, dirnames, filenames in os.walk(folder):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRECTORIES)
+
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            if not os.path.islink(path):
+                yield path
+
+
+class FileSearch(threading.Thread):
+    """Searches the files within a folder using a pool of worker processes.
+
+    The name and matches of each file with matches are placed on `results`
+    as they are found, followed by None once the search has finished.
+    """
+
+    def __init__(self, folder: str, pattern: Pattern, workers: int = None):
+        """Create a new FileSearch instance.
+
+        Args:
+            folder: The folder to search.
+            pattern: The compiled bytes pattern to search for.
+            workers: The number of worker processes. Defaults to the number
+                of CPUs.
+        """
+        super().__init__(daemon=True)
+        self.folder = folder
+        self.pattern = pattern
+        self.workers = workers or os.cpu_count() or 1
+        self.results = queue.Queue()
+        # The number of files searched so far
+        self.searched = 0
+        self._cancelled = threading.Event()
+
+    def run(self):
+        try:
+            # Forking the application would copy its threads' locks into the
+            # workers, possibly held, so the workers are started afresh
+            context = multiprocessing.get_context(
+                'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            )
+
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as executor:
+                pending = {}
+                filenames = walk(self.folder)
+
+                while not self._cancelled.is_set():
+                    batch = list(islice(filenames, FILES_PER_TASK))
+                    if batch:
+                        pending[executor.submit(search_files, batch, self.pattern)] = len(batch)
+
+                    # Keep enough tasks queued to occupy every worker without
+                    # walking the whole tree up front
+                    if len(pending) >= self.workers * 2 or (pending and not batch):
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            self._collect(future, pending.pop(future))
+                    elif not batch:
+                        break
+
+                for future in pending:
+                    future.cancel()
+        finally:
+            self.results.put(None)
+
+    def _collect(self, future, size: int):
+        self.searched += size
+        if not self._cancelled.is_set():
+            for result in future.result():
+                self.results.put(result)
+
+    def cancel(self):
+        """Stop searching. Batches already being searched are allowed to finish."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+
+class FindInFilesDialog(simpledialog.Dialog):
+    """Prompts for what to search for and where.
+
+    Once closed, `result` holds a (folder, pattern, regex, match_case) tuple,
+    or None if the dialog was cancelled.
+    """
+
+    def __init__(self, parent: tk.Widget, folder: str):
+        self.folder = tk.StringVar(master=parent, value=folder)
+        self.pattern = tk.StringVar(master=parent)
+        self.regex = tk.BooleanVar(master=parent, value=False)
+        self.match_case = tk.BooleanVar(master=parent, value=False)
+        super().__init__(parent, title='Find in Files')
+
+    def body(self, master):
+        ttk.Label(master=master, text='Find:').grid(row=0, column=0, sticky=tk.W)
+        entry = ttk.Entry(master=master, textvariable=self.pattern, width=40)
+        entry.grid(row=0, column=1, columnspan=2, sticky=tk.EW)
+        ttk.Label(master=master, text='Folder:').grid(row=1, column=0, sticky=tk.W)
+        ttk.Entry(master=master, textvariable=self.folder, width=40).grid(row=1, column=1, sticky=tk.EW)
+        ttk.Button(master=master, text='Browse...', command=self.browse).grid(row=1, column=2)
+        ttk.Checkbutton(master=master, text='Regex', variable=self.regex).grid(row=2, column=1, sticky=tk.W)
+        ttk.Checkbutton(master=master, text='Match Case', variable=self.match_case).grid(row=3, column=1, sticky=tk.W)
+        return entry
+
+    def browse(self):
+        folder = filedialog.askdirectory(parent=self, initialdir=self.folder.get(), title='Folder')
+        if folder:
+            self.folder.set(folder)
+
+    def validate(self):
+        if not self.pattern.get() or not os.path.isdir(self.folder.get()):
+            return False
+
+        if self.regex.get():
+            try:
+                compile_pattern(self.pattern.get(), regex=True)
+            except re.error:
+                return False
+
+        return True
+
+    def apply(self):
+        self.result = (self.folder.get(), self.pattern.get(), self.regex.get(), self.match_case.get())
@@ -0,0 +1,152 @@
+"""Functionality for following a file as it grows, in the manner of `tail -f`.
+
+A Follower thread holds the file open and reads only the bytes appended since
+it last looked, decoding them incrementally so that a character or line
+ending split across reads is decoded correctly. A file that is truncated is
+read again from the start. A file that is rotated - renamed, and a new file
+created in its place - is read to the end before the new file is opened.
+"""
+import codecs
+import io
+import logging
+import os
+import queue
+import threading
+from typing import NamedTuple
+
+from pyrite import fileio
+
+log = logging.getLogger(__name__)
+
+# How often (seconds) to check the file for more content
+POLL_INTERVAL = 0.1
+
+# The maximum number of bytes read at a time
+READ_SIZE = 1024 * 1024
+
+# Placed on a Follower's queue when the file has been truncated, before its
+# content is read again from the start
+RESET = object()
+
+
+class Appended(NamedTuple):
+    """Text appended to a file."""
+    text: str
+    offset: int  # The number of bytes of the file read, including this text
+
+
+class Follower(threading.Thread):
+    """Reads text as it is appended to a file, on a background thread.
+
+    `Appended` instances are placed on `queue` as text is read, with RESET
+    placed whenever the file is truncated. If an error occurs, the exception
+    instance is placed on the queue instead and the Follower stops. The queue
+    is bounded, so reading pauses if the consumer falls behind.
+    """
+
+    def __init__(self, filename: str, encoding: str, offset: int, max_chunks: int = 8):
+        """Create a new Follower instance.
+
+        Args:
+            filename: The name of the file.
+            encoding: The file encoding.
+            offset: The number of bytes of the file already read.
+            max_chunks: The maximum number of chunks to hold in the queue.
+        """
+        super().__init__(daemon=True)
+        self.filename = filename
+        self.encoding = encoding
+        self.offset = offset
+        self.queue = queue.Queue(maxsize=max_chunks)
+        self._decoder = None
+        self._cancelled = threading.Event()
+
+    def run(self):
+        f = None
+
+        try:
+            f = self._open(self.offset)
+
+            while not self._cancelled.is_set():
+                data = f.read(READ_SIZE)
+
+                if data:
+                    self.offset += len(data)
+                    text = self._decoder.decode(data)
+                    if text:
+                        self._put(Appended(text, self.offset))
+                    continue
+
+                if os.fstat(f.fileno()).st_size < self.offset:
+                    log.debug(f'{self.filename} truncated')
+                    f.seek(0)
+                    self.offset = 0
+                    self._decoder.reset()
+                    self._put(RESET)
+                    continue
+
+                if self._rotated(f):
+                    log.debug(f'{self.filename} rotated')
+                    f.close()
+                    f = self._open(0)
+                    continue
+
+                self._cancelled.wait(POLL_INTERVAL)
+        except Exception as e:
+            log.error(f'Unable to follow {self.filename}: {e}')
+            self._put(e)
+        finally:
+            if f is not None:
+                f.close()
+
+    def _open(self, offset: int):
+        f = open(self.filename, 'rb')
+
+        if os.fstat(f.fileno()).st_size < offset:
+            # Truncated since it was last read
+            offset = 0
+            self._put(RESET)
+
+        f.seek(offset)
+        self.offset = offset
+        # Translates line endings in the same way as the text mode used when loading
+        self._decoder = io.IncrementalNewlineDecoder(
+            codecs.getincrementaldecoder(self.encoding)(errors='replace'), translate=True
+        )
+        return f
+
+    def _rotated(self, f) -> bool:
+        """Whether the filename now refers to a different file to the one open."""
+        try:
+            st = os.stat(self.filename)
+        except OSError:
+            # Not yet replaced
+            return False
+
+        current = os.fstat(f.fileno())
+        return (st.st_dev, st.st_ino) != (current.st_dev, current.st_ino)
+
+    def _put(self, item):
+        fileio.put(self.queue, item, self._cancelled)
+
+    def cancel(self):
+        """Stop following. Any text not yet consumed is discarded."""
+        self._cancelled.set()
+
+
+def tail(text: str, lines: int) -> str:
+    """Get the end of some text.
+
+    Args:
+        text: The text.
+        lines: The number of complete lines to keep.
+    Returns: The last complete lines of text, followed by any incomplete line.
+    """
+    if text.count('\n') <= lines:
+        return text
+
+    pos = len(text)
+    for _ in range(lines + 1):
+        pos = text.rfind('\n', 0, pos)
+
+    return text[pos + 1:]
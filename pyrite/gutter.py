@@ -0,0 +1,91 @@
+"""Functionality for showing line numbers alongside a text widget.
+
+A Gutter only ever draws the numbers of the lines that are visible, so the
+cost of a redraw depends on the height of the window rather than the length
+of the document. Redraws are requested with `schedule()` whenever the view
+or the content may have changed, and however many requests arrive before Tk
+is next idle, only one redraw happens.
+
+With word wrap on, a line may occupy several display lines. Its number is
+drawn alongside the first of them, and not at all when that is scrolled out
+of view.
+"""
+import tkinter as tk
+from tkinter import font
+
+from pyrite import theme
+
+# The space (pixels) either side of the numbers
+PADDING = 6
+
+# The minimum number of digits the gutter has room for
+MIN_DIGITS = 2
+
+
+class Gutter(tk.Canvas):
+    """Shows the numbers of the lines visible in a text widget."""
+
+    def __init__(self, master: tk.Widget, text: tk.Text):
+        """Create a new Gutter instance.
+
+        Args:
+            master: The parent widget.
+            text: The text widget to number the lines of.
+        """
+        super().__init__(master=master, highlightthickness=0, borderwidth=0, bg=theme.gutterconfig['bg'])
+        self.text = text
+        self.font = font.Font(font=text['font'])
+        self.digit_width = self.font.measure('0')
+
+        # The line number of the first line in the text widget, for widgets
+        # that hold a window onto a larger document
+        self.first = 1
+        # The number of lines in the document, or None to count those in the
+        # text widget
+        self.lines = None
+
+        self._digits = 0
+        self._redraw_job = None
+
+        self.text.bind('<Configure>', lambda e: self.schedule(), add=True)
+        self.resize(MIN_DIGITS)
+
+    def schedule(self):
+        """Redraw the numbers once Tk is next idle."""
+        if self._redraw_job is None:
+            self._redraw_job = self.after_idle(self.redraw)
+
+    def redraw(self):
+        """Draw the numbers of the visible lines."""
+        self._redraw_job = None
+        self.delete(tk.ALL)
+
+        lines = self.lines if self.lines is not None else int(self.text.index('end-1c').split('.')[0])
+        self.resize(len(str(lines)))
+
+        top = int(self.text.index('@0,0').split('.')[0])
+        bottom = int(self.text.index(f'@0,{self.text.winfo_height()}').split('.')[0])
+        x = int(self['width']) - PADDING
+
+        for line in range(top, bottom + 1):
+            # None when the line starts above the view, as a wrapped line can
+            info = self.text.dlineinfo(f'{line}.0')
+            if info is not None:
+                self.create_text(
+                    x, info[1], anchor=tk.NE, text=str(line + self.first - 1), font=self.font,
+                    fill=theme.gutterconfig['fg']
+                )
+
+    def resize(self, digits: int):
+        """Make room for numbers of a given number of digits."""
+        digits = max(digits, MIN_DIGITS)
+
+        if digits != self._digits:
+            self._digits = digits
+            self.config(width=digits * self.digit_width + PADDING * 2)
+
+    def destroy(self):
+        if self._redraw_job is not None:
+            self.after_cancel(self._redraw_job)
+            self._redraw_job = None
+        super().destroy()
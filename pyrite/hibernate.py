@@ -0,0 +1,97 @@
+"""Functionality for hibernating idle documents to cap memory use.
+
+A hibernated document's text widget is destroyed and its tab given to a
+placeholder. Documents without unsaved changes are simply reloaded from their
+files when woken. The content of those with unsaved changes is held in
+memory, compressed, until then.
+"""
+import threading
+import zlib
+from typing import Any, List, NamedTuple
+
+from pyrite.buffer import Rope
+
+# Compression favours speed, as content is compressed whenever a document
+# hibernates but only decompressed if it is woken
+COMPRESSION_LEVEL = 1
+
+# A rough estimate of the memory (bytes) used by each character of a document,
+# which is held both in a Tk text widget and in a rope
+BYTES_PER_CHAR = 8
+
+
+class CompressedText:
+    """Text held in compressed form.
+
+    Compression happens on a background thread. Reading the text back waits
+    for it to finish if necessary.
+    """
+
+    def __init__(self, rope: Rope):
+        """Create a new CompressedText instance.
+
+        Args:
+            rope: The text to compress.
+        """
+        self._data = None
+        self._thread = threading.Thread(target=self._compress, args=(rope,), daemon=True)
+        self._thread.start()
+
+    def _compress(self, rope: Rope):
+        compressor = zlib.compressobj(COMPRESSION_LEVEL)
+        parts = [compressor.compress(chunk.encode('utf-8', errors='surrogatepass')) for chunk in rope.chunks()]
+        parts.append(compressor.flush())
+        self._data = b''.join(parts)
+
+    @property
+    def size(self) -> int:
+        """The size of the compressed text in bytes."""
+        self._thread.join()
+        return len(self._data)
+
+    def text(self) -> str:
+        """Decompress the text."""
+        self._thread.join()
+        return zlib.decompress(self._data).decode('utf-8', errors='surrogatepass')
+
+
+class Candidate(NamedTuple):
+    """A document that could be hibernated."""
+    document: Any
+    last_active: float  # When the document was last the current document, from monotonic()
+    size: int  # Estimated memory use in bytes
+
+
+def select(candidates: List[Candidate], now: float, idle_limit: float, budget: int) -> list:
+    """Choose which documents to hibernate.
+
+    Documents that have been inactive for longer than the idle limit are
+    chosen first. Then, if the remaining documents exceed the memory budget,
+    the least recently active of them are chosen until they no longer do.
+
+    Args:
+        candidates: The documents that could be hibernated.
+        now: The current time, from monotonic().
+        idle_limit: The number of seconds a document can be inactive before
+            it is hibernated, or 0 for no limit.
+        budget: The memory budget in bytes, or 0 for no budget.
+    Returns: The documents to hibernate.
+    """
+    chosen = []
+    remaining = []
+
+    for candidate in sorted(candidates, key=lambda c: c.last_active):
+        if idle_limit and now - candidate.last_active >= idle_limit:
+            chosen.append(candidate)
+        else:
+            remaining.append(candidate)
+
+    if budget:
+        total = sum(c.size for c in remaining)
+        for candidate in remaining:
+            if total <= budget:
+                break
+            chosen.append(candidate)
+            total -= candidate.size
+
+    return [c.document for c in chosen]
@@ -0,0 +1,446 @@
+"""Functionality for syntax highlighting documents.
+
+Tokenizing happens on a background thread against snapshots of a document's
+buffer. The lexer state at the start of each line is cached, so after an edit
+only the changed lines are re-lexed, along with any following lines whose
+starting state changes as a result. Lexing stops as soon as the states
+converge with those cached previously.
+
+Lines are only lexed as far as the end of the visible region, and tags are
+only applied to the visible region plus a margin either side, so the cost of
+highlighting does not depend on the size of the document. The UI only polls
+for results while the tokenizer has edits or view changes to catch up with,
+so idle documents cost nothing.
+
+Colours come from the `syntaxconfig` of the active theme.
+"""
+import logging
+import os
+import queue
+import re
+import threading
+import tkinter as tk
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from pyrite import theme
+from pyrite.buffer import Buffer, Edit, Rope
+
+log = logging.getLogger(__name__)
+
+# The number of lines either side of the visible region that are highlighted
+VIEW_MARGIN = 100
+
+# The number of lines lexed between checks for new edits
+LEX_SLICE = 1000
+
+# The interval in ms between checks for tokenizer results
+POLL_INTERVAL = 30
+
+TAG_PREFIX = 'syntax.'
+
+# A token is a (start, end, type) tuple giving the character range of the
+# token within its line
+Token = Tuple[int, int, str]
+
+
+class Language:
+    """A set of rules for tokenizing a language line by line.
+
+    Rules are grouped by lexer state. Each rule is a (pattern, token, state)
+    tuple, where token is the token type of the matched text (or None for no
+    token) and state is the state to switch to after the match (or None to
+    remain in the current state). Patterns must not contain capturing groups.
+    """
+
+    initial = 'root'
+
+    def __init__(self, name: str, rules: Dict[str, List[Tuple[str, Optional[str], Optional[str]]]]):
+        """Create a new Language instance.
+
+        Args:
+            name: The name of the language.
+            rules: The rules for each lexer state, keyed by state. There must
+                be a 'root' state, which each line of a document starts in
+                unless a preceding line leaves it in another.
+        """
+        self.name = name
+        self.rules = rules
+        self.tokens = {token for state in rules.values() for _, token, _ in state if token}
+        self._patterns = {
+            state: re.compile('|'.join(f'({pattern})' for pattern, _, _ in state_rules))
+            for state, state_rules in rules.items()
+        }
+
+    def lex(self, line: str, state: str) -> Tuple[List[Token], str]:
+        """Tokenize a line.
+
+        Args:
+            line: The line, without its trailing newline.
+            state: The lexer state at the start of the line.
+        Returns: The tokens in the line and the lexer state at the end of it.
+        """
+        tokens = []
+        pos = 0
+
+        while pos < len(line):
+            match = self._patterns[state].search(line, pos)
+            if match is None:
+                break
+
+            _, token, following = self.rules[state][match.lastindex - 1]
+            if token and match.end() > match.start():
+                tokens.append((match.start(), match.end(), token))
+            if following:
+                state = following
+
+            pos = max(match.end(), pos + 1)
+
+        return tokens, state
+
+
+_KEYWORDS = (
+    'False', 'None', 'True', 'and', 'as', 'assert', 'async', 'await', 'break', 'class', 'continue', 'def',
+    'del', 'elif', 'else', 'except', 'finally', 'for', 'from', 'global', 'if', 'import', 'in', 'is', 'lambda',
+    'nonlocal', 'not', 'or', 'pass', 'raise', 'return', 'try', 'while', 'with', 'yield',
+)
+
+_BUILTINS = (
+    'abs', 'all', 'any', 'bool', 'bytes', 'callable', 'chr', 'dict', 'dir', 'enumerate', 'filter', 'float',
+    'format', 'frozenset', 'getattr', 'hasattr', 'hash', 'id', 'input', 'int', 'isinstance', 'issubclass',
+    'iter', 'len', 'list', 'map', 'max', 'min', 'next', 'object', 'open', 'ord', 'print', 'property', 'range',
+    'repr', 'reversed', 'round', 'self', 'set', 'setattr', 'slice', 'sorted', 'str', 'sum', 'super', 'tuple',
+    'type', 'zip',
+)
+
+PYTHON = Language('python', {
+    'root': [
+        (r'#.*', 'comment', None),
+        (r'[rRbBuUfF]{0,2}"""', 'string', 'string3d'),
+        (r"[rRbBuUfF]{0,2}'''", 'string', 'string3s'),
+        (r'[rRbBuUfF]{0,2}"(?:[^"\\]|\\.)*"?', 'string', None),
+        (r"[rRbBuUfF]{0,2}'(?:[^'\\]|\\.)*'?", 'string', None),
+        (r'@[\w.]+', 'decorator', None),
+        (r'(?<=\bdef )\w+|(?<=\bclass )\w+', 'definition', None),
+        (r'\b(?:%s)\b' % '|'.join(_KEYWORDS), 'keyword', None),
+        (r'\b(?:%s)\b' % '|'.join(_BUILTINS), 'builtin', None),
+        (r'\b(?:0[xXoObB][0-9a-fA-F_]+|\d[\d_]*\.?[\d_]*(?:[eE][+-]?\d+)?j?)\b', 'number', None),
+    ],
+    'string3d': [
+        (r'(?:[^"\\]|\\.|"(?!""))*"""', 'string', 'root'),
+        (r'.+', 'string', None),
+    ],
+    'string3s': [
+        (r"(?:[^'\\]|\\.|'(?!''))*'''", 'string', 'root'),
+        (r'.+', 'string', None),
+    ],
+})
+
+# Languages keyed by file extension
+LANGUAGES = {
+    '.py': PYTHON,
+    '.pyw': PYTHON,
+}
+
+
+def language_for(filename: Optional[str]) -> Optional[Language]:
+    """Get the language of a file from its extension, or None if the
+    language is not known."""
+    if filename is None:
+        return None
+
+    return LANGUAGES.get(os.path.splitext(filename)[1].lower())
+
+
+class Tokenizer(threading.Thread):
+    """Tokenizes a document on a background thread.
+
+    Messages are sent to the Tokenizer through `inbox`. Each time it catches
+    up with them, the tokens of the lines around the current view are placed
+    on `results` as a (generation, first_line, tokens) tuple, where the
+    generation is that of the most recent edit and first_line is zero based.
+    `busy` tells whether it has yet to catch up.
+    """
+
+    def __init__(self, language: Language, rope: Rope, generation: int = 0):
+        """Create a new Tokenizer instance.
+
+        Args:
+            language: The language to tokenize.
+            rope: The document's content.
+            generation: The number of edits made to the document so far.
+        """
+        super().__init__(daemon=True)
+        self.language = language
+        self.rope = rope
+        self.generation = generation
+        self.inbox = queue.Queue()
+        self.results = queue.Queue()
+
+        # The lexer state at the start of each lexed line, plus the state at
+        # the end of the last lexed line
+        self.states = [language.initial]
+        # The tokens of each lexed line, or None for lines needing to be lexed
+        self.tokens = []
+        # The first and last visible lines, zero based
+        self.view = (0, 0)
+        # Whether the tokens around the view have changed since last sent
+        self._stale = True
+
+        # The number of messages sent, and the number caught up with
+        self._sent = 0
+        self._processed = 0
+
+    def edit(self, generation: int, rope: Rope, line: int, removed: int, inserted: int):
+        """Notify the Tokenizer of an edit.
+
+        Args:
+            generation: The number of edits made to the document.
+            rope: The document's content after the edit.
+            line: The zero based line the edit starts on.
+            removed: The number of newlines removed.
+            inserted: The number of newlines inserted.
+        """
+        self._sent += 1
+        self.inbox.put(('edit', generation, rope, line, removed, inserted))
+
+    def show(self, first: int, last: int):
+        """Notify the Tokenizer of the zero based first and last visible lines."""
+        self._sent += 1
+        self.inbox.put(('view', first, last))
+
+    @property
+    def busy(self) -> bool:
+        """Whether there are messages the Tokenizer hasn't yet caught up with.
+        Once it has, the results for them are already on `results`."""
+        return self._processed < self._sent
+
+    def stop(self):
+        self.inbox.put(None)
+
+    def run(self):
+        handled = 0
+
+        while True:
+            message = self.inbox.get()
+
+            # Handle everything queued before doing any lexing, stopping
+            # when the None sent by stop() is received
+            while message is not None:
+                self._handle(message)
+                handled += 1
+                try:
+                    message = self.inbox.get_nowait()
+                except queue.Empty:
+                    break
+            else:
+                return
+
+            if self._lex():
+                if self._stale:
+                    first, limit = self._region()
+                    self.results.put((self.generation, first, self.tokens[first:limit]))
+                    self._stale = False
+                self._processed = handled
+
+    def _handle(self, message):
+        if message[0] == 'view':
+            self.view = message[1:]
+        else:
+            _, self.generation, self.rope, line, removed, inserted = message
+
+            if line + removed >= len(self.tokens):
+                del self.tokens[line:]
+                del self.states[line + 1:]
+            else:
+                self.tokens[line:line + removed + 1] = [None] * (inserted + 1)
+                self.states[line + 1:line + removed + 1] = [None] * inserted
+
+        self._stale = True
+
+    def _region(self) -> Tuple[int, int]:
+        """Get the range of lines to highlight, zero based and half open."""
+        first, last = self.view
+        return max(first - VIEW_MARGIN, 0), min(last + VIEW_MARGIN + 1, self.rope.lines)
+
+    def _lex(self) -> bool:
+        """Lex lines up to the end of the highlighted region.
+
+        Returns: True if lexing completed, or False if it was interrupted by
+            a new message.
+        """
+        first, limit = self._region()
+        line = self._next_dirty(0)
+        count = 0
+
+        while line < limit:
+            tokens, state = self.language.lex(self.rope.line(line + 1), self.states[line])
+
+            if line == len(self.tokens):
+                self.tokens.append(tokens)
+                self.states.append(state)
+            else:
+                self.tokens[line] = tokens
+                if self.states[line + 1] != state:
+                    # The following line starts in a different state, so it
+                    # must be lexed again
+                    self.states[line + 1] = state
+                    if line + 1 < len(self.tokens):
+                        self.tokens[line + 1] = None
+
+            if line >= first:
+                self._stale = True
+
+            count += 1
+            if not count % LEX_SLICE and not self.inbox.empty():
+                return False
+
+            line = self._next_dirty(line + 1)
+
+        return True
+
+    def _next_dirty(self, start: int) -> int:
+        try:
+            return self.tokens.index(None, start)
+        except ValueError:
+            return len(self.tokens)
+
+
+class Highlighter:
+    """Applies syntax highlighting to a text widget.
+
+    The widget's content is tracked through the buffer it is mirrored into.
+    `show()` must be called whenever the widget's view changes.
+    """
+
+    def __init__(self, text: tk.Text, buffer: Buffer):
+        """Create a new Highlighter instance.
+
+        Args:
+            text: The text widget.
+            buffer: The buffer that mirrors the text widget.
+        """
+        self.text = text
+        self.buffer = buffer
+        self.generation = 0
+        self.tokenizer = None
+        self._language = None
+        self._view = None
+        self._poll_job = None
+
+        for token, config in theme.syntaxconfig.items():
+            self.text.tag_configure(TAG_PREFIX + token, **config)
+            # Keep the selection visible over highlighted text
+            self.text.tag_lower(TAG_PREFIX + token)
+
+        buffer.on_edit(self._on_edit)
+
+    @property
+    def language(self) -> Optional[Language]:
+        return self._language
+
+    @language.setter
+    def language(self, language: Optional[Language]):
+        """Set the language to highlight, or None to remove highlighting."""
+        if language is self._language:
+            return
+
+        self.close()
+        self._language = language
+
+        if language is not None:
+            self.tokenizer = Tokenizer(language, self.buffer.snapshot(), self.generation)
+            self.tokenizer.start()
+            self._view = None
+            self.show()
+
+    def show(self):
+        """Notify the Highlighter that the widget's view may have changed."""
+        if self.tokenizer is None:
+            return
+
+        height = self.text.winfo_height()
+        view = (
+            int(self.text.index('@0,0').split('.')[0]) - 1,
+            int(self.text.index(f'@0,{height}').split('.')[0]) - 1,
+        )
+
+        if view != self._view:
+            self._view = view
+            self.tokenizer.show(*view)
+            self._schedule()
+
+    def _on_edit(self, edit: Edit):
+        self.generation += 1
+
+        if self.tokenizer is not None:
+            line, _ = edit.before.position(edit.offset)
+            self.tokenizer.edit(
+                self.generation, edit.after, line - 1, edit.removed.count('\n'), edit.inserted.count('\n')
+            )
+            self._schedule()
+
+    def _schedule(self):
+        """Poll for results until the tokenizer has caught up."""
+        if self._poll_job is None:
+            self._poll_job = self.text.after(POLL_INTERVAL, self._poll)
+
+    def _poll(self):
+        self._poll_job = None
+        # Checked first, as results for everything caught up with are then
+        # already queued
+        busy = self.tokenizer.busy
+        result = None
+
+        while True:
+            try:
+                result = self.tokenizer.results.get_nowait()
+            except queue.Empty:
+                break
+
+        # Tokens for an earlier generation may no longer line up with the
+        # text. The tokenizer sends fresh ones once it sees the latest edit.
+        if result is not None and result[0] == self.generation:
+            self._apply(*result[1:])
+
+        if busy:
+            self._schedule()
+
+    def _apply(self, first: int, lines: List[List[Token]]):
+        """Replace the syntax tags on a range of lines.
+
+        Args:
+            first: The zero based first line.
+            lines: The tokens of each line.
+        """
+        indices = defaultdict(list)
+
+        for line, tokens in enumerate(lines, first + 1):
+            for start, end, token in tokens:
+                indices[token].extend((f'{line}.{start}', f'{line}.{end}'))
+
+        start, end = f'{first + 1}.0', f'{first + len(lines) + 1}.0'
+
+        for token in self._language.tokens:
+            self.text.tag_remove(TAG_PREFIX + token, start, end)
+
+        for token, token_indices in indices.items():
+            self.text.tag_add(TAG_PREFIX + token, *token_indices)
+
+    def close(self):
+        """Stop highlighting and remove any syntax tags."""
+        if self._poll_job is not None:
+            self.text.after_cancel(self._poll_job)
+            self._poll_job = None
+
+        if self.tokenizer is not None:
+            self.tokenizer.stop()
+            self.tokenizer = None
+
+        if self._language is not None:
+            try:
+                for token in self._language.tokens:
+                    self.text.tag_remove(TAG_PREFIX + token, '1.0', tk.END)
+            except tk.TclError:
+                pass  # The widget has been destroyed
+            self._language = None
@@ -0,0 +1,188 @@
+"""Functionality for running a single instance of the application.
+
+The first instance listens on a Unix domain socket in the state directory.
+Later invocations send the files they were asked to open over the socket and
+exit straight away, rather than starting a second copy of the application.
+
+Each request is a single line of JSON, {"files": [[filename, line], ...]},
+answered with a line containing "ok" once the request has been received.
+"""
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from pyrite.config.state import STATE_DIRECTORY
+
+log = logging.getLogger(__name__)
+
+SOCKET_FILENAME = 'socket'
+
+# How long (seconds) to wait for the running instance to answer a request
+TIMEOUT = 2.0
+
+# The maximum size (bytes) of a request
+MAX_REQUEST_SIZE = 1024 * 1024
+
+
+def socket_path() -> Path:
+    """The path of the socket the running instance listens on."""
+    return Path('~', STATE_DIRECTORY, SOCKET_FILENAME).expanduser()
+
+
+def parse_args(args: List[str]) -> List[Tuple[str, Optional[int]]]:
+    """Parse the files given on the command line.
+
+    Each argument is a filename, optionally followed by a colon and the line
+    number to move the cursor to - e.g. 'main.py:42'. An argument naming an
+    existing file is always treated as a filename, even if it contains a colon.
+
+    Args:
+        args: The command line arguments.
+    Returns: A list of (absolute filename, line number or None) tuples.
+    """
+    files = []
+
+    for arg in args:
+        filename, line = arg, None
+
+        if not os.path.exists(arg):
+            name, sep, number = arg.rpartition(':')
+            if sep and name and number.isdigit():
+                filename, line = name, int(number)
+
+        files.append((os.path.abspath(filename), line))
+
+    return files
+
+
+def send(files: List[Tuple[str, Optional[int]]], path: Path = None) -> bool:
+    """Ask the running instance to open some files.
+
+    Args:
+        files: A list of (filename, line number or None) tuples. The running
+            instance is brought to the front even if this is empty.
+        path: The path of the socket. Defaults to `socket_path()`.
+    Returns: True if the running instance received the request, False if
+        there is no running instance.
+    """
+    request = json.dumps({'files': files}).encode('utf-8') + b'\n'
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(TIMEOUT)
+            sock.connect(str(path or socket_path()))
+            sock.sendall(request)
+            sock.shutdown(socket.SHUT_WR)
+            return sock.makefile('rb').readline().strip() == b'ok'
+    except OSError as e:
+        log.debug('No running instance: %s', e)
+        return False
+
+
+class Server(threading.Thread):
+    """Listens for requests from later invocations of the application.
+
+    The files of each request are placed on `requests` as a list of
+    (filename, line number or None) tuples, for the UI thread to open.
+    """
+
+    def __init__(self, sock: socket.socket, path: Path):
+        """Create a new Server instance. Use `listen()` rather than creating
+        instances directly.
+
+        Args:
+            sock: The bound, listening socket.
+            path: The path the socket is bound to.
+        """
+        super().__init__(daemon=True)
+        self.path = path
+        self.requests = queue.Queue()
+        self._sock = sock
+        self._closed = False
+
+    def run(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                if self._closed:
+                    break
+                continue
+
+            with conn:
+                try:
+                    self._handle(conn)
+                except (OSError, ValueError) as e:
+                    log.warning('Invalid request: %s', e)
+
+    def _handle(self, conn: socket.socket):
+        conn.settimeout(TIMEOUT)
+        data = conn.makefile('rb').readline(MAX_REQUEST_SIZE)
+        request = json.loads(data.decode('utf-8'))
+        files = request.get('files') if isinstance(request, dict) else None
+
+        if not isinstance(files, list) or not all(
+                isinstance(file, list) and len(file) == 2 and isinstance(file[0], str) for file in files):
+            raise ValueError(f'Malformed request {data!r}')
+
+        self.requests.put([(filename, line if isinstance(line, int) else None) for filename, line in files])
+        conn.sendall(b'ok\n')
+
+    def close(self):
+        """Stop listening and remove the socket."""
+        self._closed = True
+
+        try:
+            self.path.unlink()
+        except OSError:
+            pass
+
+        try:
+            # Wakes the thread blocked in accept()
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+        self._sock.close()
+
+
+def listen(path: Path = None) -> Optional[Server]:
+    """Start listening for requests from later invocations.
+
+    A socket left behind by an instance that didn't exit cleanly is replaced.
+
+    Args:
+        path: The path of the socket. Defaults to `socket_path()`.
+    Returns: The running Server, or None if another instance is already
+        listening or the socket couldn't be created.
+    """
+    path = path or socket_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        try:
+            sock.bind(str(path))
+        except OSError:
+            # Either another instance is listening, or the socket is stale
+            if send([], path):
+                sock.close()
+                return None
+            path.unlink()
+            sock.bind(str(path))
+
+        os.chmod(str(path), 0o600)
+        sock.listen()
+    except OSError as e:
+        log.warning('Unable to listen on %s: %s', path, e)
+        sock.close()
+        return None
+
+    server = Server(sock, path)
+    server.start()
+    return server
@@ -0,0 +1,269 @@
+"""Opt-in instrumentation of the responsiveness of the UI.
+
+Every callback Tk makes into Python - event bindings, menu commands and
+`after()` jobs alike - passes through `tkinter.CallWrapper`. Once installed,
+a Monitor replaces its `__call__` so that each callback is timed and
+attributed to the function handling it, at the cost of two clock reads and
+a dictionary update per callback.
+
+The Monitor also measures:
+
+    Stalls       A heartbeat scheduled with `after()` notices when the event
+                 loop has been blocked, and logs the slowest handler that ran
+                 in the meantime.
+    Keystrokes   The time from a key press reaching the first handler until
+                 Tk is next idle, by which time the change has been drawn.
+"""
+import logging
+import tkinter as tk
+from time import perf_counter
+from typing import Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+# How often (milliseconds) the heartbeat checks the event loop
+HEARTBEAT_INTERVAL = 50
+
+# A heartbeat this much later (seconds) than scheduled is logged as a stall
+STALL_THRESHOLD = 0.1
+
+# The upper bounds (seconds) of the buckets of a Histogram
+BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, float('inf'))
+
+# The number of handlers listed in a report
+REPORT_HANDLERS = 20
+
+# The Monitor, once installed
+monitor: Optional['Monitor'] = None
+
+
+class Histogram:
+    """Counts durations in logarithmically sized buckets."""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration: float):
+        """Record a duration in seconds."""
+        for i, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                self.counts[i] += 1
+                break
+
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def percentile(self, fraction: float) -> float:
+        """The upper bound of the bucket holding a percentile, e.g. 0.95.
+        Returns 0 if nothing has been recorded."""
+        target = fraction * self.count
+        seen = 0
+
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if count and seen >= target:
+                return min(bound, self.max)
+
+        return 0.0
+
+    def lines(self) -> List[str]:
+        """Describe the histogram, one line per non-empty bucket."""
+        lines = []
+        lower = 0.0
+
+        for bound, count in zip(BUCKETS, self.counts):
+            if count:
+                bar = '#' * max(round(40 * count / self.count), 1)
+                upper = f'{bound * 1000:g}ms' if bound != float('inf') else 'more'
+                lines.append(f'{lower * 1000:>6g}ms - {upper:<8} {count:>8}  {bar}')
+            lower = bound
+
+        return lines
+
+
+class HandlerStats:
+    """The time spent in a single handler."""
+
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+def handler_name(func) -> str:
+    """A readable name for a callback, identifying the code that handles it.
+
+    The function passed to `after()` is reported in place of the wrapper
+    tkinter creates for it. Lambdas are named by where they are defined.
+    """
+    if getattr(func, '__qualname__', '').endswith('after.<locals>.callit'):
+        func = func.__closure__[func.__code__.co_freevars.index('func')].cell_contents
+
+    func = getattr(func, '__func__', func)
+    module = getattr(func, '__module__', None) or ''
+    name = getattr(func, '__qualname__', None) or type(func).__qualname__
+
+    if name.endswith('<lambda>'):
+        name = f'{name}:{func.__code__.co_firstlineno}'
+
+    return f'{module}.{name}' if module else name
+
+
+class Monitor:
+    """Records how long callbacks take, event loop stalls and keystroke
+    latency. Use `install()` rather than creating instances directly."""
+
+    def __init__(self, root: tk.Misc):
+        """Create a new Monitor instance.
+
+        Args:
+            root: The widget used to schedule the heartbeat.
+        """
+        self.root = root
+        self.handlers: Dict[str, HandlerStats] = {}
+        self.keystrokes = Histogram()
+        self.stalls = Histogram()
+
+        # When the key press currently being handled reached its first handler
+        self._keystroke = None
+
+        # The slowest handler since the last heartbeat, and how long it took
+        self._slowest = None
+        self._slowest_time = 0.0
+
+        self._expected = None
+        self._heartbeat_job = None
+
+    def call(self, wrapper: tk.CallWrapper, *args):
+        """Replaces `tkinter.CallWrapper.__call__`, with the same behaviour
+        apart from the timing."""
+        start = perf_counter()
+
+        try:
+            if wrapper.subst:
+                args = wrapper.subst(*args)
+                if self._keystroke is None and args and getattr(args[0], 'type', None) == tk.EventType.KeyPress:
+                    self.key_pressed(start)
+            return wrapper.func(*args)
+        except SystemExit:
+            raise
+        except:  # noqa: E722 - as tkinter does, so that errors are reported rather than raised into Tcl
+            wrapper.widget._report_exception()
+        finally:
+            self.record(wrapper.func, perf_counter() - start)
+
+    def record(self, func, duration: float):
+        """Record the time taken by a callback."""
+        name = handler_name(func)
+
+        stats = self.handlers.get(name)
+        if stats is None:
+            stats = self.handlers[name] = HandlerStats()
+
+        stats.count += 1
+        stats.total += duration
+        if duration > stats.max:
+            stats.max = duration
+
+        if duration > self._slowest_time:
+            self._slowest, self._slowest_time = name, duration
+
+    def key_pressed(self, when: float):
+        """Start timing a key press, until Tk is next idle."""
+        self._keystroke = when
+        self.root.after_idle(self._key_handled)
+
+    def _key_handled(self):
+        self.keystrokes.add(perf_counter() - self._keystroke)
+        self._keystroke = None
+
+    def start(self):
+        """Start the heartbeat."""
+        self._expected = perf_counter() + HEARTBEAT_INTERVAL / 1000
+        self._heartbeat_job = self.root.after(HEARTBEAT_INTERVAL, self.heartbeat)
+
+    def heartbeat(self):
+        now = perf_counter()
+        lateness = now - self._expected
+
+        if lateness >= STALL_THRESHOLD:
+            self.stalls.add(lateness)
+            log.warning(f'Event loop stalled for {lateness * 1000:.0f}ms, slowest handler: '
+                        f'{self._slowest} ({self._slowest_time * 1000:.0f}ms)')
+
+        self._slowest, self._slowest_time = None, 0.0
+        self._expected = now + HEARTBEAT_INTERVAL / 1000
+        self._heartbeat_job = self.root.after(HEARTBEAT_INTERVAL, self.heartbeat)
+
+    def stop(self):
+        """Stop the heartbeat."""
+        if self._heartbeat_job is not None:
+            self.root.after_cancel(self._heartbeat_job)
+            self._heartbeat_job = None
+
+    def report(self) -> str:
+        """Describe everything recorded so far."""
+        lines = ['Keystroke to idle latency', '']
+
+        if self.keystrokes.count:
+            lines.append(f'{self.keystrokes.count} key presses, median {self.keystrokes.percentile(0.5) * 1000:g}ms, '
+                         f'95th percentile {self.keystrokes.percentile(0.95) * 1000:g}ms, '
+                         f'max {self.keystrokes.max * 1000:.1f}ms')
+            lines.extend(self.keystrokes.lines())
+        else:
+            lines.append('No key presses recorded')
+
+        lines.extend(['', f'Event loop stalls (over {STALL_THRESHOLD * 1000:g}ms)', ''])
+
+        if self.stalls.count:
+            lines.append(f'{self.stalls.count} stalls, {self.stalls.total:.2f}s in total')
+            lines.extend(self.stalls.lines())
+        else:
+            lines.append('No stalls recorded')
+
+        lines.extend(['', 'Handlers by total time', ''])
+        lines.append(f'{"Total":>9} {"Calls":>8} {"Mean":>9} {"Max":>9}  Handler')
+
+        ranked = sorted(self.handlers.items(), key=lambda item: item[1].total, reverse=True)
+        for name, stats in ranked[:REPORT_HANDLERS]:
+            lines.append(f'{stats.total * 1000:>7.0f}ms {stats.count:>8} {stats.total / stats.count * 1000:>7.2f}ms '
+                         f'{stats.max * 1000:>7.1f}ms  {name}')
+
+        return '\n'.join(lines) + '\n'
+
+
+_original_call = tk.CallWrapper.__call__
+
+
+def install(root: tk.Misc) -> Monitor:
+    """Start instrumenting every callback Tk makes into Python.
+
+    Args:
+        root: The widget used to schedule the heartbeat.
+    Returns: The Monitor, which is also available as `monitor`.
+    """
+    global monitor
+    uninstall()
+
+    monitor = Monitor(root)
+    call = monitor.call
+    tk.CallWrapper.__call__ = lambda wrapper, *args: call(wrapper, *args)
+    monitor.start()
+    return monitor
+
+
+def uninstall():
+    """Stop instrumenting callbacks."""
+    global monitor
+
+    if monitor is not None:
+        monitor.stop()
+        monitor = None
+
+    tk.CallWrapper.__call__ = _original_call
@@ -0,0 +1,370 @@
+"""Functionality for journaling unsaved edits so that they can be recovered
+after a crash.
+
+Each document has a journal file in the application's data folder. The file
+starts with a header describing the document's base content - either the
+file it was loaded from or content held inline - followed by the insert and
+delete operations made since. Operations are queued in memory as they happen
+and appended to the file in batches on a background thread, so the cost of
+journaling scales with the size of the edits rather than the size of the
+document.
+
+The journal is compacted once it grows larger than the document, by
+rewriting it as a header followed by the document's current content.
+
+Journal files are removed when a document is closed normally. Any that remain
+at startup belong to documents that were open when the application crashed,
+and can be replayed with `recover()`. Each journal's name starts with the ID
+of the process writing it, so that journals still being written by another
+running instance are left alone.
+"""
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional
+
+from pyrite import fileio
+from pyrite.buffer import Edit, Rope
+from pyrite.config.state import STATE_DIRECTORY
+
+JOURNAL_DIRECTORY = 'journals'
+JOURNAL_SUFFIX = '.journal'
+
+# The number of characters written per line when writing inline content
+CONTENT_CHUNK_SIZE = 64 * 1024
+
+log = logging.getLogger(__name__)
+
+
+def journal_directory() -> Path:
+    return Path('~', STATE_DIRECTORY, JOURNAL_DIRECTORY).expanduser()
+
+
+class Journal:
+    """An append-only log of the edits made to a document.
+
+    Nothing is recorded until `start()` is called. Edits are then passed to
+    `record()` and written out by the next `flush()`, which is normally
+    called periodically by a background thread.
+    """
+
+    def __init__(self, compact_size: int):
+        """Create a new Journal instance.
+
+        Args:
+            compact_size: The minimum size in bytes the journal file must reach
+                before it is compacted.
+        """
+        self.path = journal_directory() / f'{os.getpid()}-{os.urandom(16).hex()}{JOURNAL_SUFFIX}'
+        self.compact_size = compact_size
+
+        # Guards the pending items, which are added to on the UI thread
+        self._lock = threading.Lock()
+        # Guards the journal file
+        self._io_lock = threading.Lock()
+
+        self._pending = []
+        self._started = False
+        self._closed = False
+
+        # The header of the journal file, and the document content after the
+        # most recently written operation
+        self._header = None
+        self._content = None
+
+    def start(self, filename: str = None, encoding: str = 'UTF-8', content: Rope = None):
+        """Start journaling from a new base, discarding anything journaled
+        previously.
+
+        Args:
+            filename: The document's filename, if it has one.
+            encoding: The document's encoding.
+            content: The document's current content. If omitted, the content is
+                assumed to be that of the file, or empty when there's no file.
+        """
+        header = {'filename': filename, 'encoding': encoding, 'inline': content is not None}
+
+        if filename is not None and content is None:
+            stat = os.stat(filename)
+            header.update(size=stat.st_size, mtime=stat.st_mtime_ns)
+
+        with self._lock:
+            self._started = True
+            self._pending.append(('start', header, content or Rope()))
+
+    def stop(self):
+        """Stop journaling, discarding anything journaled previously."""
+        with self._lock:
+            self._started = False
+            self._pending.append(('stop',))
+
+    def record(self, edit: Edit):
+        """Queue an edit to be written to the journal."""
+        if self._started:
+            with self._lock:
+                self._pending.append(('edit', edit))
+
+    def flush(self):
+        """Write any queued edits to the journal file."""
+        with self._lock:
+            items, self._pending = self._pending, []
+
+        if not items:
+            return
+
+        with self._io_lock:
+            if self._closed:
+                return
+
+            starts = [i for i, item in enumerate(items) if item[0] in ('start', 'stop')]
+
+            if starts and items[starts[-1]][0] == 'stop':
+                self._header = self._content = None
+                self._remove()
+                return
+
+            if starts:
+                _, self._header, self._content = items[starts[-1]]
+                edits = [item[1] for item in items[starts[-1] + 1:]]
+
+                if not edits and not self._header['inline']:
+                    # Nothing to recover yet, so don't keep a journal file
+                    self._remove()
+                    with self._lock:
+                        self._pending.insert(0, items[starts[-1]])
+                    return
+
+                self._rewrite()
+            elif self._header is not None:
+                edits = [item[1] for item in items]
+            else:
+                return
+
+            if edits:
+                self._append(edits)
+
+            if self.path.stat().st_size > max(self.compact_size, len(self._content) * 2):
+                self._rewrite(compact=True)
+
+    def _rewrite(self, compact: bool = False):
+        """Replace the journal file with one holding only the header and
+        any inline content.
+
+        Args:
+            compact: Whether to hold the current content inline, so that the
+                operations written so far can be dropped.
+        """
+        header = dict(self._header)
+
+        if compact:
+            header = {'filename': header['filename'], 'encoding': header['encoding'], 'inline': True}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.path.with_suffix('.tmp')
+
+        with open(temp, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps(['h', header]) + '\n')
+
+            if header['inline']:
+                for chunk in _regroup(self._content.chunks()):
+                    f.write(json.dumps(['c', chunk]) + '\n')
+
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp, self.path)
+        self._header = header
+
+    def _append(self, edits: List[Edit]):
+        with open(self.path, 'at', encoding='utf-8') as f:
+            for edit in edits:
+                if edit.removed:
+                    f.write(json.dumps(['d', edit.offset, len(edit.removed)]) + '\n')
+                if edit.inserted:
+                    f.write(json.dumps(['i', edit.offset, edit.inserted]) + '\n')
+
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._content = edits[-1].after
+
+    def _remove(self):
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        """Stop journaling and remove the journal file."""
+        with self._lock:
+            self._pending = []
+            self._started = False
+
+        with self._io_lock:
+            self._closed = True
+            self._remove()
+
+
+def _regroup(chunks) -> Iterator[str]:
+    """Combine small chunks of content into larger ones."""
+    group = []
+    size = 0
+
+    for chunk in chunks:
+        group.append(chunk)
+        size += len(chunk)
+        if size >= CONTENT_CHUNK_SIZE:
+            yield ''.join(group)
+            group = []
+            size = 0
+
+    if group:
+        yield ''.join(group)
+
+
+class Recovered(NamedTuple):
+    """The content of a document recovered from a journal."""
+    path: Path
+    filename: str
+    encoding: str
+    content: Rope
+
+
+def replay(path: Path) -> Recovered:
+    """Rebuild a document's content from its journal file.
+
+    Args:
+        path: The journal file.
+    Returns: The recovered content.
+    Raises:
+        ValueError: If the journal is invalid, or the file it is based on has
+            changed since the journal was written.
+    """
+    with open(path, 'rt', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+
+    records = []
+    for line in lines:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            # The final line may have been partly written when the application
+            # crashed. Anything after it can't be trusted.
+            break
+
+    if not records or records[0][0] != 'h':
+        raise ValueError(f'No header in journal {path}')
+
+    header = records[0][1]
+    filename, encoding = header['filename'], header['encoding']
+
+    if header['inline']:
+        content = Rope(''.join(r[1] for r in records if r[0] == 'c'))
+    elif filename is not None:
+        stat = os.stat(filename)
+        if (stat.st_size, stat.st_mtime_ns) != (header['size'], header['mtime']):
+            raise ValueError(f'{filename} has changed since journal {path} was written')
+        # Decoded, and decompressed, as the document was when loaded
+        with open(filename, 'rb') as raw:
+            content = Rope(fileio.open_text(raw, encoding).read())
+    else:
+        content = Rope()
+
+    for record in records[1:]:
+        if record[0] == 'i':
+            content = content.insert(record[1], record[2])
+        elif record[0] == 'd':
+            content = content.delete(record[1], record[1] + record[2])
+
+    return Recovered(path, filename, encoding, content)
+
+
+def _owner(path: Path) -> Optional[int]:
+    """The ID of the process that wrote a journal, or None if it isn't known."""
+    pid, _, _ = path.stem.partition('-')
+    return int(pid) if pid.isdigit() else None
+
+
+def _running(pid: int) -> bool:
+    """Whether a process is running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Running, as another user
+        return True
+
+    return True
+
+
+def recover() -> List[Recovered]:
+    """Replay the journals of documents that were open when the application
+    last exited abnormally.
+
+    Journals written by processes that are still running, such as another
+    instance, are skipped. Journals that can't be replayed are logged and
+    removed. The caller is responsible for removing the others once their
+    content has been restored.
+
+    Returns: The recovered documents.
+    """
+    recovered = []
+
+    try:
+        paths = sorted(journal_directory().glob(f'*{JOURNAL_SUFFIX}'), key=lambda p: p.stat().st_mtime)
+    except FileNotFoundError:
+        return recovered
+
+    for path in paths:
+        owner = _owner(path)
+        if owner is not None and _running(owner):
+            continue
+
+        try:
+            recovered.append(replay(path))
+        except (OSError, ValueError, LookupError) as e:
+            log.warning(f'Unable to recover {path}: {e}')
+            path.unlink()
+
+    return recovered
+
+
+class JournalWriter(threading.Thread):
+    """Periodically flushes a set of journals on a background thread."""
+
+    def __init__(self, interval: float):
+        """Create a new JournalWriter instance.
+
+        Args:
+            interval: The number of seconds between flushes.
+        """
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.journals = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def add(self, journal: Journal):
+        with self._lock:
+            self.journals.add(journal)
+
+    def remove(self, journal: Journal):
+        with self._lock:
+            self.journals.discard(journal)
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                journals = list(self.journals)
+
+            for journal in journals:
+                try:
+                    journal.flush()
+                except OSError as e:
+                    log.error(f'Unable to write journal {journal.path}: {e}')
+
+    def stop(self):
+        self._stopped.set()
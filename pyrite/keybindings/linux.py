@@ -11,3 +11,16 @@ COLUMN_EDIT_PRIOR = '<Alt-Shift-Prior>'
 COLUMN_EDIT_DOC_HOME = '<Control-Alt-Shift-Home>'
 COLUMN_EDIT_DOC_END = '<Control-Alt-Shift-End>'
 COLUMN_EDIT_DRAG = '<Alt-Shift-B3-Motion>'
+
+CANCEL = '<Escape>'
+GOTO_LINE = '<Control-g>'
+
+FIND = '<Control-f>'
+FIND_NEXT = '<F3>'
+FIND_PREVIOUS = '<Shift-F3>'
+
+COMPLETE = '<Control-space>'
+
+FOLLOW = '<Control-Shift-T>'
+
+REFRESH = '<F5>'
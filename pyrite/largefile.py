@@ -0,0 +1,273 @@
+"""Functionality for navigating files that are too large to load into memory."""
+import logging
+import mmap
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_right
+from typing import Optional, Pattern, Tuple
+
+log = logging.getLogger(__name__)
+
+# The number of lines between each stored line offset
+DEFAULT_STRIDE = 1024
+
+# The number of bytes before the end of the file compared when checking that
+# the file has only been appended to
+GROW_CHECK_SIZE = 4096
+
+# The approximate number of bytes searched at a time. Matches can't span
+# windows, but windows always end on a line boundary.
+SEARCH_WINDOW = 1024 * 1024
+
+
+class LineIndex:
+    """An index of line offsets within a memory mapped file.
+
+    Only the offset of every `stride` lines is stored, which keeps the index
+    small however many lines the file has. Locating an arbitrary line means
+    jumping to the nearest stored offset and scanning forward at most `stride`
+    lines from there.
+
+    Lines are numbered from zero. As with the Tk text widget, a file has one
+    more line than it has newline characters.
+
+    The index is populated by calling `build()`, which can be done on a
+    background thread. Lines become available as the build progresses.
+    """
+
+    def __init__(self, filename: str, stride: int = DEFAULT_STRIDE):
+        """Create a new LineIndex instance.
+
+        Args:
+            filename: The name of the file to index.
+            stride: The number of lines between each stored offset.
+        """
+        self.filename = filename
+
+        with open(filename, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self.inode = os.fstat(f.fileno()).st_ino
+
+        self.stride = stride
+        self.size = len(self.mm)
+
+        # A copy of the end of the file, as the map itself shows any changes
+        self._tail = self.mm[-GROW_CHECK_SIZE:]
+
+        # The offsets of lines 0, stride, 2 * stride etc.
+        self.checkpoints = array('q', [0])
+
+        # The total number of lines, which is set once the index is complete
+        self.lines = None
+
+        self._pattern = re.compile(rb'(?:[^\n]*\n){%d}' % stride)
+        self._lock = threading.Lock()
+        self._building = False
+        self._closed = False
+
+    def build(self):
+        """Populate the index, returning when it is complete or when the
+        index has been closed."""
+        with self._lock:
+            if self._closed:
+                return
+            self._building = True
+
+        try:
+            pos = self.checkpoints[-1]
+
+            while not self._closed:
+                match = self._pattern.match(self.mm, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                self.checkpoints.append(pos)
+
+            if not self._closed:
+                remaining = 0
+                while True:
+                    pos = self.mm.find(b'\n', pos) + 1
+                    if not pos:
+                        break
+                    remaining += 1
+
+                self.lines = (len(self.checkpoints) - 1) * self.stride + remaining + 1
+        finally:
+            with self._lock:
+                self._building = False
+                if self._closed:
+                    self.mm.close()
+
+    @property
+    def complete(self) -> bool:
+        """Whether the index has been fully built."""
+        return self.lines is not None
+
+    @property
+    def progress(self) -> float:
+        """The fraction of the file indexed so far, between 0 and 1."""
+        if self.complete or not self.size:
+            return 1.0
+
+        return self.checkpoints[-1] / self.size
+
+    @property
+    def available(self) -> int:
+        """The number of lines that can currently be navigated to."""
+        if self.complete:
+            return self.lines
+
+        return (len(self.checkpoints) - 1) * self.stride
+
+    def offset(self, line: int) -> int:
+        """Get the byte offset of the start of a line.
+
+        Lines beyond the end of the file are treated as starting at the
+        end of the file.
+
+        Args:
+            line: The line number.
+        Returns: The byte offset.
+        """
+        checkpoint = min(line // self.stride, len(self.checkpoints) - 1)
+        pos = self.checkpoints[checkpoint]
+
+        for _ in range(line - checkpoint * self.stride):
+            found = self.mm.find(b'\n', pos)
+            if found < 0:
+                return self.size
+            pos = found + 1
+
+        return pos
+
+    def line_at(self, offset: int) -> int:
+        """Get the line number containing a byte offset.
+
+        Args:
+            offset: The byte offset.
+        Returns: The line number.
+        """
+        checkpoint = bisect_right(self.checkpoints, offset) - 1
+        line = checkpoint * self.stride
+        pos = self.checkpoints[checkpoint]
+
+        while True:
+            pos = self.mm.find(b'\n', pos, offset) + 1
+            if not pos:
+                return line
+            line += 1
+
+    def read(self, first: int, count: int) -> bytes:
+        """Read a range of lines.
+
+        Args:
+            first: The first line to read.
+            count: The number of lines to read.
+        Returns: The lines, including their line endings.
+        """
+        return self.mm[self.offset(first):self.offset(first + count)]
+
+    def search(self, pattern: Pattern, start: int) -> Tuple[Optional[Tuple[int, int]], int]:
+        """Search a window of the file for the first match of a pattern.
+
+        Only one window is searched per call, so that the index can be
+        closed part way through searching a large file. Empty matches are
+        ignored.
+
+        Args:
+            pattern: The compiled bytes pattern to search for.
+            start: The byte offset to begin searching from.
+        Returns: The start and end offsets of the match, or None if there
+            is no match in the window, and the offset to continue searching
+            from. This is the size of the file once the index is closed.
+        """
+        with self._lock:
+            if self._closed:
+                return None, self.size
+
+            end = self.mm.find(b'\n', min(start + SEARCH_WINDOW, self.size)) + 1 or self.size
+
+            for match in pattern.finditer(self.mm, start, end):
+                if match.end() > match.start():
+                    return match.span(), end
+
+            return None, end
+
+    def grow(self) -> bool:
+        """Map the file afresh after it has been appended to, keeping the
+        lines already indexed. Call `build()` again to index the lines
+        appended.
+
+        Returns: True if the file has grown, or False if it was otherwise
+            changed or the index is still being built, in which case a new
+            index is needed.
+        """
+        try:
+            with open(self.filename, 'rb') as f:
+                if os.fstat(f.fileno()).st_ino != self.inode:
+                    return False
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+
+        with self._lock:
+            if self._closed or self._building or len(mm) < self.size or \
+                    mm[self.size - len(self._tail):self.size] != self._tail:
+                mm.close()
+                return False
+
+            self.mm.close()
+            self.mm, self.size, self.lines = mm, len(mm), None
+            self._tail = mm[-GROW_CHECK_SIZE:]
+
+        return True
+
+    def close(self):
+        """Release the memory map, stopping any build in progress."""
+        with self._lock:
+            self._closed = True
+            if not self._building:
+                self.mm.close()
+
+
+class Search(threading.Thread):
+    """Finds the first match of a pattern at or after an offset in an
+    indexed file on a background thread.
+
+    Once `done` is set, `match` holds the start and end offsets of the
+    match, or None if there is no match.
+    """
+
+    def __init__(self, index: LineIndex, pattern: Pattern, start: int = 0):
+        """Create a new Search instance.
+
+        Args:
+            index: The index of the file to search.
+            pattern: The compiled bytes pattern to search for.
+            start: The byte offset to begin searching from.
+        """
+        super().__init__(daemon=True)
+        self.index = index
+        self.pattern = pattern
+        self.start_offset = start
+        self.match = None
+        self.done = threading.Event()
+        self._cancelled = False
+
+    def run(self):
+        try:
+            pos = self.start_offset
+
+            while pos < self.index.size and not self._cancelled:
+                self.match, pos = self.index.search(self.pattern, pos)
+                if self.match is not None:
+                    break
+        except Exception as e:
+            log.error(f'Unable to search {self.index.size} byte file: {e}')
+        finally:
+            self.done.set()
+
+    def cancel(self):
+        self._cancelled = True
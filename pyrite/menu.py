@@ -2,7 +2,7 @@ import tkinter as tk
 from pathlib import Path
 from tkinter import filedialog
 
-from pyrite import state, theme
+from pyrite import instrument, state, theme
 from pyrite.editor import Editor
 
 
@@ -14,6 +14,12 @@ def create(master: tk.Tk, editor: Editor):
     filemenu = FileMenu(master=menubar, editor=editor)
     menubar.add_cascade(label='File', underline=0, menu=filemenu)
 
+    searchmenu = SearchMenu(master=menubar, editor=editor)
+    menubar.add_cascade(label='Search', underline=0, menu=searchmenu)
+
+    viewmenu = ViewMenu(master=menubar, editor=editor)
+    menubar.add_cascade(label='View', underline=0, menu=viewmenu)
+
 
 class FileMenu(tk.Menu):
 
@@ -64,3 +70,47 @@ class FileMenu(tk.Menu):
 
     def exit(self):
         self.editor.exit()
+
+
+class SearchMenu(tk.Menu):
+
+    def __init__(self, master: tk.Menu, editor: Editor):
+        super().__init__(master=master, tearoff=False)
+        self.editor = editor
+
+        self.config(**theme.menuconfig)
+        self.add_command(label='Find...', underline=0, command=self.find)
+        self.add_command(label='Find in Files...', underline=5, command=self.find_in_files)
+
+    def find(self):
+        self.editor.find()
+
+    def find_in_files(self):
+        from pyrite import findinfiles  # Deferred, as it pulls in multiprocessing
+
+        dialog = findinfiles.FindInFilesDialog(self.editor, folder=str(state.get('last_find_loc', Path.home())))
+
+        if dialog.result:
+            folder, pattern, regex, match_case = dialog.result
+            self.editor.find_in_files(folder, pattern, regex, match_case)
+
+            state['last_find_loc'] = folder
+            state.save()
+
+
+class ViewMenu(tk.Menu):
+
+    def __init__(self, master: tk.Menu, editor: Editor):
+        super().__init__(master=master, tearoff=False)
+        self.editor = editor
+
+        self.config(**theme.menuconfig)
+        self.add_command(label='Follow File', underline=0, command=self.follow)
+        if instrument.monitor is not None:
+            self.add_command(label='Performance', underline=0, command=self.performance)
+
+    def follow(self):
+        self.editor.toggle_follow()
+
+    def performance(self):
+        self.editor.show_performance()
@@ -21,3 +21,22 @@ textconfig = {
     'insertbackground': '#ffffff',
     'highlightthickness': 0,
 }
+
+gutterconfig = {
+    'bg': '#313335',
+    'fg': '#606366',
+}
+
+syntaxconfig = {
+    'keyword': {'foreground': '#cc7832'},
+    'builtin': {'foreground': '#8888c6'},
+    'definition': {'foreground': '#ffc66d'},
+    'decorator': {'foreground': '#bbb529'},
+    'string': {'foreground': '#6a8759'},
+    'number': {'foreground': '#6897bb'},
+    'comment': {'foreground': '#808080'},
+}
+
+findconfig = {
+    'background': '#32593d',
+}
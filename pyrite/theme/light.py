@@ -6,3 +6,22 @@ menuconfig = {
     'relief': tk.FLAT,
     'activeborderwidth': 0,
 }
+
+gutterconfig = {
+    'bg': '#f0f0f0',
+    'fg': '#999999',
+}
+
+syntaxconfig = {
+    'keyword': {'foreground': '#0033b3'},
+    'builtin': {'foreground': '#000080'},
+    'definition': {'foreground': '#00627a'},
+    'decorator': {'foreground': '#9e880d'},
+    'string': {'foreground': '#067d17'},
+    'number': {'foreground': '#1750eb'},
+    'comment': {'foreground': '#8c8c8c'},
+}
+
+findconfig = {
+    'background': '#ffe08a',
+}
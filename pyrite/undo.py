@@ -0,0 +1,274 @@
+"""Functionality for undoing and redoing changes to a document.
+
+Tk's own undo stack is unbounded, and holds every change made to a text
+widget. The UndoHistory instead records the changes reported by a document's
+Buffer, keeping only the offset and the text removed and inserted, and drops
+the oldest steps once the history exceeds a memory budget.
+
+Changes are coalesced into steps, each undone as a single action:
+
+    Typing       Consecutive characters typed, deleted or backspaced over are
+                 merged into a single change, until a line is ended, the
+                 cursor jumps or the user pauses.
+    Groups       The changes made within a `Buffer.grouped()` block, such as a
+                 column edit, replace all or reload, form one step. Typing a
+                 run of characters into a column forms one step too.
+"""
+from collections import deque
+from time import monotonic
+from typing import List, NamedTuple, Optional
+
+from pyrite.buffer import Buffer, Edit
+
+# Changes made more than this many seconds apart are never coalesced
+COALESCE_TIME = 1.0
+
+# The approximate memory (bytes) used by a change, besides its text
+CHANGE_OVERHEAD = 100
+
+
+class Change(NamedTuple):
+    """A change made to the content."""
+    offset: int
+    removed: str
+    inserted: str
+
+    @property
+    def size(self) -> int:
+        return len(self.removed) + len(self.inserted) + CHANGE_OVERHEAD
+
+
+class Step:
+    """Changes undone and redone as a single action."""
+
+    __slots__ = ('changes', 'group', 'time', 'sealed', 'size')
+
+    def __init__(self, change: Change, group: Optional[int], time: float):
+        self.changes: List[Change] = [change]
+        # The Buffer group the changes were made in, if any
+        self.group = group
+        # When the last change was made
+        self.time = time
+        # Whether further changes can be coalesced into this step
+        self.sealed = False
+        self.size = change.size
+
+    @property
+    def typing(self) -> bool:
+        """Whether every change typed or deleted a single character."""
+        return all(len(change.removed) + len(change.inserted) == 1 for change in self.changes)
+
+
+def _extend(previous: Change, change: Change) -> Optional[Change]:
+    """Coalesce a single character change with the previous change, if it
+    continues it, returning the combined change."""
+    if len(change.removed) + len(change.inserted) != 1 or previous.inserted.endswith('\n'):
+        return None
+
+    if change.inserted and change.offset == previous.offset + len(previous.inserted):
+        # Typing, including over a selection that was just deleted
+        return Change(previous.offset, previous.removed, previous.inserted + change.inserted)
+
+    if change.removed and not previous.inserted:
+        if change.offset + 1 == previous.offset:
+            # Backspace
+            return Change(change.offset, change.removed + previous.removed, '')
+        if change.offset == previous.offset:
+            # Delete
+            return Change(previous.offset, previous.removed + change.removed, '')
+
+    return None
+
+
+class UndoHistory:
+    """Records the changes made to a Buffer so that they can be undone and
+    redone.
+
+    Register `record()` as a listener of the Buffer. Changes made while the
+    history is disabled, or while it is undoing and redoing, are not recorded.
+    """
+
+    def __init__(self, buffer: Buffer, replay: callable, budget: int):
+        """Create a new UndoHistory instance.
+
+        Args:
+            buffer: The Buffer whose changes are recorded.
+            replay: Callable that applies a list of (start, end, text) edits
+                one after another, such as `TextMirror.replay`.
+            budget: The approximate memory (bytes) the history may use. The
+                oldest steps are dropped to stay within it.
+        """
+        self.buffer = buffer
+        self.replay = replay
+        self.budget = budget
+        self.enabled = True
+        self.size = 0
+
+        self._undo = deque()
+        self._redo = []
+        self._applying = False
+
+        # Stands for the state before the oldest step, and changes whenever
+        # that state does
+        self._base = object()
+
+    def record(self, edit: Edit):
+        """Record an edit made to the Buffer."""
+        if not self.enabled or self._applying:
+            return
+
+        self._clear_redo()
+
+        change = Change(edit.offset, edit.removed, edit.inserted)
+        group = self.buffer.group
+        now = monotonic()
+        step = self._undo[-1] if self._undo else None
+        recent = step is not None and not step.sealed and now - step.time <= COALESCE_TIME
+
+        if recent and group is not None and step.group == group:
+            step.changes.append(change)
+            step.size += change.size
+            self.size += change.size
+        elif recent and group is None and step.group is None and len(step.changes) == 1 and \
+                _extend(step.changes[0], change) is not None:
+            extended = _extend(step.changes[0], change)
+            self.size += extended.size - step.size
+            step.changes[0], step.size = extended, extended.size
+        else:
+            self._coalesce()
+            self._undo.append(Step(change, group, now))
+            self.size += change.size
+
+        self._undo[-1].time = now
+        self._trim()
+
+    def _coalesce(self):
+        """Merge the latest step into the one before if both typed a
+        character into the same column of lines - i.e. were groups of single
+        character changes, of the same size, made one after the other."""
+        if len(self._undo) < 2:
+            return
+
+        previous, latest = self._undo[-2], self._undo[-1]
+
+        if previous.group is not None and latest.group is not None and not previous.sealed and \
+                len(previous.changes) == len(latest.changes) and latest.time - previous.time <= COALESCE_TIME and \
+                previous.typing and latest.typing:
+            # Changes are applied one after another, so a concatenation undoes correctly
+            previous.changes.extend(latest.changes)
+            previous.size += latest.size
+            previous.time = latest.time
+            previous.sealed = latest.sealed
+            self._undo.pop()
+
+    def _trim(self):
+        while self.size > self.budget and self._undo:
+            self.size -= self._undo.popleft().size
+            self._base = object()
+
+        while self.size > self.budget and self._redo:
+            self.size -= self._redo.pop(0).size
+
+    def _clear_redo(self):
+        for step in self._redo:
+            self.size -= step.size
+        self._redo = []
+
+    def undo(self) -> Optional[int]:
+        """Undo the latest step.
+
+        Returns: The offset at the end of the last change undone, where the
+            cursor belongs, or None if there was nothing to undo.
+        """
+        self._coalesce()
+
+        if not self._undo:
+            return None
+
+        step = self._undo.pop()
+        step.sealed = True
+        self._redo.append(step)
+
+        edits = [(c.offset, c.offset + len(c.inserted), c.removed) for c in reversed(step.changes)]
+        self._apply(edits)
+        return edits[-1][0] + len(edits[-1][2])
+
+    def redo(self) -> Optional[int]:
+        """Redo the latest step undone.
+
+        Returns: The offset at the end of the last change redone, where the
+            cursor belongs, or None if there was nothing to redo.
+        """
+        if not self._redo:
+            return None
+
+        step = self._redo.pop()
+        self._undo.append(step)
+
+        edits = [(c.offset, c.offset + len(c.removed), c.inserted) for c in step.changes]
+        self._apply(edits)
+        return edits[-1][0] + len(edits[-1][2])
+
+    def _apply(self, edits: list):
+        self._applying = True
+        try:
+            self.replay(edits)
+        finally:
+            self._applying = False
+
+    def checkpoint(self) -> object:
+        """Mark the current state, e.g. when the document is saved.
+
+        Further changes are never coalesced into the step before. Comparing
+        the result with `top` later tells whether the content has been
+        returned to this state by undoing or redoing.
+        """
+        self._coalesce()
+        if self._undo:
+            self._undo[-1].sealed = True
+        return self.top
+
+    @property
+    def top(self) -> object:
+        """Identifies the current state - see `checkpoint()`."""
+        return self._undo[-1] if self._undo else self._base
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    def reset(self, enabled: bool = True):
+        """Discard the history.
+
+        Args:
+            enabled: Whether to record changes from now on.
+        """
+        self._undo.clear()
+        self._redo = []
+        self.size = 0
+        self._base = object()
+        self.enabled = enabled
+
+    def export(self) -> 'Steps':
+        """Get the steps of the history, without the Buffer they were recorded
+        against - e.g. to keep while a document is hibernated."""
+        self._coalesce()
+        return Steps(self._undo, self._redo, self.size, self._base)
+
+    def adopt(self, steps: 'Steps'):
+        """Take over steps exported from another history, recorded against the
+        same content."""
+        self._undo, self._redo, self.size, self._base = deque(steps.undo), list(steps.redo), steps.size, steps.base
+        self._trim()
+
+
+class Steps(NamedTuple):
+    """The steps exported from an UndoHistory."""
+    undo: deque
+    redo: list
+    size: int
+    base: object
@@ -0,0 +1,408 @@
+"""Functionality for noticing when open files are changed by other programs,
+and for reloading them without replacing their whole content.
+
+A Watcher thread keeps the state (modification time, size and inode) each
+file was in when it was last read or written, and compares it with the state
+on disk. On Linux, inotify wakes the thread as soon as something in a watched
+file's folder changes, and only the files in that folder are checked.
+Elsewhere every file is checked at a fixed interval.
+
+A changed file is reloaded by diffing it against the document's content on a
+Reloader thread. Only the lines that differ are replaced in the text widget,
+so reloading a large file that gained a line costs little more than reading
+it, and the cursor, marks and undo history all survive.
+"""
+import ctypes
+import ctypes.util
+import difflib
+import logging
+import os
+import queue
+import select
+import struct
+import threading
+from time import monotonic
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from pyrite import fileio
+from pyrite.buffer import Rope
+
+log = logging.getLogger(__name__)
+
+# The size of the blocks compared when finding the common prefix and suffix
+# of two texts
+BLOCK_SIZE = 64 * 1024
+
+# Changed regions with more lines than this are replaced as a single hunk
+# rather than diffed line by line
+MAX_DIFF_LINES = 20000
+
+# How long (seconds) a file must go unchanged before a change is reported, so
+# that a file part way through being written is never reloaded
+SETTLE_TIME = 0.2
+
+# How long (seconds) a file may keep changing before a change is reported
+# anyway, so that files written continually, such as logs, are still reloaded
+MAX_SETTLE_TIME = 2.0
+
+# The inotify events that indicate a file in a watched folder has changed
+_IN_MODIFY = 0x2
+_IN_ATTRIB = 0x4
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_Q_OVERFLOW = 0x4000
+_IN_MASK = _IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct('iIII')
+
+
+class FileState(NamedTuple):
+    """The state of a file on disk."""
+    mtime_ns: int
+    size: int
+    inode: int
+
+
+def stat(filename: str) -> Optional[FileState]:
+    """Get the state of a file, or None if it doesn't exist."""
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+
+    return FileState(st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class _Inotify:
+    """A minimal wrapper around the Linux inotify API, reporting which
+    watched folders have had changes."""
+
+    def __init__(self):
+        """Create a new _Inotify instance.
+
+        Raises:
+            OSError: If inotify isn't available.
+        """
+        try:
+            self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            self.fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        except (AttributeError, OSError) as e:
+            raise OSError(f'inotify unavailable: {e}')
+
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        # Watch descriptor to folder, and folder to watch descriptor
+        self._folders = {}
+        self._descriptors = {}
+
+    def watch(self, folders: Set[str]):
+        """Watch exactly the given folders."""
+        for folder in set(self._descriptors) - folders:
+            self._libc.inotify_rm_watch(self.fd, self._descriptors.pop(folder))
+
+        for folder in folders - set(self._descriptors):
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(folder), _IN_MASK)
+            if wd >= 0:
+                self._descriptors[folder] = wd
+                self._folders[wd] = folder
+
+    def wait(self, timeout: float) -> Optional[Set[str]]:
+        """Wait for changes.
+
+        Args:
+            timeout: The maximum time (seconds) to wait.
+        Returns: The folders with changes, or None if events were lost and
+            every folder should be treated as changed.
+        """
+        changed = set()
+
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return changed
+
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+
+            pos = 0
+            while pos < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, pos)
+                pos += _EVENT.size + length
+                if mask & _IN_Q_OVERFLOW:
+                    return None
+                if wd in self._folders:
+                    changed.add(self._folders[wd])
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Unsettled(NamedTuple):
+    """A file that has changed but not yet stopped changing."""
+    state: Optional[FileState]
+    # When the file was first seen in its current state, and first seen to
+    # have changed
+    since: float
+    first: float
+
+
+class Watcher(threading.Thread):
+    """Watches files for changes made by other programs.
+
+    The files to watch are set with `watch()`, along with the state each was
+    in when the document it belongs to last read or wrote it. Files found in
+    any other state are placed on `changes` as (filename, state) tuples, once
+    per change.
+    """
+
+    def __init__(self, interval: float):
+        """Create a new Watcher instance.
+
+        Args:
+            interval: How often (seconds) to check files when inotify isn't
+                available.
+        """
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.changes = queue.Queue()
+
+        # The state each file is expected to be in, and the states last given
+        # to watch()
+        self._expected = {}
+        self._given = {}
+        self._lock = threading.Lock()
+
+        # Files that have changed and are waiting to settle, which are checked
+        # again on each pass. Only used by the watcher thread.
+        self._unsettled: Dict[str, _Unsettled] = {}
+        self._closed = threading.Event()
+
+        try:
+            self._inotify = _Inotify()
+        except OSError as e:
+            log.debug(f'Polling for file changes: {e}')
+            self._inotify = None
+
+    def watch(self, files: Dict[str, Optional[FileState]]):
+        """Set the files to watch.
+
+        Args:
+            files: The expected state of each file, keyed by filename. Files
+                not included are no longer watched. A file whose state is the
+                same as when last given keeps any later state already reported.
+        """
+        with self._lock:
+            self._expected = {
+                filename: self._expected[filename]
+                if filename in self._expected and self._given.get(filename) == state else state
+                for filename, state in files.items()
+            }
+            self._given = dict(files)
+
+    def run(self):
+        watched = set()
+
+        try:
+            while not self._closed.is_set():
+                with self._lock:
+                    filenames = list(self._expected)
+
+                for filename in set(self._unsettled) - set(filenames):
+                    del self._unsettled[filename]
+
+                # Files waiting to settle are checked again soon
+                timeout = SETTLE_TIME if self._unsettled else self.interval
+
+                if self._inotify is None:
+                    if self._closed.wait(timeout):
+                        break
+                    self._check(filenames)
+                    continue
+
+                self._inotify.watch({os.path.dirname(filename) for filename in filenames})
+                # Catch changes made before the folders of new files were watched
+                self._check([filename for filename in filenames if filename not in watched])
+                watched = set(filenames)
+
+                folders = self._inotify.wait(timeout)
+                if folders is None:
+                    self._check(filenames)
+                elif folders or self._unsettled:
+                    self._check([
+                        filename for filename in filenames
+                        if os.path.dirname(filename) in folders or filename in self._unsettled
+                    ])
+        finally:
+            if self._inotify is not None:
+                self._inotify.close()
+
+    def _check(self, filenames: List[str]):
+        now = monotonic()
+
+        for filename in filenames:
+            with self._lock:
+                expected = self._expected.get(filename)
+
+            current = stat(filename)
+            if current == expected:
+                self._unsettled.pop(filename, None)
+                continue
+
+            if not self._settled(filename, current, now):
+                continue
+
+            with self._lock:
+                if filename not in self._expected or self._expected[filename] != expected:
+                    # Changed through watch() in the meantime
+                    continue
+                self._expected[filename] = current
+
+            self.changes.put((filename, current))
+
+    def _settled(self, filename: str, current: Optional[FileState], now: float) -> bool:
+        """Whether a changed file has stopped changing, or has been changing
+        for too long to wait for. A file that hasn't is left to be checked
+        again, rather than waited for, so that other files are still checked
+        in the meantime."""
+        unsettled = self._unsettled.get(filename)
+
+        if unsettled is None:
+            self._unsettled[filename] = _Unsettled(current, now, now)
+            return False
+
+        if unsettled.state != current:
+            unsettled = self._unsettled[filename] = unsettled._replace(state=current, since=now)
+
+        if now - unsettled.since < SETTLE_TIME and now - unsettled.first < MAX_SETTLE_TIME:
+            return False
+
+        del self._unsettled[filename]
+        return True
+
+    def close(self):
+        """Stop watching."""
+        self._closed.set()
+
+
+def common_prefix(a: str, b: str) -> int:
+    """The length of the common prefix of two strings."""
+    length = min(len(a), len(b))
+    start = 0
+
+    # Skip whole blocks that match, which is fast as the comparison is in C
+    while start + BLOCK_SIZE <= length and a[start:start + BLOCK_SIZE] == b[start:start + BLOCK_SIZE]:
+        start += BLOCK_SIZE
+
+    # Then narrow down the first block that doesn't
+    end = min(start + BLOCK_SIZE, length)
+    while start < end:
+        middle = (start + end + 1) // 2
+        if a[start:middle] == b[start:middle]:
+            start = middle
+        else:
+            end = middle - 1
+
+    return start
+
+
+def common_suffix(a: str, b: str, limit: int) -> int:
+    """The length of the common suffix of two strings, up to a limit."""
+    length = min(len(a), len(b), limit)
+    count = 0
+
+    while count + BLOCK_SIZE <= length and \
+            a[len(a) - count - BLOCK_SIZE:len(a) - count] == b[len(b) - count - BLOCK_SIZE:len(b) - count]:
+        count += BLOCK_SIZE
+
+    end = min(count + BLOCK_SIZE, length)
+    while count < end:
+        middle = (count + end + 1) // 2
+        if a[len(a) - middle:len(a) - count] == b[len(b) - middle:len(b) - count]:
+            count = middle
+        else:
+            end = middle - 1
+
+    return count
+
+
+def diff(old: str, new: str) -> List[Tuple[int, int, str]]:
+    """Find the changes that turn one text into another.
+
+    The unchanged start and end of the texts are skipped quickly. What's left
+    is compared line by line, unless it's too large to be worth it.
+
+    Args:
+        old: The original text.
+        new: The changed text.
+    Returns: A list of (start, end, text) tuples, in order, where start and end
+        are offsets into the original text of a range to replace with text.
+    """
+    prefix = common_prefix(old, new)
+    suffix = common_suffix(old, new, min(len(old), len(new)) - prefix)
+
+    if prefix == len(old) == len(new):
+        return []
+
+    # Align the unchanged regions with the start of lines
+    prefix = old.rfind('\n', 0, prefix) + 1
+    if suffix and old[len(old) - suffix - 1] != '\n':
+        end = old.find('\n', len(old) - suffix)
+        suffix = len(old) - end - 1 if end >= 0 else 0
+
+    old_lines = old[prefix:len(old) - suffix].splitlines(keepends=True)
+    new_lines = new[prefix:len(new) - suffix].splitlines(keepends=True)
+
+    if len(old_lines) + len(new_lines) > MAX_DIFF_LINES:
+        return [(prefix, len(old) - suffix, new[prefix:len(new) - suffix])]
+
+    offsets = [prefix]
+    for line in old_lines:
+        offsets.append(offsets[-1] + len(line))
+
+    return [
+        (offsets[i1], offsets[i2], ''.join(new_lines[j1:j2]))
+        for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes()
+        if tag != 'equal'
+    ]
+
+
+class Reloader(threading.Thread):
+    """Reads a file and diffs it against a document's content on a
+    background thread.
+
+    Once `done` is set, `hunks` holds the changes to make to the content, as
+    returned by `diff()`, or `error` holds the exception that occurred.
+    """
+
+    def __init__(self, filename: str, encoding: str, content: Rope):
+        """Create a new Reloader instance.
+
+        Args:
+            filename: The name of the file.
+            encoding: The file encoding.
+            content: The document's current content.
+        """
+        super().__init__(daemon=True)
+        self.filename = filename
+        self.encoding = encoding
+        self.content = content
+        self.hunks = None
+        self.error = None
+        self.done = threading.Event()
+
+    def run(self):
+        try:
+            with open(self.filename, 'rb') as raw:
+                text = fileio.open_text(raw, self.encoding).read()
+            self.hunks = diff(str(self.content), text)
+        except Exception as e:
+            log.error(f'Unable to reload {self.filename}: {e}')
+            self.error = e
+        finally:
+            self.done.set()
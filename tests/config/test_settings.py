@@ -6,6 +6,13 @@ import pytest
 from pyrite.config.settings import SETTINGS_FILENAME, Settings, settings
 
 
+@pytest.fixture(autouse=True)
+def cache():
+    with patch('pyrite.config.settings.read_cache', return_value=None) as mock_read:
+        with patch('pyrite.config.settings.write_cache') as mock_write:
+            yield mock_read, mock_write
+
+
 class TestInitialise:
 
     @pytest.fixture
@@ -144,3 +151,50 @@ class TestGetters:
 
         assert settings.getfloat('test_float') == 5.0
         log.warning.assert_called()
+
+
+class TestCache:
+
+    @pytest.fixture
+    def home(self, tmp_path):
+        with patch('pyrite.config.settings.Path', side_effect=lambda *args: Path(tmp_path, *args[1:])):
+            yield tmp_path
+
+    def test_writes_cache(self, home, cache):
+        Settings().initialise()
+
+        _, write_cache = cache
+        defaults, key, default_settings, data = write_cache.call_args[0][0]
+        stat = (home / SETTINGS_FILENAME).stat()
+
+        assert key == (stat.st_mtime_ns, stat.st_size)
+        assert default_settings['theme'] == 'dark'
+        assert data == default_settings
+
+    def test_reads_cache(self, home, cache):
+        (home / SETTINGS_FILENAME).write_text('theme: light\n')
+        stat = (home / SETTINGS_FILENAME).stat()
+        read_cache, write_cache = cache
+
+        with open(Path(__file__).parents[2] / 'pyrite' / 'config' / '.pyrite.defaults', 'rb') as f:
+            defaults = f.read()
+        read_cache.return_value = (defaults, (stat.st_mtime_ns, stat.st_size), {'theme': 'dark'}, {'theme': 'cached'})
+
+        with patch('pyrite.config.settings.yaml') as yaml:
+            s = Settings()
+            s.initialise()
+
+        assert s['theme'] == 'cached'
+        assert yaml.load.call_count == 0
+        assert write_cache.call_count == 0
+
+    def test_stale_cache(self, home, cache):
+        (home / SETTINGS_FILENAME).write_text('theme: light\n')
+        read_cache, write_cache = cache
+        read_cache.return_value = (b'old', None, {}, {'theme': 'cached'})
+
+        s = Settings()
+        s.initialise()
+
+        assert s['theme'] == 'light'
+        write_cache.assert_called_once()
@@ -0,0 +1,156 @@
+import random
+from unittest.mock import Mock
+
+import pytest
+
+from pyrite.buffer import Buffer, Edit, Rope, _merge
+
+
+@pytest.fixture
+def content():
+    rand = random.Random(1)
+    return ''.join(rand.choice('abc \n') for _ in range(50000))
+
+
+def line_start(text, line):
+    pos = 0
+    for _ in range(line - 1):
+        pos = text.index('\n', pos) + 1
+    return pos
+
+
+class TestRope:
+
+    def test_empty(self):
+        rope = Rope()
+
+        assert len(rope) == 0
+        assert str(rope) == ''
+        assert rope.lines == 1
+
+    def test_build(self, content):
+        rope = Rope(content)
+
+        assert str(rope) == content
+        assert len(rope) == len(content)
+        assert rope.lines == content.count('\n') + 1
+
+    def test_random_edits(self, content):
+        rand = random.Random(2)
+        rope = Rope(content)
+        text = content
+
+        for _ in range(500):
+            pos = rand.randint(0, len(text))
+            if rand.random() < 0.5:
+                insert = ''.join(rand.choice('xy\n') for _ in range(rand.randint(1, 3000)))
+                rope = rope.insert(pos, insert)
+                text = text[:pos] + insert + text[pos:]
+            else:
+                end = min(pos + rand.randint(1, 3000), len(text))
+                rope = rope.delete(pos, end)
+                text = text[:pos] + text[end:]
+
+        assert str(rope) == text
+        assert rope.lines == text.count('\n') + 1
+
+    def test_edits_are_persistent(self):
+        rope = Rope('hello')
+
+        assert str(rope.insert(5, ' world')) == 'hello world'
+        assert str(rope.delete(0, 2)) == 'llo'
+        assert str(rope) == 'hello'
+
+    def test_delete_all(self, content):
+        rope = Rope(content).delete(0, len(content))
+
+        assert str(rope) == ''
+        assert str(rope.insert(0, 'a')) == 'a'
+
+    def test_line_start(self, content):
+        rope = Rope(content)
+
+        for line in (1, 2, 100, rope.lines):
+            assert rope.line_start(line) == line_start(content, line)
+
+        assert rope.line_start(rope.lines + 1) == len(content)
+
+    def test_position(self, content):
+        rope = Rope(content)
+
+        for offset in (0, 1, 999, 1024, 30000, len(content)):
+            line, char = rope.position(offset)
+            assert line == content.count('\n', 0, offset) + 1
+            assert rope.offset(line, char) == offset
+
+    def test_line(self):
+        rope = Rope('one\ntwo\nthree')
+
+        assert rope.line(1) == 'one'
+        assert rope.line(2) == 'two'
+        assert rope.line(3) == 'three'
+
+    def test_line_length(self):
+        rope = Rope('one\n\nthree')
+
+        assert [rope.line_length(line) for line in (1, 2, 3)] == [3, 0, 5]
+
+    def test_chunks(self, content):
+        rope = Rope(content)
+
+        assert rope.slice(1000, 40000) == content[1000:40000]
+        assert len(list(rope.chunks())) > 1
+
+
+class TestBuffer:
+
+    def test_edits(self):
+        buffer = Buffer('hello world')
+        buffer.insert(5, ',')
+        buffer.delete(0, 1)
+        buffer.replace(0, 4, 'J')
+
+        assert str(buffer.snapshot()) == 'J, world'
+        assert len(buffer) == 8
+
+    def test_invokes_listeners(self):
+        listener = Mock()
+        buffer = Buffer('hello')
+        before = buffer.snapshot()
+        buffer.on_edit(listener)
+
+        buffer.replace(1, 3, 'EE')
+
+        listener.assert_called_once_with(Edit(1, 'el', 'EE', before, buffer.snapshot()))
+
+    def test_empty_edits_ignored(self):
+        listener = Mock()
+        buffer = Buffer('hello')
+        buffer.on_edit(listener)
+
+        buffer.insert(1, '')
+        buffer.delete(3, 3)
+
+        listener.assert_not_called()
+
+    def test_grouped(self):
+        groups = []
+        buffer = Buffer('hello')
+        buffer.on_edit(lambda edit: groups.append(buffer.group))
+
+        buffer.insert(0, 'a')
+        with buffer.grouped():
+            buffer.insert(0, 'b')
+            with buffer.grouped():
+                buffer.insert(0, 'c')
+        with buffer.grouped():
+            buffer.insert(0, 'd')
+
+        assert groups[0] is None
+        assert groups[1] == groups[2]
+        assert groups[3] not in (None, groups[1])
+        assert buffer.group is None
+
+
+def test_merge():
+    assert _merge([(5, 8), (0, 2), (1, 3), (8, 8), (7, 10)]) == [(0, 3), (5, 10)]
@@ -0,0 +1,58 @@
+import codecs
+
+import pytest
+
+from pyrite.charset import SAMPLE_SIZE, detect, sniff
+
+
+class TestDetect:
+
+    @pytest.mark.parametrize('sample,expected', [
+        (codecs.BOM_UTF8 + b'abc', 'utf-8-sig'),
+        (codecs.BOM_UTF16_LE + 'abc'.encode('utf-16-le'), 'utf-16'),
+        (codecs.BOM_UTF16_BE + 'abc'.encode('utf-16-be'), 'utf-16'),
+        (codecs.BOM_UTF32_LE + 'abc'.encode('utf-32-le'), 'utf-32'),
+    ])
+    def test_bom(self, sample, expected):
+        assert detect(sample) == expected
+
+    def test_utf8(self):
+        assert detect('café €'.encode('utf-8'), complete=True) == 'utf-8'
+
+    def test_ascii(self):
+        assert detect(b'hello\n', complete=True) == 'utf-8'
+
+    def test_empty(self):
+        assert detect(b'', complete=True) == 'utf-8'
+
+    def test_truncated_utf8_sequence(self):
+        sample = 'café'.encode('utf-8')[:-1]
+
+        assert detect(sample) == 'utf-8'
+        assert detect(sample, complete=True) != 'utf-8'
+
+    @pytest.mark.parametrize('encoding', ['utf-16-le', 'utf-16-be'])
+    def test_utf16_without_bom(self, encoding):
+        assert detect('hello world\n'.encode(encoding), complete=True) == encoding
+
+    def test_cp1252(self):
+        assert detect('café €5'.encode('cp1252'), complete=True) == 'cp1252'
+
+    def test_latin1(self):
+        assert detect(b'caf\xe9 \x81', complete=True) == 'latin-1'
+
+
+class TestSniff:
+
+    def test_reads_prefix_only(self, tmp_path):
+        path = tmp_path / 'test.txt'
+        # Invalid UTF-8 beyond the sample isn't seen
+        path.write_bytes(b'a' * SAMPLE_SIZE + b'\xe9')
+
+        assert sniff(str(path)) == 'utf-8'
+
+    def test_short_file(self, tmp_path):
+        path = tmp_path / 'test.txt'
+        path.write_bytes(b'caf\xe9')
+
+        assert sniff(str(path)) == 'cp1252'
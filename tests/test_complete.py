@@ -0,0 +1,174 @@
+import random
+import string
+
+import pytest
+
+from pyrite.buffer import Buffer, Rope
+from pyrite.complete import BUCKET_SIZE, Scanner, Trie, WordIndex, changed_words, count_words
+
+
+def test_count_words():
+    assert count_words('def foo(self, x1, ab_c): return _bar + 123abc') == {
+        'def': 1, 'foo': 1, 'self': 1, 'ab_c': 1, 'return': 1, '_bar': 1
+    }
+
+
+@pytest.mark.parametrize('offset, length, text', [
+    (4, 0, 'x'),
+    (4, 3, ''),
+    (0, 11, 'hello world\nagain'),
+    (10, 5, 'bye'),
+])
+def test_changed_words(offset, length, text):
+    buffer = Buffer('one two\nthree four\nfive six\n')
+    edits = []
+    buffer.on_edit(edits.append)
+    before = count_words(str(buffer.snapshot()))
+
+    buffer.replace(offset, offset + length, text)
+
+    expected = count_words(str(buffer.snapshot()))
+    expected.subtract(before)
+    assert changed_words(edits[0]) == {word: count for word, count in expected.items() if count}
+
+
+class TestTrie:
+
+    @pytest.fixture
+    def words(self):
+        rand = random.Random(1)
+        return {
+            ''.join(rand.choice('abc') + rand.choice(string.ascii_lowercase) for _ in range(rand.randint(2, 4))):
+                rand.randint(1, 50)
+            for _ in range(2000)
+        }
+
+    @pytest.fixture
+    def trie(self, words):
+        trie = Trie()
+        for word, count in words.items():
+            trie.add(word, count)
+        return trie
+
+    def test_complete(self, trie, words):
+        for prefix in ('a', 'ab', 'cz', 'bqa', ''):
+            matching = [(word, count) for word, count in words.items() if word.startswith(prefix) and word != prefix]
+            expected = [word for word, _ in sorted(matching, key=lambda item: (-item[1], item[0]))[:10]]
+
+            assert trie.complete(prefix, 10) == expected
+
+    def test_splits(self, trie):
+        assert trie.root.children is not None
+        assert len(trie.root.words) <= BUCKET_SIZE
+
+    def test_counts(self, trie, words):
+        for word, count in list(words.items())[:100]:
+            assert trie.count(word) == count
+        assert trie.count('zzz') == 0
+
+    def test_update(self):
+        trie = Trie()
+        trie.add('apple', 2)
+        trie.add('apply', 3)
+
+        assert trie.complete('app') == ['apply', 'apple']
+
+        trie.add('apple', 2)
+        assert trie.complete('app') == ['apple', 'apply']
+
+        trie.remove('apple', 4)
+        assert trie.complete('app') == ['apply']
+        assert trie.count('apple') == 0
+
+    def test_remove_all(self, trie, words):
+        for word, count in words.items():
+            trie.remove(word, count)
+
+        assert trie.complete('') == []
+        assert not trie.root.words
+        assert not trie.root.children
+
+    def test_prefix_excluded(self):
+        trie = Trie()
+        trie.add('foo', 5)
+        trie.add('foobar')
+
+        assert trie.complete('foo') == ['foobar']
+
+
+def test_scanner():
+    content = ' '.join(f'word{i % 1000}' for i in range(100000))
+    scanner = Scanner(Rope(content))
+    scanner.start()
+
+    assert scanner.done.wait(timeout=5)
+    assert scanner.words == count_words(content)
+
+
+class TestWordIndex:
+
+    @pytest.fixture
+    def index(self):
+        return WordIndex()
+
+    def wait(self, index):
+        while index.scanning:
+            index.poll()
+
+    def test_documents(self, index):
+        index.add('a', Rope('alpha beta beta'))
+        index.add('b', Rope('alphabet beta'))
+        self.wait(index)
+
+        assert index.complete('alp') == ['alpha', 'alphabet']
+        assert index.complete('be') == ['beta']
+
+        index.remove('a')
+        assert index.complete('alp') == ['alphabet']
+        assert index.trie.count('beta') == 1
+
+    def test_edits(self, index):
+        buffer = Buffer('alpha beta\n')
+        buffer.on_edit(lambda edit: index.edit('a', edit))
+        index.add('a', buffer.snapshot())
+        self.wait(index)
+
+        buffer.insert(11, 'gamma\n')
+        buffer.delete(0, 6)
+
+        assert index.complete('') == ['beta', 'gamma']
+
+    def test_edits_while_scanning(self, index):
+        buffer = Buffer('alpha beta\n')
+        buffer.on_edit(lambda edit: index.edit('a', edit))
+        index.add('a', buffer.snapshot())
+
+        # Made before the snapshot has been counted
+        buffer.replace(0, 5, 'delta')
+        self.wait(index)
+
+        assert index.complete('') == ['beta', 'delta']
+
+    def test_polls_in_slices(self, index):
+        buffer = Buffer(' '.join(f'word{i}' for i in range(5000)))
+        buffer.on_edit(lambda edit: index.edit('a', edit))
+        index.add('a', buffer.snapshot())
+        index._pending['a'].scanner.done.wait(timeout=5)
+
+        index.poll(time_limit=0)
+        assert index.scanning
+
+        # Made while the counted words are being taken in
+        buffer.delete(0, 6)
+        while index.scanning:
+            index.poll(time_limit=0)
+
+        assert index.trie.count('word0') == 0
+        assert index.trie.count('word4999') == 1
+
+    def test_edits_to_unknown_documents_ignored(self, index):
+        buffer = Buffer('alpha')
+        buffer.on_edit(lambda edit: index.edit('a', edit))
+        buffer.insert(0, 'beta ')
+
+        assert index.complete('') == []
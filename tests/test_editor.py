@@ -0,0 +1,175 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+from pyrite.buffer import Buffer
+from pyrite.editor import Document, Editor, LargeDocument, Placeholder
+from pyrite.undo import UndoHistory
+from pyrite.watch import FileState
+
+
+def document(content: str = ''):
+    """A stand-in for a Document, without a text widget, whose undo history
+    is real."""
+    doc = Mock(word_index=None, journal=None, loading=False, disk_state=None)
+    doc.buffer = Buffer(content)
+    doc.history = UndoHistory(doc.buffer, replay=Mock(), budget=1024 * 1024)
+    doc.buffer.on_edit(doc.history.record)
+    doc._clean_step = doc.history.checkpoint()
+    doc._on_loaded = []
+    doc.adopt_history.side_effect = lambda *args: Document.adopt_history(doc, *args)
+    return doc
+
+
+class TestRestore:
+
+    @patch('pyrite.editor.fileio.sniff_compression', return_value=None)
+    def test_keeps_undo_history_without_word_completion(self, _):
+        hibernated = document('hello')
+        clean = hibernated._clean_step
+        hibernated.buffer.insert(5, '!')
+
+        restored = document()
+        Document.restore(restored, 'a.txt', 'utf-8', 'hello!', history=Document.export_history(hibernated))
+
+        assert restored.history.can_undo
+        assert restored._clean_step is clean
+        restored.history.undo()
+        assert restored.history.top is clean
+
+
+class TestAdoptHistory:
+
+    def test_once_loaded(self):
+        saved = document('hello')
+        before = saved._clean_step
+        saved.buffer.insert(5, '!')
+        saved._clean_step = saved.history.checkpoint()
+        state = FileState(1, 6, 1)
+
+        loading = document()
+        loading.loading = True
+        loading.adopt_history(Document.export_history(saved), state)
+        assert not loading.history.can_undo
+
+        # As loading the file leaves it
+        loading.loading = False
+        loading.disk_state = state
+        loading.buffer.insert(0, 'hello!')
+        loading.history.reset()
+        for callback in loading._on_loaded:
+            callback()
+
+        assert loading.history.can_undo
+        assert loading._clean_step is saved._clean_step
+        loading.history.undo()
+        assert loading.history.top is before
+
+    def test_file_changed(self):
+        saved = document('hello')
+        saved.buffer.insert(5, '!')
+
+        loaded = document('changed')
+        loaded.disk_state = FileState(2, 7, 1)
+        loaded.adopt_history(Document.export_history(saved), FileState(1, 6, 1))
+
+        assert not loaded.history.can_undo
+
+
+class TestClose:
+
+    @patch('pyrite.editor.messagebox.askyesnocancel', return_value=True)
+    def test_modified_hibernated_document(self, _):
+        placeholder = Mock(spec=Placeholder, modified=True)
+        placeholder.name = 'a.txt'
+        woken = Mock(filename='a.txt', partial=False, replaced=False, journal=None)
+        woken.save.side_effect = lambda filename, encoding, on_saved: on_saved()
+
+        editor = Mock(documents=[Mock(), placeholder])
+        editor.index.return_value = 1
+        editor.tabs.return_value = editor.documents
+
+        def materialise(document):
+            editor.documents[editor.documents.index(document)] = woken
+            return woken
+
+        editor.materialise.side_effect = materialise
+        editor.confirm_close.side_effect = lambda documents, close: Editor.confirm_close(editor, documents, close)
+        editor.remove.side_effect = lambda document: Editor.remove(editor, document)
+
+        Editor.close_tab(editor, 'tab')
+
+        woken.save.assert_called_once()
+        assert woken not in editor.documents
+        woken.destroy.assert_called_once()
+
+
+class TestSave:
+
+    @patch('pyrite.editor.fileio.Saver')
+    def test_deferred_while_loading(self, saver):
+        doc = Mock(filename='a.txt', loading=True, _on_loaded=[])
+
+        Document.save(doc, 'b.txt')
+
+        saver.assert_not_called()
+        assert doc.filename == 'a.txt'
+        assert len(doc._on_loaded) == 1
+
+    @patch('pyrite.editor.fileio.Saver')
+    def test_replaced_characters_not_saved_over_original(self, saver):
+        doc = Mock(filename='a.txt', loading=False, partial=False, replaced=True)
+
+        with pytest.raises(RuntimeError):
+            Document.save(doc)
+        with pytest.raises(RuntimeError):
+            Document.save(doc, 'a.txt')
+
+        saver.assert_not_called()
+
+
+class TestLargeDocumentReload:
+
+    def test_appended(self):
+        doc = Mock()
+        doc.index.grow.return_value = True
+        LargeDocument.reload(doc)
+
+        doc._poll_index.assert_called_once()
+        doc.load.assert_not_called()
+
+    def test_rewritten(self):
+        doc = Mock()
+        doc.index.grow.return_value = False
+        doc.session.return_value = {'cursor': (3, 0), 'top': 1, 'filename': 'a.log', 'encoding': 'utf-8'}
+        LargeDocument.reload(doc)
+
+        doc.load.assert_called_once_with(doc.filename, doc.encoding)
+        doc.restore_position.assert_called_once_with((3, 0), 1)
+
+
+class TestLargeDocumentFind:
+
+    def test_selects_match(self):
+        doc = Mock(_search=Mock(match=(10, 14)))
+        LargeDocument._poll_search(doc)
+
+        doc.select.assert_called_once_with(10, 14)
+        doc.set_status.assert_called_once_with(None)
+        assert doc._search is None
+
+    def test_not_found(self):
+        doc = Mock(_search=Mock(match=None))
+        LargeDocument._poll_search(doc)
+
+        doc.select.assert_not_called()
+        doc.set_status.assert_called_once_with('not found')
+
+    def test_polls_until_done(self):
+        search = Mock()
+        search.done.is_set.return_value = False
+        doc = Mock(_search=search)
+        LargeDocument._poll_search(doc)
+
+        doc.after.assert_called_once()
+        assert doc._search is search
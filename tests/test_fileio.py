@@ -0,0 +1,255 @@
+import bz2
+import gzip
+import lzma
+import os
+from unittest.mock import patch
+
+import pytest
+
+from pyrite.fileio import (
+    Chunk, Loader, Saver, compression_for, compression_of, line_lengths, sniff_compression, write_atomic
+)
+
+
+COMPRESSORS = {
+    'gzip': gzip.compress,
+    'bz2': bz2.compress,
+    'xz': lzma.compress,
+}
+
+DECOMPRESSORS = {
+    'gzip': gzip.decompress,
+    'bz2': bz2.decompress,
+    'xz': lzma.decompress,
+}
+
+
+def read_all(loader):
+    items = []
+    while True:
+        item = loader.queue.get(timeout=5)
+        items.append(item)
+        if isinstance(item, Exception) or item.last:
+            return items
+
+
+class TestLoader:
+
+    def test_load(self, tmp_path):
+        path = tmp_path / 'test.txt'
+        path.write_text('a' * 100000 + '\nb\n', encoding='utf-8')
+
+        loader = Loader(str(path), 'utf-8', chunk_size=30000)
+        loader.start()
+        chunks = read_all(loader)
+
+        assert ''.join(c.text for c in chunks) == 'a' * 100000 + '\nb\n'
+        assert len(chunks) > 1
+        assert chunks[-1].progress == 1.0
+        assert all(isinstance(c, Chunk) for c in chunks)
+        assert loader.offset == 100003
+        assert loader.longest_line == 100000
+
+    def test_load_empty(self, tmp_path):
+        path = tmp_path / 'test.txt'
+        path.write_text('')
+
+        loader = Loader(str(path), 'utf-8', chunk_size=100)
+        loader.start()
+
+        assert read_all(loader) == [Chunk('', 0.0, True)]
+
+    def test_load_error(self, tmp_path):
+        loader = Loader(str(tmp_path / 'missing.txt'), 'utf-8', chunk_size=100)
+        loader.start()
+
+        assert isinstance(read_all(loader)[-1], FileNotFoundError)
+
+    def test_detect_encoding(self, tmp_path):
+        path = tmp_path / 'test.txt'
+        path.write_bytes('caf\u00e9\n'.encode('utf-16'))
+
+        loader = Loader(str(path), None, chunk_size=100)
+        loader.start()
+
+        assert ''.join(c.text for c in read_all(loader)) == 'caf\u00e9\n'
+        assert loader.encoding == 'utf-16'
+
+    def test_replace_invalid_bytes(self, tmp_path):
+        path = tmp_path / 'test.txt'
+        path.write_bytes(b'a' * 100000 + b'\xff\n')
+
+        loader = Loader(str(path), None, chunk_size=30000)
+        loader.start()
+        chunks = read_all(loader)
+
+        assert ''.join(c.text for c in chunks) == 'a' * 100000 + '\ufffd\n'
+        assert loader.encoding == 'utf-8'
+        assert loader.replaced
+
+    def test_valid_replacement_character(self, tmp_path):
+        path = tmp_path / 'test.txt'
+        path.write_bytes(b'a\xef\xbf\xbd\n')
+
+        loader = Loader(str(path), 'utf-8', chunk_size=30000)
+        loader.start()
+        chunks = read_all(loader)
+
+        assert ''.join(c.text for c in chunks) == 'a\ufffd\n'
+        assert not loader.replaced
+
+    @pytest.mark.parametrize('compression', ['gzip', 'bz2', 'xz'])
+    def test_load_compressed(self, tmp_path, compression):
+        content = ''.join(f'line {i} caf\u00e9\n' for i in range(20000))
+        path = tmp_path / 'test.log.z'
+        path.write_bytes(COMPRESSORS[compression](content.encode('utf-8')))
+
+        loader = Loader(str(path), None, chunk_size=30000)
+        loader.start()
+        chunks = read_all(loader)
+
+        assert ''.join(c.text for c in chunks) == content
+        assert len(chunks) > 1
+        assert chunks[-1].progress == 1.0
+        assert loader.encoding == 'utf-8'
+        assert loader.compression == compression
+
+    def test_cancel(self, tmp_path):
+        path = tmp_path / 'test.txt'
+        path.write_text('a' * 100000)
+
+        loader = Loader(str(path), 'utf-8', chunk_size=10, max_chunks=1)
+        loader.start()
+        loader.cancel()
+        loader.join(timeout=5)
+
+        assert not loader.is_alive()
+        assert loader.cancelled
+
+
+@pytest.mark.parametrize('text, carried, expected', [
+    ('', 0, (0, 0)),
+    ('abc', 2, (5, 5)),
+    ('ab\nc', 0, (2, 1)),
+    ('ab\ncdef\ng', 3, (5, 1)),
+    ('a\nbcdef\n', 0, (5, 0)),
+])
+def test_line_lengths(text, carried, expected):
+    assert line_lengths(text, carried) == expected
+
+
+def test_compression_of():
+    assert compression_of(gzip.compress(b'a')) == 'gzip'
+    assert compression_of(bz2.compress(b'a')) == 'bz2'
+    assert compression_of(lzma.compress(b'a')) == 'xz'
+    assert compression_of(b'plain text') is None
+    assert compression_of(b'') is None
+
+
+def test_sniff_compression(tmp_path):
+    path = tmp_path / 'test.gz'
+    path.write_bytes(gzip.compress(b'a'))
+
+    assert sniff_compression(str(path)) == 'gzip'
+    assert sniff_compression(str(tmp_path / 'missing.gz')) is None
+
+
+def test_compression_for():
+    assert compression_for('/logs/app.log.GZ') == 'gzip'
+    assert compression_for('app.log.xz') == 'xz'
+    assert compression_for('app.log') is None
+
+
+class TestWriteAtomic:
+
+    def test_write(self, tmp_path):
+        path = tmp_path / 'test.txt'
+
+        write_atomic(str(path), 'utf-8', iter(['hello ', 'w\u00f6rld']))
+
+        assert path.read_text(encoding='utf-8') == 'hello w\u00f6rld'
+        assert os.listdir(str(tmp_path)) == ['test.txt']
+
+    @pytest.mark.parametrize('compression', ['gzip', 'bz2', 'xz'])
+    def test_write_compressed(self, tmp_path, compression):
+        path = tmp_path / 'test.log'
+
+        write_atomic(str(path), 'utf-8', iter(['hello ', 'w\u00f6rld\n'] * 1000), compression)
+
+        assert DECOMPRESSORS[compression](path.read_bytes()).decode('utf-8') == 'hello w\u00f6rld\n' * 1000
+        assert os.listdir(str(tmp_path)) == ['test.log']
+
+    def test_preserves_permissions(self, tmp_path):
+        path = tmp_path / 'test.txt'
+        path.write_text('old')
+        path.chmod(0o640)
+
+        write_atomic(str(path), 'utf-8', ['new'])
+
+        assert path.read_text() == 'new'
+        assert path.stat().st_mode & 0o777 == 0o640
+
+    def test_new_file_permissions(self, tmp_path):
+        path = tmp_path / 'test.txt'
+        umask = os.umask(0o027)
+        try:
+            write_atomic(str(path), 'utf-8', ['new'])
+        finally:
+            os.umask(umask)
+
+        assert path.stat().st_mode & 0o777 == 0o640
+
+    def test_replaces_symlink_target(self, tmp_path):
+        target = tmp_path / 'target.txt'
+        target.write_text('old')
+        link = tmp_path / 'link.txt'
+        link.symlink_to(target)
+
+        write_atomic(str(link), 'utf-8', ['new'])
+
+        assert link.is_symlink()
+        assert target.read_text() == 'new'
+
+    def test_failure_leaves_original(self, tmp_path):
+        path = tmp_path / 'test.txt'
+        path.write_text('old')
+
+        def chunks():
+            yield 'new'
+            raise OSError('disk full')
+
+        with pytest.raises(OSError):
+            write_atomic(str(path), 'utf-8', chunks())
+
+        assert path.read_text() == 'old'
+        assert os.listdir(str(tmp_path)) == ['test.txt']
+
+
+class TestSaver:
+
+    def test_save(self, tmp_path):
+        path = tmp_path / 'test.txt'
+
+        saver = Saver(str(path), 'utf-8', ['abc'])
+        saver.start()
+
+        assert saver.done.wait(timeout=5)
+        assert saver.error is None
+        assert path.read_text() == 'abc'
+
+    def test_save_compressed(self, tmp_path):
+        path = tmp_path / 'test.txt.gz'
+
+        saver = Saver(str(path), 'utf-8', ['abc'], compression='gzip')
+        saver.start()
+
+        assert saver.done.wait(timeout=5)
+        assert gzip.decompress(path.read_bytes()) == b'abc'
+
+    def test_save_error(self, tmp_path):
+        with patch('pyrite.fileio.log'):
+            saver = Saver(str(tmp_path / 'missing' / 'test.txt'), 'utf-8', ['abc'])
+            saver.start()
+
+            assert saver.done.wait(timeout=5)
+            assert isinstance(saver.error, FileNotFoundError)
@@ -0,0 +1,96 @@
+import re
+from unittest.mock import patch
+
+import pytest
+
+from pyrite.buffer import Rope
+from pyrite.find import Replacer, Search, compile_pattern, substitute
+
+
+def search(text, pattern):
+    s = Search(Rope(text), pattern)
+    s.start()
+    assert s.done.wait(timeout=5)
+    return s
+
+
+class TestCompilePattern:
+
+    def test_literal(self):
+        assert compile_pattern('a.b').findall('a.b axb A.B') == ['a.b', 'A.B']
+
+    def test_match_case(self):
+        assert compile_pattern('a', match_case=True).findall('aA') == ['a']
+
+    def test_regex(self):
+        assert compile_pattern(r'^\w', regex=True).findall('ab\ncd') == ['a', 'c']
+
+    def test_invalid_regex(self):
+        with pytest.raises(re.error):
+            compile_pattern('(', regex=True)
+
+
+class TestSearch:
+
+    def test_matches(self):
+        s = search('foo bar foo\nfoo', compile_pattern('foo'))
+
+        assert s.count == 3
+        assert list(s.starts) == [0, 8, 12]
+        assert list(s.ends) == [3, 11, 15]
+
+    def test_empty_matches_ignored(self):
+        s = search('abc', compile_pattern('x*', regex=True))
+
+        assert s.count == 0
+
+    def test_windows(self):
+        text = ('foo\n' * 10) + 'bar foo'
+
+        with patch('pyrite.find.WINDOW_SIZE', 6):
+            s = search(text, compile_pattern('foo'))
+
+        assert list(s.starts) == [i * 4 for i in range(10)] + [44]
+
+    def test_between(self):
+        s = search('foo bar foo\nfoo', compile_pattern('foo'))
+
+        assert list(s.between(0, 3)) == [0]
+        assert list(s.between(3, 8)) == []
+        assert list(s.between(2, 13)) == [0, 1, 2]
+
+
+class TestSubstitute:
+
+    def test_literal(self):
+        text = 'a foo b foo c'
+        start, end, replacement, count = substitute(Rope(text), compile_pattern('foo'), r'\1')
+
+        assert (start, end, replacement, count) == (2, 11, r'\1 b \1', 2)
+        assert text[:start] + replacement + text[end:] == r'a \1 b \1 c'
+
+    def test_regex(self):
+        pattern = compile_pattern(r'(\w)=(\w)', regex=True)
+        text = 'x a=b c=d y'
+        start, end, replacement, count = substitute(Rope(text), pattern, r'\2=\1', regex=True)
+
+        assert text[:start] + replacement + text[end:] == 'x b=a d=c y'
+        assert count == 2
+
+    def test_no_matches(self):
+        assert substitute(Rope('abc'), compile_pattern('x'), 'y') is None
+
+    def test_replacer(self):
+        replacer = Replacer(Rope('aaa'), compile_pattern('a'), 'b')
+        replacer.start()
+
+        assert replacer.done.wait(timeout=5)
+        assert replacer.result == (0, 3, 'bbb', 3)
+        assert replacer.error is None
+
+    def test_replacer_error(self):
+        replacer = Replacer(Rope('aaa'), compile_pattern('a', regex=True), r'\9', regex=True)
+        replacer.start()
+
+        assert replacer.done.wait(timeout=5)
+        assert isinstance(replacer.error, re.error)
@@ -0,0 +1,93 @@
+import os
+
+from pyrite.findinfiles import FileSearch, Match, compile_pattern, search_file, walk
+
+
+def collect(search):
+    results = []
+    while True:
+        result = search.results.get(timeout=30)
+        if result is None:
+            return sorted(results)
+        results.append(result)
+
+
+class TestSearchFile:
+
+    def test_matching_lines(self, tmp_path):
+        path = tmp_path / 'a.txt'
+        path.write_text('one foo\ntwo\nfoo three foo\r\nfour\nFOO')
+
+        assert search_file(str(path), compile_pattern('foo')) == [
+            Match(1, 'one foo'),
+            Match(3, 'foo three foo'),
+            Match(5, 'FOO'),
+        ]
+
+    def test_match_case(self, tmp_path):
+        path = tmp_path / 'a.txt'
+        path.write_text('foo\nFOO\n')
+
+        assert search_file(str(path), compile_pattern('FOO', match_case=True)) == [Match(2, 'FOO')]
+
+    def test_regex(self, tmp_path):
+        path = tmp_path / 'a.txt'
+        path.write_text('a1\nb\nc22\n')
+
+        assert search_file(str(path), compile_pattern(r'^\w\d+$', regex=True)) == [Match(1, 'a1'), Match(3, 'c22')]
+
+    def test_utf8(self, tmp_path):
+        path = tmp_path / 'a.txt'
+        path.write_text('x\ncafé\n', encoding='utf-8')
+
+        assert search_file(str(path), compile_pattern('café')) == [Match(2, 'café')]
+
+    def test_binary_skipped(self, tmp_path):
+        path = tmp_path / 'a.bin'
+        path.write_bytes(b'foo\0bar')
+
+        assert search_file(str(path), compile_pattern('foo')) == []
+
+    def test_empty_file(self, tmp_path):
+        path = tmp_path / 'a.txt'
+        path.write_text('')
+
+        assert search_file(str(path), compile_pattern('foo')) == []
+
+    def test_missing_file(self, tmp_path):
+        assert search_file(str(tmp_path / 'missing'), compile_pattern('foo')) == []
+
+
+def test_walk(tmp_path):
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / '.git').mkdir()
+    (tmp_path / 'a.txt').write_text('')
+    (tmp_path / 'sub' / 'b.txt').write_text('')
+    (tmp_path / '.git' / 'c.txt').write_text('')
+    os.symlink(str(tmp_path / 'a.txt'), str(tmp_path / 'link.txt'))
+
+    assert list(walk(str(tmp_path))) == [str(tmp_path / 'a.txt'), str(tmp_path / 'sub' / 'b.txt')]
+
+
+class TestFileSearch:
+
+    def test_search(self, tmp_path):
+        for i in range(100):
+            (tmp_path / f'{i}.txt').write_text('foo\n' if i % 10 == 0 else 'bar\n')
+
+        search = FileSearch(str(tmp_path), compile_pattern('foo'), workers=2)
+        search.start()
+
+        assert collect(search) == sorted((str(tmp_path / f'{i}.txt'), [Match(1, 'foo')]) for i in range(0, 100, 10))
+        assert search.searched == 100
+
+    def test_cancel(self, tmp_path):
+        for i in range(100):
+            (tmp_path / f'{i}.txt').write_text('foo\n')
+
+        search = FileSearch(str(tmp_path), compile_pattern('foo'), workers=1)
+        search.cancel()
+        search.start()
+
+        assert collect(search) == []
+        assert search.cancelled
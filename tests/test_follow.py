@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from pyrite.follow import RESET, Follower, tail
+
+
+def read(follower, count):
+    """Read the text of the next count Appended items, with RESET as '|'."""
+    text = []
+    for _ in range(count):
+        item = follower.queue.get(timeout=2)
+        text.append('|' if item is RESET else item.text)
+    return ''.join(text)
+
+
+class TestFollower:
+
+    @pytest.fixture
+    def path(self, tmp_path):
+        path = tmp_path / 'app.log'
+        path.write_bytes(b'first\n')
+        return path
+
+    @pytest.fixture
+    def follower(self, path):
+        follower = Follower(str(path), 'utf-8', offset=6)
+        follower.start()
+        yield follower
+        follower.cancel()
+        follower.join(timeout=2)
+
+    def append(self, path, data):
+        with open(path, 'ab') as f:
+            f.write(data)
+
+    def test_appended(self, follower, path):
+        self.append(path, b'second\n')
+
+        assert read(follower, 1) == 'second\n'
+        assert follower.offset == 13
+
+    def test_split_character(self, follower, path):
+        self.append(path, 'é'.encode('utf-8')[:1])
+        self.append(path, 'é'.encode('utf-8')[1:] + b'\n')
+
+        assert read(follower, 1) == 'é\n'
+
+    def test_line_endings(self, follower, path):
+        self.append(path, b'a\r')
+        self.append(path, b'\nb\r\n')
+
+        text = ''
+        while text != 'a\nb\n':
+            text += read(follower, 1)
+
+    def test_truncated(self, follower, path):
+        path.write_bytes(b'new\n')
+
+        assert read(follower, 2) == '|new\n'
+
+    def test_rotated(self, follower, path):
+        self.append(path, b'old\n')
+        assert read(follower, 1) == 'old\n'
+
+        os.rename(str(path), str(path) + '.1')
+        path.write_bytes(b'new\n')
+
+        assert read(follower, 1) == 'new\n'
+
+    def test_truncated_before_start(self, tmp_path):
+        path = tmp_path / 'app.log'
+        path.write_bytes(b'new\n')
+
+        follower = Follower(str(path), 'utf-8', offset=100)
+        follower.start()
+        try:
+            assert read(follower, 2) == '|new\n'
+        finally:
+            follower.cancel()
+
+    def test_missing(self, tmp_path):
+        follower = Follower(str(tmp_path / 'missing.log'), 'utf-8', offset=0)
+        follower.start()
+
+        assert isinstance(follower.queue.get(timeout=2), FileNotFoundError)
+
+
+class TestTail:
+
+    @pytest.mark.parametrize('text, lines, expected', [
+        ('a\nb\nc\n', 2, 'b\nc\n'),
+        ('a\nb\nc', 1, 'b\nc'),
+        ('a\nb\n', 5, 'a\nb\n'),
+        ('a\nb', 0, 'b'),
+        ('', 1, ''),
+    ])
+    def test_tail(self, text, lines, expected):
+        assert tail(text, lines) == expected
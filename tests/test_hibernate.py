@@ -0,0 +1,40 @@
+from pyrite.buffer import Rope
+from pyrite.hibernate import Candidate, CompressedText, select
+
+
+class TestCompressedText:
+
+    def test_round_trip(self):
+        text = 'héllo wörld\n' * 10000
+        compressed = CompressedText(Rope(text))
+
+        assert compressed.text() == text
+        assert compressed.size < len(text) / 10
+
+    def test_empty(self):
+        assert CompressedText(Rope()).text() == ''
+
+
+class TestSelect:
+
+    def test_idle(self):
+        candidates = [Candidate('a', 10, 1), Candidate('b', 50, 1), Candidate('c', 90, 1)]
+
+        assert select(candidates, now=100, idle_limit=40, budget=0) == ['a', 'b']
+
+    def test_no_idle_limit(self):
+        candidates = [Candidate('a', 0, 1)]
+
+        assert select(candidates, now=100, idle_limit=0, budget=0) == []
+
+    def test_budget(self):
+        candidates = [Candidate('a', 30, 100), Candidate('b', 10, 100), Candidate('c', 20, 100)]
+
+        assert select(candidates, now=40, idle_limit=0, budget=150) == ['b', 'c']
+
+    def test_idle_and_budget(self):
+        candidates = [Candidate('a', 10, 100), Candidate('b', 80, 100), Candidate('c', 90, 100)]
+
+        # Hibernating the idle document leaves the others within budget
+        assert select(candidates, now=100, idle_limit=60, budget=200) == ['a']
+        assert select(candidates, now=100, idle_limit=60, budget=100) == ['a', 'b']
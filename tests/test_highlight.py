@@ -0,0 +1,157 @@
+import time
+
+import pytest
+
+from pyrite.buffer import Buffer
+from pyrite.highlight import PYTHON, VIEW_MARGIN, Tokenizer, language_for
+
+
+def text_of(line, tokens):
+    return [(line[start:end], token) for start, end, token in tokens]
+
+
+class TestLanguage:
+
+    def test_lex(self):
+        line = 'def foo(x): return len(x) + 1  # done'
+        tokens, state = PYTHON.lex(line, 'root')
+
+        assert text_of(line, tokens) == [
+            ('def', 'keyword'),
+            ('foo', 'definition'),
+            ('return', 'keyword'),
+            ('len', 'builtin'),
+            ('1', 'number'),
+            ('# done', 'comment'),
+        ]
+        assert state == 'root'
+
+    def test_strings(self):
+        line = '''x = 'a # b' + "c\\"d"'''
+        tokens, _ = PYTHON.lex(line, 'root')
+
+        assert text_of(line, tokens) == [("'a # b'", 'string'), ('"c\\"d"', 'string')]
+
+    def test_multiline_string(self):
+        tokens, state = PYTHON.lex('x = """start', 'root')
+        assert state == 'string3d'
+
+        line = 'middle " quote'
+        tokens, state = PYTHON.lex(line, state)
+        assert text_of(line, tokens) == [(line, 'string')]
+        assert state == 'string3d'
+
+        line = 'end""" if x'
+        tokens, state = PYTHON.lex(line, state)
+        assert text_of(line, tokens) == [('end"""', 'string'), ('if', 'keyword')]
+        assert state == 'root'
+
+    def test_empty_line(self):
+        assert PYTHON.lex('', 'string3s') == ([], 'string3s')
+
+    @pytest.mark.parametrize('filename,expected', [
+        ('a/b.py', PYTHON),
+        ('B.PY', PYTHON),
+        ('b.txt', None),
+        (None, None),
+    ])
+    def test_language_for(self, filename, expected):
+        assert language_for(filename) is expected
+
+
+class Document:
+    """Feeds buffer edits to a tokenizer, as the Highlighter does."""
+
+    def __init__(self, text):
+        self.buffer = Buffer(text)
+        self.generation = 0
+        self.tokenizer = Tokenizer(PYTHON, self.buffer.snapshot())
+        self.buffer.on_edit(self.on_edit)
+        self.tokenizer.start()
+
+    def on_edit(self, edit):
+        self.generation += 1
+        line, _ = edit.before.position(edit.offset)
+        self.tokenizer.edit(self.generation, edit.after, line - 1,
+                            edit.removed.count('\n'), edit.inserted.count('\n'))
+
+    def result(self):
+        while True:
+            result = self.tokenizer.results.get(timeout=5)
+            if result[0] == self.generation and self.tokenizer.results.empty():
+                return result
+
+
+@pytest.fixture
+def document():
+    documents = []
+
+    def create(text):
+        documents.append(Document(text))
+        return documents[-1]
+
+    yield create
+
+    for d in documents:
+        d.tokenizer.stop()
+
+
+class TestTokenizer:
+
+    def test_tokenize_view(self, document):
+        doc = document('x = 1\n' * 1000)
+        doc.tokenizer.show(0, 10)
+        generation, first, lines = doc.result()
+
+        assert first == 0
+        assert len(lines) == 11 + VIEW_MARGIN
+        assert lines[0] == [(4, 5, 'number')]
+        # Nothing beyond the highlighted region is lexed
+        assert len(doc.tokenizer.tokens) == 11 + VIEW_MARGIN
+
+    def test_edit_relexes_following_lines(self, document):
+        doc = document('a\nb\nc\n')
+        doc.tokenizer.show(0, 3)
+        doc.result()
+
+        doc.buffer.insert(0, '"""')
+        _, _, lines = doc.result()
+
+        assert [{token for _, _, token in line} for line in lines] == [{'string'}, {'string'}, {'string'}, set()]
+        assert doc.tokenizer.states[1:] == ['string3d'] * 4
+
+    def test_edit_converges(self, document):
+        doc = document('x = 1\n' * 50)
+        doc.tokenizer.show(0, 50)
+        doc.result()
+        tokens = list(doc.tokenizer.tokens)
+
+        doc.buffer.replace(6, 11, 'if y\nz = 2')
+        _, _, lines = doc.result()
+
+        assert lines[1] == [(0, 2, 'keyword')]
+        assert lines[2] == [(4, 5, 'number')]
+        assert len(lines) == 52
+        # Lines after the edit kept their cached tokens
+        assert doc.tokenizer.tokens[10] is tokens[9]
+
+    def test_scroll(self, document):
+        doc = document('x = 1\n' * 1000)
+        doc.tokenizer.show(500, 510)
+        _, first, lines = doc.result()
+
+        assert first == 500 - VIEW_MARGIN
+        assert len(lines) == 11 + 2 * VIEW_MARGIN
+
+    def test_busy_until_caught_up(self, document):
+        doc = document('x = 1\n' * 1000)
+        assert not doc.tokenizer.busy
+
+        doc.tokenizer.show(0, 10)
+        assert doc.tokenizer.busy
+        doc.result()
+
+        deadline = time.monotonic() + 5
+        while doc.tokenizer.busy and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not doc.tokenizer.busy
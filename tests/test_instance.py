@@ -0,0 +1,84 @@
+import os
+import socket
+
+import pytest
+
+from pyrite.instance import listen, parse_args, send
+
+
+class TestParseArgs:
+
+    def test_filenames(self, tmp_path):
+        assert parse_args(['a.txt', str(tmp_path)]) == [(os.path.abspath('a.txt'), None), (str(tmp_path), None)]
+
+    def test_line_numbers(self):
+        assert parse_args(['a.txt:42']) == [(os.path.abspath('a.txt'), 42)]
+
+    def test_not_line_numbers(self):
+        assert parse_args(['a:b', 'a:']) == [(os.path.abspath('a:b'), None), (os.path.abspath('a:'), None)]
+
+    def test_existing_file_with_colon(self, tmp_path):
+        path = tmp_path / 'a:1'
+        path.touch()
+
+        assert parse_args([str(path)]) == [(str(path), None)]
+
+
+class TestServer:
+
+    @pytest.fixture
+    def path(self, tmp_path):
+        return tmp_path / 'socket'
+
+    @pytest.fixture
+    def server(self, path):
+        server = listen(path)
+        yield server
+        server.close()
+
+    def test_send(self, server, path):
+        assert send([('/a.txt', None), ('/b.txt', 3)], path)
+
+        assert server.requests.get(timeout=1) == [('/a.txt', None), ('/b.txt', 3)]
+
+    def test_send_empty(self, server, path):
+        assert send([], path)
+
+        assert server.requests.get(timeout=1) == []
+
+    @pytest.mark.parametrize('request_data', [b'{}\n', b'[]\n', b'{"files": [1]}\n', b'{"files": [[1, 2]]}\n'])
+    def test_malformed_request(self, server, path, request_data):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(path))
+            sock.sendall(request_data)
+            sock.shutdown(socket.SHUT_WR)
+            assert sock.makefile('rb').readline() == b''
+
+        # Still serving
+        assert send([('/a.txt', None)], path)
+        assert server.requests.get(timeout=1) == [('/a.txt', None)]
+
+    def test_no_server(self, path):
+        assert not send([], path)
+
+    def test_already_listening(self, server, path):
+        assert listen(path) is None
+
+    def test_stale_socket(self, path):
+        # Bound but never listened on, as if left by an instance that crashed
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(str(path))
+
+        server = listen(path)
+        try:
+            assert send([('/a.txt', None)], path)
+        finally:
+            server.close()
+
+    def test_close(self, path):
+        server = listen(path)
+        server.close()
+        server.join(timeout=1)
+
+        assert not server.is_alive()
+        assert not path.exists()
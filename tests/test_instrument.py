@@ -0,0 +1,143 @@
+import tkinter as tk
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from pyrite import instrument
+from pyrite.instrument import Histogram, Monitor, handler_name
+
+
+def after(func):
+    # Mimics the wrapper tkinter.Misc.after() registers in place of func
+    def callit():
+        func()
+    return callit
+
+
+class Handler:
+
+    def handle(self, event):
+        pass
+
+
+class TestHistogram:
+
+    def test_add(self):
+        histogram = Histogram()
+        for duration in (0.0005, 0.003, 0.003, 2.0):
+            histogram.add(duration)
+
+        assert histogram.count == 4
+        assert histogram.max == 2.0
+        assert histogram.counts[0] == 1
+        assert histogram.counts[2] == 2
+        assert histogram.counts[-1] == 1
+
+    def test_percentile(self):
+        histogram = Histogram()
+        for _ in range(90):
+            histogram.add(0.0015)
+        for _ in range(10):
+            histogram.add(0.3)
+
+        assert histogram.percentile(0.5) == 0.002
+        assert histogram.percentile(0.95) == 0.3
+
+    def test_empty(self):
+        assert Histogram().percentile(0.5) == 0.0
+        assert Histogram().lines() == []
+
+
+class TestHandlerName:
+
+    def test_method(self):
+        assert handler_name(Handler().handle) == f'{__name__}.Handler.handle'
+
+    def test_lambda(self):
+        func = lambda e: None  # noqa: E731
+
+        assert handler_name(func) == f'{__name__}.TestHandlerName.test_lambda.<locals>.<lambda>:' \
+                                     f'{func.__code__.co_firstlineno}'
+
+    def test_after(self):
+        assert handler_name(after(Handler().handle)) == f'{__name__}.Handler.handle'
+
+
+class TestMonitor:
+
+    @pytest.fixture
+    def monitor(self):
+        return Monitor(MagicMock())
+
+    def wrapper(self, func, subst=None):
+        return tk.CallWrapper(func, subst, MagicMock())
+
+    def test_call(self, monitor):
+        func = MagicMock(return_value='result', __qualname__='handle', __module__='m')
+
+        assert monitor.call(self.wrapper(func), 1, 2) == 'result'
+
+        func.assert_called_once_with(1, 2)
+        assert monitor.handlers['m.handle'].count == 1
+
+    def test_call_error(self, monitor):
+        func = MagicMock(side_effect=ValueError, __qualname__='handle', __module__='m')
+        wrapper = self.wrapper(func)
+
+        monitor.call(wrapper)
+
+        wrapper.widget._report_exception.assert_called_once_with()
+        assert monitor.handlers['m.handle'].count == 1
+
+    def test_keystroke(self, monitor):
+        event = tk.Event()
+        event.type = tk.EventType.KeyPress
+
+        monitor.call(self.wrapper(Handler().handle, subst=lambda *args: (event,)))
+
+        callback = monitor.root.after_idle.call_args[0][0]
+        callback()
+        assert monitor.keystrokes.count == 1
+
+    def test_heartbeat_stall(self, monitor):
+        with patch('pyrite.instrument.perf_counter', side_effect=[0.0, 1.0]):
+            monitor.start()
+            monitor.record(Handler().handle, 0.9)
+            with patch('pyrite.instrument.log') as log:
+                monitor.heartbeat()
+
+        assert monitor.stalls.count == 1
+        assert 'Handler.handle (900ms)' in log.warning.call_args[0][0]
+
+    def test_heartbeat_no_stall(self, monitor):
+        with patch('pyrite.instrument.perf_counter', side_effect=[0.0, 0.06]):
+            monitor.start()
+            monitor.heartbeat()
+
+        assert monitor.stalls.count == 0
+
+    def test_report(self, monitor):
+        monitor.record(Handler().handle, 0.01)
+        monitor.keystrokes.add(0.004)
+
+        report = monitor.report()
+
+        assert '1 key presses' in report
+        assert 'No stalls recorded' in report
+        assert f'{__name__}.Handler.handle' in report
+
+
+class TestInstall:
+
+    def test_install(self):
+        original = tk.CallWrapper.__call__
+
+        try:
+            monitor = instrument.install(MagicMock())
+            assert instrument.monitor is monitor
+            assert tk.CallWrapper.__call__ is not original
+        finally:
+            instrument.uninstall()
+
+        assert instrument.monitor is None
+        assert tk.CallWrapper.__call__ is original
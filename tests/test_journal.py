@@ -0,0 +1,197 @@
+import gzip
+import os
+from unittest.mock import patch
+
+import pytest
+
+from pyrite.buffer import Buffer
+from pyrite.journal import Journal, _running, recover, replay
+
+
+@pytest.fixture(autouse=True)
+def directory(tmp_path):
+    with patch('pyrite.journal.journal_directory', return_value=tmp_path / 'journals'):
+        yield tmp_path / 'journals'
+
+
+@pytest.fixture
+def buffer():
+    return Buffer()
+
+
+def journal_for(buffer, compact_size=1024 * 1024):
+    journal = Journal(compact_size=compact_size)
+    buffer.on_edit(journal.record)
+    return journal
+
+
+class TestJournal:
+
+    def test_untitled(self, buffer):
+        journal = journal_for(buffer)
+        journal.start()
+        buffer.insert(0, 'hello world')
+        buffer.delete(0, 6)
+        journal.flush()
+
+        recovered = replay(journal.path)
+
+        assert recovered.filename is None
+        assert str(recovered.content) == 'world'
+
+    def test_file_base(self, buffer, tmp_path):
+        path = tmp_path / 'test.txt'
+        path.write_text('one\ntwo\n')
+        buffer.insert(0, 'one\ntwo\n')
+        journal = journal_for(buffer)
+        journal.start(str(path), 'utf-8')
+        buffer.replace(4, 7, 'three')
+        journal.flush()
+
+        recovered = replay(journal.path)
+
+        assert recovered.filename == str(path)
+        assert str(recovered.content) == 'one\nthree\n'
+
+    def test_compressed_base(self, buffer, tmp_path):
+        path = tmp_path / 'test.txt.gz'
+        path.write_bytes(gzip.compress(b'one\ntwo\n'))
+        buffer.insert(0, 'one\ntwo\n')
+        journal = journal_for(buffer)
+        journal.start(str(path), 'utf-8')
+        buffer.insert(0, 'X')
+        journal.flush()
+
+        assert str(replay(journal.path).content) == 'Xone\ntwo\n'
+
+    def test_no_file_without_edits(self, buffer, tmp_path):
+        path = tmp_path / 'test.txt'
+        path.write_text('one')
+        journal = journal_for(buffer)
+        journal.start(str(path), 'utf-8')
+        journal.flush()
+
+        assert not journal.path.exists()
+
+    def test_restart_discards_edits(self, buffer, tmp_path):
+        path = tmp_path / 'test.txt'
+        path.write_text('one')
+        journal = journal_for(buffer)
+        journal.start()
+        buffer.insert(0, 'one')
+        journal.flush()
+
+        # Saved
+        journal.start(str(path), 'utf-8')
+        journal.flush()
+
+        assert not journal.path.exists()
+
+    def test_inline_base(self, buffer):
+        buffer.insert(0, 'abc' * 50000)
+        journal = journal_for(buffer)
+        journal.start(None, 'utf-8', content=buffer.snapshot())
+        buffer.insert(0, '>')
+        journal.flush()
+
+        assert str(replay(journal.path).content) == '>' + 'abc' * 50000
+
+    def test_compaction(self, buffer):
+        journal = journal_for(buffer, compact_size=100)
+        journal.start()
+        for i in range(100):
+            buffer.insert(i, 'x')
+        buffer.delete(0, 90)
+        journal.flush()
+
+        lines = journal.path.read_text().splitlines()
+
+        assert len(lines) == 2
+        assert str(replay(journal.path).content) == 'x' * 10
+
+    def test_stop(self, buffer):
+        journal = journal_for(buffer)
+        journal.start()
+        buffer.insert(0, 'abc')
+        journal.flush()
+        journal.stop()
+        buffer.insert(0, 'def')
+        journal.flush()
+
+        assert not journal.path.exists()
+
+    def test_close(self, buffer):
+        journal = journal_for(buffer)
+        journal.start()
+        buffer.insert(0, 'abc')
+        journal.flush()
+        journal.close()
+        buffer.insert(0, 'def')
+        journal.flush()
+
+        assert not journal.path.exists()
+
+
+class TestRecover:
+
+    @pytest.fixture(autouse=True)
+    def crashed(self):
+        # Journals written by this process are taken to be those of an
+        # instance that crashed
+        with patch('pyrite.journal._running', return_value=False):
+            yield
+
+    def test_recover(self, buffer):
+        journal = journal_for(buffer)
+        journal.start()
+        buffer.insert(0, 'abc')
+        journal.flush()
+
+        recovered = recover()
+
+        assert [str(r.content) for r in recovered] == ['abc']
+        assert recovered[0].path == journal.path
+
+    def test_truncated(self, buffer):
+        journal = journal_for(buffer)
+        journal.start()
+        buffer.insert(0, 'abc')
+        buffer.insert(3, 'def')
+        journal.flush()
+        content = journal.path.read_text()
+        journal.path.write_text(content[:-5])
+
+        assert [str(r.content) for r in recover()] == ['abc']
+
+    def test_changed_base(self, buffer, tmp_path):
+        path = tmp_path / 'test.txt'
+        path.write_text('one')
+        journal = journal_for(buffer)
+        journal.start(str(path), 'utf-8')
+        buffer.insert(0, 'one')
+        journal.flush()
+        path.write_text('changed')
+
+        assert recover() == []
+        assert not journal.path.exists()
+
+    def test_nothing_to_recover(self):
+        assert recover() == []
+
+    def test_skips_running_instance(self, buffer):
+        journal = journal_for(buffer)
+        journal.start()
+        buffer.insert(0, 'abc')
+        journal.flush()
+
+        with patch('pyrite.journal._running', return_value=True):
+            assert recover() == []
+
+        assert journal.path.exists()
+
+    def test_journal_names_owner(self):
+        assert Journal(compact_size=0).path.name.startswith(f'{os.getpid()}-')
+
+
+def test_running():
+    assert _running(os.getpid())
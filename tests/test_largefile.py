@@ -0,0 +1,129 @@
+import pytest
+
+import re
+
+from pyrite import largefile
+from pyrite.largefile import LineIndex, Search
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / 'large.txt'
+    path.write_bytes(b''.join(b'line %d\n' % i for i in range(100)) + b'last')
+    index = LineIndex(str(path), stride=8)
+    index.build()
+    yield index
+    index.close()
+
+
+def test_lines(index):
+    assert index.complete
+    assert index.lines == 101
+    assert index.available == 101
+    assert index.progress == 1.0
+
+
+def test_offset(index):
+    assert index.offset(0) == 0
+    assert index.mm[index.offset(42):].startswith(b'line 42\n')
+    assert index.mm[index.offset(100):] == b'last'
+
+
+def test_offset_beyond_end(index):
+    assert index.offset(1000) == index.size
+
+
+def test_line_at(index):
+    assert index.line_at(0) == 0
+    assert index.line_at(index.offset(57) + 3) == 57
+    assert index.line_at(index.size) == 100
+
+
+def test_read(index):
+    assert index.read(10, 2) == b'line 10\nline 11\n'
+    assert index.read(99, 5) == b'line 99\nlast'
+
+
+def test_search(index):
+    match, _ = index.search(re.compile(rb'line 7\d'), index.offset(72))
+    assert index.line_at(match[0]) == 72
+
+
+def test_search_by_window(index, monkeypatch):
+    monkeypatch.setattr(largefile, 'SEARCH_WINDOW', 20)
+
+    match, end = index.search(re.compile(rb'line 9\d'), 0)
+    assert match is None
+    assert index.line_at(end) == 3
+
+
+def test_search_closed(index):
+    index.close()
+    assert index.search(re.compile(rb'line'), 0) == (None, index.size)
+
+
+def test_search_thread(index, monkeypatch):
+    monkeypatch.setattr(largefile, 'SEARCH_WINDOW', 20)
+
+    search = Search(index, re.compile(rb'line 9\d'), index.offset(95))
+    search.start()
+    assert search.done.wait(5)
+    assert index.line_at(search.match[0]) == 95
+
+
+def test_search_thread_no_match(index):
+    search = Search(index, re.compile(rb'missing|^'), 0)
+    search.run()
+    assert search.done.is_set()
+    assert search.match is None
+
+
+def test_grow(index, tmp_path):
+    with (tmp_path / 'large.txt').open('ab') as f:
+        f.write(b' line\nappended')
+
+    assert index.grow()
+    assert not index.complete
+    index.build()
+
+    assert index.lines == 102
+    assert index.read(100, 2) == b'last line\nappended'
+
+
+def test_grow_rewritten(index, tmp_path):
+    path = tmp_path / 'large.txt'
+    with path.open('r+b') as f:
+        f.seek(index.size - 4)
+        f.write(b'LAST and more')
+
+    assert not index.grow()
+    assert index.complete
+
+
+def test_grow_replaced(index, tmp_path):
+    path = tmp_path / 'large.txt'
+    content = path.read_bytes()
+    path.unlink()
+    path.write_bytes(content + b'\nmore')
+
+    assert not index.grow()
+
+
+def test_trailing_newline(tmp_path):
+    path = tmp_path / 'large.txt'
+    path.write_bytes(b'a\nb\n')
+    index = LineIndex(str(path), stride=1)
+    index.build()
+
+    assert index.lines == 3
+    assert index.read(2, 1) == b''
+
+
+def test_close_stops_build(tmp_path):
+    path = tmp_path / 'large.txt'
+    path.write_bytes(b'a\n' * 100)
+    index = LineIndex(str(path), stride=1)
+    index.close()
+    index.build()
+
+    assert not index.complete
@@ -0,0 +1,160 @@
+from unittest.mock import patch
+
+import pytest
+
+from pyrite.buffer import Buffer
+from pyrite.undo import CHANGE_OVERHEAD, UndoHistory
+
+
+def replay(buffer, edits):
+    with buffer.grouped():
+        for start, end, text in edits:
+            buffer.replace(start, end, text)
+
+
+class TestUndoHistory:
+
+    @pytest.fixture
+    def clock(self):
+        with patch('pyrite.undo.monotonic', return_value=100.0) as monotonic:
+            yield monotonic
+
+    @pytest.fixture
+    def buffer(self):
+        return Buffer('hello')
+
+    @pytest.fixture
+    def history(self, buffer, clock):
+        history = UndoHistory(buffer, lambda edits: replay(buffer, edits), budget=1024 * 1024)
+        buffer.on_edit(history.record)
+        return history
+
+    def type(self, buffer, offset, text):
+        for i, char in enumerate(text):
+            buffer.insert(offset + i, char)
+
+    def test_typing_coalesced(self, buffer, history):
+        self.type(buffer, 5, ' world')
+
+        assert history.undo() == 5
+        assert str(buffer.snapshot()) == 'hello'
+        assert not history.can_undo
+
+        assert history.redo() == 11
+        assert str(buffer.snapshot()) == 'hello world'
+
+    def test_backspace_and_delete_coalesced(self, buffer, history):
+        buffer.delete(4, 5)
+        buffer.delete(3, 4)
+        buffer.delete(0, 1)
+        buffer.delete(0, 1)
+
+        assert str(buffer.snapshot()) == 'l'
+        history.undo()
+        assert str(buffer.snapshot()) == 'hel'
+        history.undo()
+        assert str(buffer.snapshot()) == 'hello'
+
+    def test_newline_ends_step(self, buffer, history):
+        self.type(buffer, 5, '\nab')
+
+        history.undo()
+        assert str(buffer.snapshot()) == 'hello\n'
+        history.undo()
+        assert str(buffer.snapshot()) == 'hello'
+
+    def test_pause_ends_step(self, buffer, history, clock):
+        self.type(buffer, 5, 'ab')
+        clock.return_value += 5
+        self.type(buffer, 7, 'cd')
+
+        history.undo()
+        assert str(buffer.snapshot()) == 'helloab'
+
+    def test_jump_ends_step(self, buffer, history):
+        buffer.insert(5, 'a')
+        buffer.insert(0, 'b')
+
+        history.undo()
+        assert str(buffer.snapshot()) == 'helloa'
+
+    def test_group_is_one_step(self, buffer, history):
+        with buffer.grouped():
+            buffer.replace(0, 1, 'J')
+            buffer.insert(5, '!')
+            buffer.delete(1, 2)
+
+        assert history.undo() == 1
+        assert str(buffer.snapshot()) == 'hello'
+        history.redo()
+        assert str(buffer.snapshot()) == 'Jllo!'
+
+    def test_column_typing_is_one_step(self, history):
+        buffer = Buffer('aa\nbb\ncc\n')
+        history.buffer = buffer
+        history.replay = lambda edits: replay(buffer, edits)
+        buffer.on_edit(history.record)
+
+        # Typing 'xy' into a column three lines tall
+        for column in range(2):
+            with buffer.grouped():
+                for line in range(3):
+                    buffer.insert(line * (4 + column) + 1 + column, 'xy'[column])
+
+        assert str(buffer.snapshot()) == 'axya\nbxyb\ncxyc\n'
+        history.undo()
+        assert str(buffer.snapshot()) == 'aa\nbb\ncc\n'
+        assert not history.can_undo
+
+    def test_edit_clears_redo(self, buffer, history):
+        buffer.insert(5, '!')
+        history.undo()
+        buffer.insert(0, '>')
+
+        assert not history.can_redo
+        assert history.redo() is None
+
+    def test_undo_and_redo_not_recorded(self, buffer, history):
+        buffer.insert(5, '!')
+        history.undo()
+        history.redo()
+        history.undo()
+
+        assert str(buffer.snapshot()) == 'hello'
+        assert not history.can_undo
+
+    def test_budget(self, buffer, history):
+        history.budget = 3 * (CHANGE_OVERHEAD + 1)
+
+        for i in range(5):
+            buffer.insert(0, '\n')
+
+        assert history.size <= history.budget
+        for _ in range(3):
+            assert history.undo() is not None
+        assert history.undo() is None
+        assert str(buffer.snapshot()) == '\n\nhello'
+
+    def test_disabled(self, buffer, history):
+        history.reset(enabled=False)
+        buffer.insert(5, '!')
+
+        assert not history.can_undo
+
+    def test_checkpoint(self, buffer, history):
+        self.type(buffer, 5, 'ab')
+        saved = history.checkpoint()
+        buffer.insert(7, 'c')
+
+        assert history.top is not saved
+        history.undo()
+        assert str(buffer.snapshot()) == 'helloab'
+        assert history.top is saved
+
+    def test_adopt(self, buffer, history, clock):
+        buffer.insert(5, '!')
+        other = UndoHistory(buffer, history.replay, budget=history.budget)
+        other.adopt(history.export())
+
+        other.undo()
+        assert str(buffer.snapshot()) == 'hello'
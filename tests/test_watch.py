@@ -0,0 +1,210 @@
+import gzip
+import os
+import random
+import threading
+import time
+
+import pytest
+
+from pyrite.buffer import Rope
+from pyrite.watch import Reloader, Watcher, common_prefix, common_suffix, diff, stat
+
+
+def apply(old, hunks):
+    for start, end, text in reversed(hunks):
+        old = old[:start] + text + old[end:]
+    return old
+
+
+class TestCommonPrefix:
+
+    @pytest.mark.parametrize('a, b, expected', [
+        ('', '', 0),
+        ('abc', 'abd', 2),
+        ('abc', 'abc', 3),
+        ('abc', 'abcdef', 3),
+        ('x' * 200000 + 'a', 'x' * 200000 + 'b', 200000),
+    ])
+    def test_common_prefix(self, a, b, expected):
+        assert common_prefix(a, b) == expected
+
+    @pytest.mark.parametrize('a, b, expected', [
+        ('', '', 0),
+        ('abc', 'xbc', 2),
+        ('def', 'abcdef', 3),
+        ('a' + 'x' * 200000, 'b' + 'x' * 200000, 200000),
+    ])
+    def test_common_suffix(self, a, b, expected):
+        assert common_suffix(a, b, limit=len(a)) == expected
+
+    def test_common_suffix_limit(self):
+        assert common_suffix('aaaa', 'aaaaa', limit=2) == 2
+
+
+class TestDiff:
+
+    def test_unchanged(self):
+        assert diff('a\nb\n', 'a\nb\n') == []
+
+    def test_line_added(self):
+        old = ''.join(f'line {i}\n' for i in range(100000))
+        new = old.replace('line 500\n', 'line 500\nnew\n')
+
+        assert diff(old, new) == [(old.index('line 501'), old.index('line 501'), 'new\n')]
+
+    def test_line_changed(self):
+        assert diff('a\nb\nc\n', 'a\nx\nc\n') == [(2, 4, 'x\n')]
+
+    def test_hunks(self):
+        old = ''.join(f'line {i}\n' for i in range(100))
+        new = old.replace('line 10\n', '').replace('line 90\n', 'line ninety\n')
+
+        hunks = diff(old, new)
+
+        assert len(hunks) == 2
+        assert apply(old, hunks) == new
+
+    def test_too_many_lines(self, monkeypatch):
+        monkeypatch.setattr('pyrite.watch.MAX_DIFF_LINES', 4)
+
+        assert diff('a\nb\nc\nd\n', 'a\nx\nc\ny\n') == [(2, 8, 'x\nc\ny\n')]
+
+    def test_random(self):
+        rng = random.Random(0)
+
+        for _ in range(200):
+            old = ''.join(rng.choice('ab\n') for _ in range(rng.randrange(30)))
+            new = ''.join(rng.choice('ab\n') for _ in range(rng.randrange(30)))
+
+            assert apply(old, diff(old, new)) == new
+
+
+class TestWatcher:
+
+    @pytest.fixture(params=['inotify', 'polling'])
+    def watcher(self, request):
+        watcher = Watcher(interval=0.05)
+        if request.param == 'polling':
+            watcher._inotify = None
+        watcher.start()
+        yield watcher
+        watcher.close()
+        watcher.join(timeout=2)
+
+    @pytest.fixture
+    def path(self, tmp_path):
+        path = tmp_path / 'a.txt'
+        path.write_text('a\n')
+        return path
+
+    def test_changed(self, watcher, path):
+        watcher.watch({str(path): stat(str(path))})
+        time.sleep(0.1)
+
+        path.write_text('b\n')
+
+        filename, state = watcher.changes.get(timeout=2)
+        assert filename == str(path)
+        assert state == stat(str(path))
+
+    def test_deleted(self, watcher, path):
+        watcher.watch({str(path): stat(str(path))})
+        time.sleep(0.1)
+
+        path.unlink()
+
+        assert watcher.changes.get(timeout=2) == (str(path), None)
+
+    def test_changed_before_watched(self, watcher, path):
+        state = stat(str(path))
+        path.write_text('changed\n')
+        os.utime(str(path), ns=(state.mtime_ns + 10 ** 9, state.mtime_ns + 10 ** 9))
+
+        watcher.watch({str(path): state})
+
+        assert watcher.changes.get(timeout=2)[0] == str(path)
+
+    def test_unchanged(self, watcher, path):
+        watcher.watch({str(path): stat(str(path))})
+
+        time.sleep(0.3)
+
+        assert watcher.changes.empty()
+
+    def test_reported_once(self, watcher, path):
+        state = stat(str(path))
+        watcher.watch({str(path): state})
+        time.sleep(0.1)
+
+        path.write_text('b\n')
+        watcher.changes.get(timeout=2)
+        # The same state is given again, as the document hasn't reloaded yet
+        watcher.watch({str(path): state})
+        time.sleep(0.3)
+
+        assert watcher.changes.empty()
+
+    @pytest.fixture
+    def growing(self, tmp_path):
+        """A file appended to every 50ms, as a log is."""
+        path = tmp_path / 'app.log'
+        path.write_text('start\n')
+        stop = threading.Event()
+
+        def write():
+            with path.open('a') as f:
+                while not stop.wait(0.05):
+                    f.write('line\n')
+                    f.flush()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        yield path
+        stop.set()
+        writer.join()
+
+    def test_other_file_changed_while_file_grows(self, watcher, path, growing, monkeypatch):
+        monkeypatch.setattr('pyrite.watch.MAX_SETTLE_TIME', 60)
+        watcher.watch({str(path): stat(str(path)), str(growing): stat(str(growing))})
+        time.sleep(0.1)
+
+        path.write_text('b\n')
+
+        assert watcher.changes.get(timeout=2)[0] == str(path)
+
+    def test_growing_file_reported(self, watcher, growing, monkeypatch):
+        monkeypatch.setattr('pyrite.watch.MAX_SETTLE_TIME', 0.5)
+        watcher.watch({str(growing): stat(str(growing))})
+
+        assert watcher.changes.get(timeout=2)[0] == str(growing)
+
+
+class TestReloader:
+
+    def test_reload(self, tmp_path):
+        path = tmp_path / 'a.txt'
+        path.write_bytes(b'a\r\nx\r\nc\r\n')
+
+        reloader = Reloader(str(path), 'utf-8', Rope('a\nb\nc\n'))
+        reloader.start()
+        reloader.done.wait(timeout=2)
+
+        assert reloader.hunks == [(2, 4, 'x\n')]
+        assert reloader.error is None
+
+    def test_reload_compressed(self, tmp_path):
+        path = tmp_path / 'a.txt.gz'
+        path.write_bytes(gzip.compress(b'a\nx\nc\n'))
+
+        reloader = Reloader(str(path), 'utf-8', Rope('a\nb\nc\n'))
+        reloader.start()
+        reloader.done.wait(timeout=2)
+
+        assert reloader.hunks == [(2, 4, 'x\n')]
+
+    def test_missing(self, tmp_path):
+        reloader = Reloader(str(tmp_path / 'missing.txt'), 'utf-8', Rope())
+        reloader.start()
+        reloader.done.wait(timeout=2)
+
+        assert isinstance(reloader.error, FileNotFoundError)